@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+규칙 기반 핫 패스 마이크로 벤치마크
+LLM 호출 없이 요청마다 CPU를 쓰는 함수들의 호출당 시간과 메모리 할당을 측정하고 기준 결과와 비교
+
+- FAQ 검색은 합성 한국어 FAQ(실제 FAQ 30행 + 주제/상품/상황 조합으로 만든 행)를 30 / 1k / 10k / 100k행으로 늘려가며 측정
+  (cold: 검색 캐시 비운 상태, warm: 같은 질문 반복, batch: search_faq_batch 질문당 시간)
+- 나머지 함수는 합성 질문 세트(FAQ 질문 변형, 복합/불만/긴급 문의, 확인 응답, 무관한 질문)로 측정
+- 시간: 함수마다 --min-time 동안 반복 호출한 호출당 중앙값/p95, 메모리: tracemalloc으로 별도 1회 실행한
+  호출당 최대 사용량(peak)과 호출당 할당 블록 수 (--top이면 할당 위치 상위 N개)
+- --save-baseline으로 기준 저장, --baseline과 비교해 중앙값이 --threshold(%) 넘게 느려지면 종료 코드 1
+
+사용 예 (backend 디렉터리에서):
+    python benchmarks/hot_path.py --save-baseline benchmarks/baseline.json
+    python benchmarks/hot_path.py --baseline benchmarks/baseline.json --threshold 25
+    python benchmarks/hot_path.py --sizes 30,1000 --only search_faq --top 5
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("KENOPI_LOG_LEVEL", "ERROR")
+
+import kenopi_chatbot as kc  # noqa: E402
+
+DEFAULT_SIZES = (30, 1_000, 10_000, 100_000)
+
+# 합성 FAQ / 질문 재료
+TOPICS = ["환불", "교환", "반품", "배송", "배송비", "A/S", "결제", "쿠폰", "적립금", "회원가입", "주문 취소", "재입고", "포장", "영수증"]
+PRODUCTS = ["장우산", "3단 우산", "양산", "자동 우산", "골프 우산", "아동 우산", "우산 커버", "우비", "레인부츠", "선물 세트"]
+SITUATIONS = ["받은 지 3일 됐는데", "선물로 받았는데", "해외에서 주문했는데", "두 개 주문했는데", "처음 사용했는데",
+              "비 오는 날 쓰다가", "택배 상자가 젖어서", "색상이 사진과 달라서", "살이 휘어서", "손잡이가 빠져서"]
+ENDINGS = ["어떻게 하나요?", "가능한가요?", "얼마나 걸리나요?", "비용이 드나요?", "어디로 문의하나요?", "방법 알려주세요"]
+COMPOUND = ["환불과 교환 중 어떤 게 더 유리한가요? 그리고 배송비는 누가 부담하나요?",
+            "급하게 처리해주세요! 제품에 문제가 있어요!",
+            "화가 나요! 왜 이렇게 서비스가 별로인가요? 벌써 세 번째 문의입니다",
+            "케노피 제품 AS 정책에 대해 자세히 설명해주세요. 보증 기간은 어떻게 되고 유료 수리는 언제 필요한가요?"]
+CONFIRMATIONS = ["네", "예 맞아요", "응 알려줘", "궁금합니다", "ok", "아니요", "그래"]
+UNRELATED = ["오늘 날씨 어때요?", "점심 메뉴 추천해줘", "안녕하세요", "감사합니다", "파이썬 배우는 법"]
+
+
+def synthetic_faq(rows: int, seed: int = 0) -> List[Dict[str, str]]:
+    """실제 FAQ를 앞에 두고 나머지는 주제 x 상품 x 상황 x 어미 조합으로 채운 rows행 FAQ"""
+    real = kc.load_faq()
+    rng = random.Random(seed)
+    entries = list(real[:rows])
+    while len(entries) < rows:
+        topic, product = rng.choice(TOPICS), rng.choice(PRODUCTS)
+        question = f"{product} {rng.choice(SITUATIONS)} {topic} {rng.choice(ENDINGS)}"
+        answer = (f"{product} {topic} 관련 안내입니다. 마이페이지 > 주문내역에서 신청하신 뒤 "
+                  f"{rng.randint(1, 14)}일 이내에 처리되며, 자세한 사항은 고객센터로 문의해주세요. (#{len(entries)})")
+        entries.append({"question": question, "answer": answer})
+    return entries
+
+
+def synthetic_queries(faq: Sequence[Dict[str, str]], count: int, seed: int = 0) -> List[str]:
+    """FAQ 질문 그대로 / 어순·어미 변형 / 복합·불만 문의 / 확인 응답 / 무관한 질문을 섞은 질문 세트"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            queries.append(rng.choice(faq)["question"])
+        elif kind == 1:
+            words = rng.choice(faq)["question"].rstrip("?").split()
+            rng.shuffle(words)
+            queries.append(" ".join(words[:max(2, len(words) - 1)]) + " " + rng.choice(ENDINGS))
+        elif kind == 2:
+            queries.append(rng.choice(COMPOUND))
+        elif kind == 3:
+            queries.append(rng.choice(CONFIRMATIONS))
+        else:
+            queries.append(rng.choice(UNRELATED))
+    return queries
+
+
+def synthetic_histories(queries: Sequence[str], turns: int, count: int, seed: int = 0) -> List[List[Dict[str, str]]]:
+    rng = random.Random(seed)
+    answers = [item["answer"] for item in kc.get_faq_list()]
+    histories = []
+    for _ in range(count):
+        history = []
+        for turn in range(turns):
+            history.append({"role": "user", "content": rng.choice(queries)})
+            if turn < turns - 1:
+                history.append({"role": "bot", "content": "안녕하세요! 노피🤖입니다. " + rng.choice(answers)})
+        histories.append(history)
+    return histories
+
+
+def install_faq(entries: List[Dict[str, str]], workdir: Path) -> None:
+    """CSV로 써서 load_faq로 다시 읽음 (운영과 같은 로드 경로 + 검색 캐시 초기화)"""
+    path = workdir / f"faq_{len(entries)}.csv"
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["", "question", "answer"])
+        for i, item in enumerate(entries, 1):
+            writer.writerow([i, item["question"], item["answer"]])
+    kc.load_faq(path)
+
+
+def clear_faq_cache() -> None:
+    with kc._faq_cache_lock:
+        kc._faq_cache.clear()
+
+
+class Bench:
+    """함수 하나의 측정 (args_list를 순환하며 호출, setup은 호출마다 시간 밖에서 실행)"""
+
+    def __init__(self, name: str, func: Callable[..., Any], args_list: Sequence[tuple],
+                 setup: Optional[Callable[[], None]] = None, per_call: int = 1):
+        self.name = name
+        self.func = func
+        self.args_list = args_list
+        self.setup = setup
+        self.per_call = per_call  # 한 번 호출이 처리하는 항목 수 (batch)
+
+    def time(self, min_time: float, min_calls: int, max_calls: int) -> Dict[str, float]:
+        samples: List[float] = []
+        started = time.perf_counter()
+        gc.collect()
+        while (time.perf_counter() - started < min_time or len(samples) * self.per_call < min_calls) and len(samples) < max_calls:
+            args = self.args_list[len(samples) % len(self.args_list)]
+            if self.setup:
+                self.setup()
+            t0 = time.perf_counter_ns()
+            self.func(*args)
+            samples.append((time.perf_counter_ns() - t0) / 1000 / self.per_call)
+        ordered = sorted(samples)
+        return {
+            "calls": len(samples),
+            "median_us": round(statistics.median(ordered), 3),
+            "p95_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "mean_us": round(statistics.mean(ordered), 3),
+        }
+
+    def memory(self, calls: int, top: int, max_time: float) -> Dict[str, Any]:
+        """tracemalloc으로 최대 calls번(max_time초까지) 실행 - 호출당 최대 사용량, 할당 블록 수, 호출 후 남은 메모리"""
+        calls = max(1, min(calls, len(self.args_list)))
+        if self.setup:
+            self.setup()
+        gc.collect()
+        tracemalloc.start(25 if top else 1)
+        try:
+            before = tracemalloc.take_snapshot()
+            peaks = []
+            started = time.perf_counter()
+            for args in self.args_list[:calls]:
+                if peaks and time.perf_counter() - started > max_time:
+                    break
+                if self.setup:
+                    self.setup()
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                self.func(*args)
+                peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        diff = after.compare_to(before, "lineno")
+        result: Dict[str, Any] = {
+            "peak_kb": round(max(peaks) / 1024 / self.per_call, 3),
+            "retained_kb": round(sum(stat.size_diff for stat in diff) / 1024 / len(peaks) / self.per_call, 3),
+            "blocks_retained": round(sum(stat.count_diff for stat in diff) / len(peaks) / self.per_call, 2),
+        }
+        if top:
+            result["top_allocations"] = [
+                {"where": str(stat.traceback[0]), "size_kb": round(stat.size_diff / 1024, 2), "blocks": stat.count_diff}
+                for stat in sorted(diff, key=lambda s: -abs(s.size_diff))[:top]
+            ]
+        return result
+
+
+def faq_benches(size: int, queries: List[str], batch_size: int) -> Tuple[List[Bench], Callable[[], None]]:
+    unique = [(query,) for query in dict.fromkeys(queries)]
+    # 큰 FAQ에서는 호출 하나가 수십 초 걸리지 않도록 배치 크기를 줄임 (결과는 질문당 시간)
+    batch_size = max(2, min(batch_size, batch_size * 1000 // size))
+    batches = [(queries[i:i + batch_size],) for i in range(0, len(queries) - batch_size + 1, batch_size)] or [(queries,)]
+
+    # 캐시 적중 비용은 FAQ 크기와 무관하므로 질문 몇 개만 미리 적재
+    warm = unique[:5]
+
+    def warm_up_cache():
+        kc.search_faq_batch([query for (query,) in warm])
+
+    return [
+        Bench(f"search_faq/cold/{size}", kc._search_faq, unique, setup=clear_faq_cache),
+        Bench(f"search_faq/warm/{size}", kc._search_faq, warm),
+        Bench(f"search_faq_batch/{size}", kc.search_faq_batch, batches, setup=clear_faq_cache,
+              per_call=len(batches[0][0])),
+    ], warm_up_cache
+
+
+def rule_benches(queries: List[str]) -> List[Bench]:
+    args = [(query,) for query in queries]
+    analyses = [kc._analyze_query_complexity_detailed(query) for query in queries]
+    mode_args = [(a["complexity"], a["type"], a["urgency"], i % 3 == 0) for i, a in enumerate(analyses)]
+    benches = [
+        Bench("find_intent_match", kc._find_intent_match, args),
+        Bench("analyze_query_complexity_detailed", kc._analyze_query_complexity_detailed, args),
+        Bench("select_optimal_mode", kc._select_optimal_mode, mode_args),
+        Bench("is_confirmation", kc._is_confirmation, args),
+    ]
+    for turns in (1, 5, 20):
+        histories = [(history,) for history in synthetic_histories(queries, turns, 50)]
+        benches.append(Bench(f"build_conversation_context/{turns}turns", kc._build_conversation_context, histories))
+    return benches
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results: Dict[str, Any] = {}
+
+    def measure(bench: Bench) -> None:
+        if args.only and not any(bench.name.startswith(prefix) for prefix in args.only.split(",")):
+            return
+        entry = bench.time(args.min_time, args.min_calls, args.max_calls)
+        entry.update(bench.memory(args.memory_calls, args.top, args.min_time))
+        results[bench.name] = entry
+        print(f"  {bench.name:<42} {entry['median_us']:>12.2f}µs  p95 {entry['p95_us']:>12.2f}µs  "
+              f"peak {entry['peak_kb']:>9.2f}KB  blocks {entry['blocks_retained']:>7.1f}  ({entry['calls']}회)")
+        for alloc in entry.get("top_allocations", []):
+            print(f"      {alloc['size_kb']:>9.2f}KB {alloc['blocks']:>6}  {alloc['where']}")
+
+    print("규칙 기반 함수")
+    base_queries = synthetic_queries(kc.get_faq_list(), args.queries, seed=args.seed)
+    for bench in rule_benches(base_queries):
+        measure(bench)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            entries = synthetic_faq(size, seed=args.seed)
+            tracemalloc.start()
+            install_faq(entries, Path(tmp))
+            corpus_kb = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            print(f"FAQ {size}행 (로드 후 메모리 {corpus_kb:,.0f}KB)")
+            results[f"faq_corpus/{size}"] = {"rows": size, "memory_kb": round(corpus_kb, 1)}
+            queries = synthetic_queries(entries, args.queries, seed=args.seed)
+            benches, warm_up_cache = faq_benches(size, queries, args.batch_size)
+            for bench in benches:
+                if "/warm/" in bench.name:
+                    warm_up_cache()
+                measure(bench)
+    kc.load_faq()
+    return {
+        "python": sys.version.split()[0],
+        "config": {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline")},
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, memory_threshold: float) -> bool:
+    """기준 대비 중앙값(및 메모리 최대 사용량) 변화 - threshold(%) 넘게 나빠진 항목이 있으면 False"""
+    ok = True
+    print(f"\n기준과 비교 (허용: 시간 +{threshold}%, 메모리 +{memory_threshold}%)")
+    for name, entry in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_us" not in entry:
+            continue
+        change = (entry["median_us"] - base["median_us"]) / base["median_us"] * 100 if base["median_us"] else 0.0
+        memory_change = ((entry["peak_kb"] - base["peak_kb"]) / base["peak_kb"] * 100
+                         if base.get("peak_kb") else 0.0)
+        failed = change > threshold or (memory_threshold and memory_change > memory_threshold)
+        ok = ok and not failed
+        print(f"  {'❌' if failed else '  '} {name:<42} {base['median_us']:>10.2f} → {entry['median_us']:>10.2f}µs "
+              f"({change:+6.1f}%)  peak {memory_change:+6.1f}%")
+    if current["python"] != baseline.get("python"):
+        print(f"⚠️  Python 버전이 다름 ({baseline.get('python')} → {current['python']})")
+    return ok
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="규칙 기반 핫 패스 마이크로 벤치마크")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="FAQ 행 수 목록")
+    parser.add_argument("--queries", type=int, default=200, help="질문 세트 크기")
+    parser.add_argument("--batch-size", type=int, default=50, help="search_faq_batch 호출당 질문 수")
+    parser.add_argument("--min-time", type=float, default=0.5, help="함수별 최소 측정 시간 (초)")
+    parser.add_argument("--min-calls", type=int, default=3, help="함수별 최소 처리 질문 수 (큰 FAQ의 cold 검색은 질문당 수 초)")
+    parser.add_argument("--max-calls", type=int, default=200_000, help="함수별 최대 호출 수")
+    parser.add_argument("--memory-calls", type=int, default=20, help="tracemalloc 측정 호출 수")
+    parser.add_argument("--top", type=int, default=0, help="할당 위치 상위 N개 표시")
+    parser.add_argument("--only", default="", help="이름이 이 접두어로 시작하는 벤치마크만 (쉼표 구분)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="비교할 기준 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=25.0, help="허용 중앙값 증가율 (%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.0, help="허용 peak 메모리 증가율 (%%, 0이면 검사 안 함)")
+    parser.add_argument("--save-baseline", help="결과를 기준으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n💾 기준 저장: {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if not compare(report, baseline, args.threshold, args.memory_threshold):
+            print(f"❌ 기준보다 {args.threshold}% 넘게 느려진 항목이 있습니다", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+요청 취소 유틸리티
+고객이 위젯을 닫거나 재시도해 연결이 끊기면 진행 중인 파이프라인(LLM 호출, MCP 서브프로세스)을 중단
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+from log_config import get_logger
+from metrics import ABANDONED_WORK
+
+logger = get_logger(__name__)
+
+# 연결 종료 확인 주기 (초)
+DISCONNECT_POLL_INTERVAL = 0.25
+
+# nginx 관례: 클라이언트가 응답 전에 연결을 닫음
+CLIENT_CLOSED_REQUEST = 499
+
+
+class RequestCancelled(BaseException):
+    """고객 연결 종료로 파이프라인이 중단되었음을 알리는 예외
+
+    파이프라인 곳곳의 `except Exception` 폴백이 취소를 삼키고
+    다시 LLM을 호출하지 않도록 BaseException을 상속한다.
+    """
+
+
+class CancelScope:
+    """한 요청의 파이프라인 작업을 묶는 취소 범위 (스레드 안전)"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """취소 표시 후 등록된 콜백(프로세스 kill, HTTP 호출 중단 등) 실행"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancel callback failed: {e}")
+
+    def register(self, callback: Callable[[], Any]) -> Callable[[], None]:
+        """취소 시 실행할 콜백 등록. 해제 함수를 반환"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            callback()
+
+        def unregister() -> None:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unregister
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled()
+
+
+_current_scope: contextvars.ContextVar[Optional[CancelScope]] = contextvars.ContextVar(
+    "kenopi_cancel_scope", default=None
+)
+
+
+def current_scope() -> Optional[CancelScope]:
+    """현재 실행 컨텍스트의 취소 범위 (없으면 None)"""
+    return _current_scope.get()
+
+
+def scoped_context(scope: CancelScope) -> contextvars.Context:
+    """scope를 취소 범위로 갖는 현재 컨텍스트의 복사본 (워커 스레드에서 ctx.run으로 실행)"""
+    token = _current_scope.set(scope)
+    try:
+        return contextvars.copy_context()
+    finally:
+        _current_scope.reset(token)
+
+
+def check_cancelled() -> None:
+    """취소된 요청이면 RequestCancelled 발생 - 비싼 단계 직전에 호출"""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.raise_if_cancelled()
+
+
+def register_cancel_callback(callback: Callable[[], Any]) -> Callable[[], None]:
+    """현재 취소 범위에 콜백 등록 (범위가 없으면 아무 것도 하지 않음)"""
+    scope = _current_scope.get()
+    if scope is None:
+        return lambda: None
+    return scope.register(callback)
+
+
+def run_on_loop(coro_factory: Callable[[], Any], fallback: Callable[[], Any]) -> Any:
+    """워커 스레드에서 코루틴을 요청의 이벤트 루프로 실행하고 결과를 기다림
+
+    취소 범위가 취소되면 루프의 태스크도 취소되어 진행 중인 HTTP 호출이 중단된다.
+    취소 범위(또는 루프)가 없으면 동기 fallback()을 그대로 호출한다.
+    """
+    scope = _current_scope.get()
+    if scope is None or scope.loop is None or scope.loop.is_closed():
+        return fallback()
+
+    scope.raise_if_cancelled()
+    future = asyncio.run_coroutine_threadsafe(coro_factory(), scope.loop)
+    unregister = scope.register(future.cancel)
+    try:
+        return future.result()
+    except concurrent.futures.CancelledError:
+        record_abandoned("llm_calls_aborted")
+        raise RequestCancelled()
+    finally:
+        unregister()
+
+
+# 버려진 작업 종류 (kenopi_abandoned_work_total 메트릭의 kind 라벨)
+ABANDONED_KINDS = ("requests", "mcp_processes_killed", "llm_calls_aborted")
+
+
+def record_abandoned(kind: str) -> None:
+    ABANDONED_WORK.inc(kind=kind)
+
+
+def abandoned_work_stats() -> Dict[str, int]:
+    return {kind: int(ABANDONED_WORK.value(kind=kind)) for kind in ABANDONED_KINDS}
+
+
+async def run_cancellable(request: Request, func: Callable[..., Any], *args: Any) -> Any:
+    """동기 파이프라인 함수를 스레드풀에서 실행하면서 클라이언트 연결 종료를 감시
+
+    연결이 끊기면 취소 범위를 취소하고 499 응답으로 즉시 반환한다.
+    (워커 스레드는 다음 취소 지점에서 RequestCancelled로 종료)
+    """
+    loop = asyncio.get_running_loop()
+    scope = CancelScope(loop)
+    ctx = scoped_context(scope)
+    future = loop.run_in_executor(None, ctx.run, func, *args)
+    try:
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                break
+            if await request.is_disconnected():
+                scope.cancel()
+                record_abandoned("requests")
+                future.add_done_callback(discard_result)
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except asyncio.CancelledError:
+        # 서버 종료 등으로 핸들러 자체가 취소된 경우
+        scope.cancel()
+        record_abandoned("requests")
+        future.add_done_callback(discard_result)
+        raise
+
+    try:
+        return future.result()
+    except RequestCancelled:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+
+
+def discard_result(future: "asyncio.Future[Any]") -> None:
+    """버려진 작업의 결과/예외를 소비해 'exception was never retrieved' 경고 방지"""
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,155 @@
+"""
+토큰 예산 기반 대화 컨텍스트
+최근 메시지는 예산 안에서 원문 그대로, 그보다 오래된 메시지는 요약 줄(메시지당 한 줄)로 접어서
+대화가 길어져도 프롬프트 크기가 일정하게 유지되도록 함
+
+- 요약은 접는 경계를 step 메시지 단위로만 옮기므로 step 턴 동안은 같은 요약을 재사용 (앞부분도 그대로 유지)
+- 요약은 대화 내용의 연쇄 해시로 캐시되어, 경계가 옮겨질 때 이전 요약에 새 메시지만 이어 붙임
+- 예산을 넘은 원문과 요약 경계 사이의 메시지는 요약과 같은 한 줄 형식으로 포함
+
+환경변수: KENOPI_CONTEXT_TOKENS(1500), KENOPI_CONTEXT_SUMMARY_TOKENS(300),
+          KENOPI_CONTEXT_SUMMARY_STEP(4), KENOPI_CONTEXT_CACHE_SIZE(1024)
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from metrics import Counter
+from token_usage import estimate_tokens
+
+CONTEXT_TOKENS = int(os.getenv("KENOPI_CONTEXT_TOKENS", "1500"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("KENOPI_CONTEXT_SUMMARY_TOKENS", "300"))
+CONTEXT_SUMMARY_STEP = int(os.getenv("KENOPI_CONTEXT_SUMMARY_STEP", "4"))
+CONTEXT_CACHE_SIZE = int(os.getenv("KENOPI_CONTEXT_CACHE_SIZE", "1024"))
+
+# 요약 줄 하나의 최대 글자 수
+SUMMARY_LINE_CHARS = 80
+
+CONTEXT_SUMMARIES = Counter(
+    "kenopi_context_summary_total",
+    "Rolling summary lookups (hit: reused, extended: built on a cached summary, built: from scratch)",
+    ["result"],
+)
+
+# 요약 상태: (요약 줄들, 예산 때문에 버린 오래된 줄 수)
+SummaryState = Tuple[Tuple[str, ...], int]
+
+
+def _role_label(message: Dict[str, str]) -> str:
+    return "고객" if message["role"] == "user" else "케노피"
+
+
+def summary_line(message: Dict[str, str]) -> str:
+    """메시지 → 요약 한 줄 (첫 줄만, 길면 자름)"""
+    text = " ".join(message["content"].strip().split("\n", 1)[0].split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 1] + "…"
+    return f"{_role_label(message)}: {text}"
+
+
+def _chain_hash(previous: str, messages: List[Dict[str, str]]) -> str:
+    digest = hashlib.sha1(previous.encode())
+    for message in messages:
+        digest.update(b"\x00" + message["role"].encode() + b"\x00" + message["content"].encode())
+    return digest.hexdigest()
+
+
+class ConversationContext:
+    """요약(없으면 None) + 접힌 메시지 줄 + 원문 그대로 보낼 최근 메시지"""
+
+    def __init__(self, summary: Optional[str], recent: List[Dict[str, str]]):
+        self.summary = summary
+        self.recent = recent
+
+    def as_text(self) -> str:
+        parts = [self.summary] if self.summary else []
+        parts.extend(f"{_role_label(message)}: {message['content']}" for message in self.recent)
+        return "\n".join(parts) if parts else "첫 번째 문의입니다."
+
+
+class ContextBuilder:
+    def __init__(self, budget_tokens: int = 1500, summary_tokens: int = 300, step: int = 4,
+                 cache_size: int = 1024):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.step = max(1, step)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, SummaryState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ContextBuilder":
+        return cls(budget_tokens=CONTEXT_TOKENS, summary_tokens=CONTEXT_SUMMARY_TOKENS,
+                   step=CONTEXT_SUMMARY_STEP, cache_size=CONTEXT_CACHE_SIZE)
+
+    def build(self, history: List[Dict[str, str]]) -> ConversationContext:
+        if not history:
+            return ConversationContext(None, [])
+
+        # 최근 메시지: 마지막 메시지는 항상 포함, 나머지는 예산 안에서 최신순으로
+        recent_budget = self.budget_tokens - self.summary_tokens - estimate_tokens(history[-1]["content"])
+        first_recent = len(history) - 1
+        while first_recent > 0:
+            tokens = estimate_tokens(history[first_recent - 1]["content"])
+            if tokens > recent_budget:
+                break
+            recent_budget -= tokens
+            first_recent -= 1
+        if first_recent == 0:
+            return ConversationContext(None, list(history))
+
+        # 요약 경계는 step 단위로만 이동 (경계 ~ 최근 메시지 사이는 한 줄씩)
+        boundary = first_recent // self.step * self.step
+        lines, omitted = self._summary(history, boundary)
+        pending = [summary_line(message) for message in history[boundary:first_recent]]
+        header = f"이전 대화 요약 (앞선 {first_recent}개 메시지"
+        header += f", 오래된 {omitted}개 생략):" if omitted else "):"
+        summary = "\n".join([header, *(f"- {line}" for line in (*lines, *pending))])
+        return ConversationContext(summary, list(history[first_recent:]))
+
+    def _summary(self, history: List[Dict[str, str]], boundary: int) -> SummaryState:
+        """history[:boundary]의 요약 - 캐시된 가장 긴 앞부분 요약에 나머지만 이어 붙임"""
+        if boundary == 0:
+            return (), 0
+        keys = []
+        key = ""
+        for start in range(0, boundary, self.step):
+            key = _chain_hash(key, history[start:start + self.step])
+            keys.append(key)
+
+        with self._lock:
+            for index in range(len(keys) - 1, -1, -1):
+                state = self._cache.get(keys[index])
+                if state is not None:
+                    self._cache.move_to_end(keys[index])
+                    break
+            else:
+                index, state = -1, ((), 0)
+        if index == len(keys) - 1:
+            CONTEXT_SUMMARIES.inc(result="hit")
+            return state
+        CONTEXT_SUMMARIES.inc(result="extended" if index >= 0 else "built")
+
+        lines, omitted = list(state[0]), state[1]
+        for chunk in range(index + 1, len(keys)):
+            lines.extend(summary_line(message) for message in history[chunk * self.step:(chunk + 1) * self.step])
+            # 예산을 넘으면 오래된 줄부터 버림 (첫 문의 줄은 대화 주제이므로 마지막까지 유지)
+            while len(lines) > 1 and sum(estimate_tokens(line) for line in lines) > self.summary_tokens:
+                lines.pop(1)
+                omitted += 1
+            self._put(keys[chunk], (tuple(lines), omitted))
+        return tuple(lines), omitted
+
+    def _put(self, key: str, state: SummaryState) -> None:
+        with self._lock:
+            self._cache[key] = state
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+# 전역 인스턴스
+context_builder = ContextBuilder.from_env()
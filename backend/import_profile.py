@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+콜드 스타트 / import 시간 측정 리포트
+새 프로세스에서 `import main` → 첫 FAQ 답변까지의 시간을 여러 번 측정하고,
+-X importtime 결과를 최상위 패키지별로 묶어 가장 오래 걸리는 import를 보여줌
+
+- 기본은 FAQ 전용 배포 조건 (OPENAI_API_KEY / LANGSMITH_API_KEY 제거)
+- LLM/추적 클라이언트 관련 무거운 패키지가 import 시점에 로드되면 경고 (첫 사용 시 로드되어야 함)
+- --budget 초과 시 종료 코드 1 (CI 확인용)
+
+사용 예:
+    python import_profile.py
+    python import_profile.py --runs 5 --top 15 --budget 1.0
+    python import_profile.py --keep-env   # 현재 환경변수(API 키 포함) 그대로 측정
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# 첫 LLM 호출/추적 내보내기 시점에만 로드되어야 하는 패키지
+LAZY_PACKAGES = ("langchain_openai", "langchain", "langchain_core", "langsmith", "openai", "tiktoken")
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from kenopi_chatbot import FAQ_PATH, generate_response, get_faq_list
+question = get_faq_list()[0]["question"] if FAQ_PATH.exists() else "환불은 어떻게 하면 되나요?"
+generate_response([{"role": "user", "content": question}])
+answered = time.perf_counter()
+lazy = sorted(name for name in sys.modules if name.split(".")[0] in %r and "." not in name)
+print(json.dumps({"import_s": imported - started, "first_answer_s": answered - imported, "loaded": lazy}))
+""" % (LAZY_PACKAGES,)
+
+
+def _child_env(keep_env: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    if not keep_env:
+        for name in ("OPENAI_API_KEY", "LANGSMITH_API_KEY", "LANGCHAIN_API_KEY"):
+            env.pop(name, None)
+    env.setdefault("KENOPI_LOG_LEVEL", "ERROR")
+    env["PYTHONPATH"] = str(BACKEND_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_once(env: Dict[str, str], importtime: bool) -> Tuple[float, Dict, str]:
+    """프로세스 1회 실행 (전체 소요 시간, 자식 측정값, importtime 출력)"""
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _CHILD]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return wall, result, proc.stderr
+
+
+def parse_importtime(stderr: str) -> Tuple[Dict[str, float], float]:
+    """최상위 패키지별 self 시간 합계(초)와 전체 import 시간(초)"""
+    by_package: Dict[str, float] = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        package = name.strip().split(".")[0]
+        by_package[package] = by_package.get(package, 0.0) + int(self_us) / 1e6
+        if not name.startswith("  "):  # 들여쓰기 없는 줄 = 최상위 import
+            total_us += int(cumulative_us)
+    return by_package, total_us / 1e6
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="콜드 스타트 / import 시간 측정")
+    parser.add_argument("--runs", type=int, default=3, help="측정 반복 횟수 (중앙값 사용)")
+    parser.add_argument("--top", type=int, default=10, help="표시할 최상위 패키지 수")
+    parser.add_argument("--budget", type=float, default=0.0, help="콜드 스타트 중앙값 허용치 (초, 0이면 검사 안 함)")
+    parser.add_argument("--keep-env", action="store_true", help="API 키를 제거하지 않고 현재 환경 그대로 측정")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    env = _child_env(args.keep_env)
+    runs = [measure_once(env, importtime=False) for _ in range(max(1, args.runs))]
+    _, last, importtime_stderr = measure_once(env, importtime=True)
+    by_package, import_total = parse_importtime(importtime_stderr)
+
+    report = {
+        "mode": "current-env" if args.keep_env else "faq-only",
+        "runs": len(runs),
+        "cold_start_s": round(statistics.median(wall for wall, _, _ in runs), 3),
+        "import_main_s": round(statistics.median(result["import_s"] for _, result, _ in runs), 3),
+        "first_answer_s": round(statistics.median(result["first_answer_s"] for _, result, _ in runs), 3),
+        "importtime_total_s": round(import_total, 3),
+        "top_packages": [
+            {"package": package, "self_s": round(seconds, 3)}
+            for package, seconds in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]
+        ],
+        "eager_heavy_imports": last["loaded"],
+    }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"모드: {report['mode']} ({report['runs']}회 중앙값)")
+        print(f"콜드 스타트 (프로세스 시작 → 첫 FAQ 답변): {report['cold_start_s']:.3f}s")
+        print(f"  import main: {report['import_main_s']:.3f}s, 첫 답변: {report['first_answer_s']:.3f}s")
+        print(f"import 시간 합계 (-X importtime): {report['importtime_total_s']:.3f}s")
+        print("패키지별 import self 시간:")
+        for item in report["top_packages"]:
+            print(f"  {item['package']:<28} {item['self_s']:.3f}s")
+        if report["eager_heavy_imports"]:
+            print(f"⚠️  첫 사용 전에 로드된 무거운 패키지: {', '.join(report['eager_heavy_imports'])}")
+
+    if args.budget and report["cold_start_s"] > args.budget:
+        print(f"❌ 콜드 스타트 {report['cold_start_s']:.3f}s > 허용치 {args.budget:.3f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+비동기 작업(Job) 저장소
+고급 모드 응답처럼 오래 걸리는 대화를 제한된 워커 풀에서 처리하고 결과를 일정 기간 보관
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from cancellation import CancelScope, RequestCancelled, record_abandoned, scoped_context
+
+# 작업 API(/kenopi/jobs) 사용 여부 - 저장소가 프로세스 메모리에 있으므로 멀티 워커(serve.py)에서는 0이어야 함
+JOBS_API_ENABLED = os.getenv("KENOPI_JOBS_API", "1") != "0"
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """대기 중인 작업 수가 상한에 도달함"""
+
+
+class Job:
+    """단일 비동기 작업"""
+
+    def __init__(self, job_id: str, scope: CancelScope):
+        self.id = job_id
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.scope = scope
+        # 실행기 future를 직접 보관 (asyncio 래퍼는 실행 중이어도 취소되어 작업이 끝난 것처럼 보이므로)
+        self.future: Optional["Future[Any]"] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """제한된 워커 풀 + TTL 만료 + 결과 보관 개수 제한을 갖는 인메모리 작업 저장소"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100,
+                 ttl_seconds: float = 600.0, max_results: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kenopi-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        return cls(
+            max_workers=int(os.getenv("KENOPI_JOB_WORKERS", "4")),
+            max_pending=int(os.getenv("KENOPI_JOB_MAX_PENDING", "100")),
+            ttl_seconds=float(os.getenv("KENOPI_JOB_TTL_SECONDS", "600")),
+            max_results=int(os.getenv("KENOPI_JOB_MAX_RESULTS", "1000")),
+        )
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def submit(self, func: Callable[..., Dict[str, Any]], *args: Any) -> Job:
+        """작업 등록 후 즉시 반환 (이벤트 루프에서 호출)"""
+        self.evict()
+        if self.pending_count() >= self.max_pending:
+            raise JobQueueFull()
+
+        loop = asyncio.get_running_loop()
+        job = Job(uuid.uuid4().hex, CancelScope(loop))
+        ctx = scoped_context(job.scope)
+        job.future = self._executor.submit(ctx.run, self._run, job, func, args)
+        # 완료 처리는 이벤트 루프 스레드에서 (작업 목록은 루프에서만 변경)
+        job.future.add_done_callback(lambda fut: loop.call_soon_threadsafe(self._on_done, job, fut))
+        self._jobs[job.id] = job
+        return job
+
+    def _run(self, job: Job, func: Callable[..., Dict[str, Any]], args: tuple) -> Dict[str, Any]:
+        job.scope.raise_if_cancelled()
+        job.status = RUNNING
+        job.started_at = time.time()
+        return func(*args)
+
+    def _on_done(self, job: Job, future: "Future[Any]") -> None:
+        job.finished_at = time.time()
+        if future.cancelled():
+            job.status = CANCELLED
+            record_abandoned("requests")
+        else:
+            exc = future.exception()
+            if exc is None:
+                job.status = SUCCEEDED  # 취소 요청 전에 취소 지점을 모두 지났으면 결과를 그대로 보관
+                job.result = future.result()
+            elif isinstance(exc, RequestCancelled):
+                job.status = CANCELLED
+                record_abandoned("requests")
+            else:
+                job.status = FAILED
+                job.error = str(exc)
+        self._enforce_retention()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.evict()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """작업 완료 또는 timeout까지 대기 (long-poll)"""
+        if not job.finished and timeout > 0 and job.future is not None:
+            await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=timeout)
+            # done 콜백이 상태를 갱신할 기회를 준다
+            await asyncio.sleep(0)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        작업 취소 요청 - 대기 중이면 바로 cancelled, 실행 중이면 다음 취소 지점에서 멈출 때까지 running 유지
+        (실행 스레드가 끝나기 전에는 완료로 보지 않으므로 제거되지 않고 대기 작업 수에도 포함)
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.scope.cancel()
+        if job.future is not None:
+            job.future.cancel()
+        return job
+
+    def evict(self) -> None:
+        """TTL이 지난 완료 작업 제거"""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _enforce_retention(self) -> None:
+        """완료 작업 결과를 최대 max_results개까지만 보관 (오래된 것부터 제거)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_results)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "ttl_seconds": self.ttl_seconds,
+            "max_results": self.max_results,
+            "jobs": counts,
+        }
+
+    def shutdown(self) -> None:
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                job.scope.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 전역 인스턴스
+job_store = JobStore.from_env()
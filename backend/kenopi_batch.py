@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+대용량 문의 덤프 오프라인 일괄 처리 CLI
+과거 문의 JSONL/CSV 내보내기 파일을 스트리밍으로 읽어 generate_response / generate_advanced_response 실행
+
+- 입력은 제너레이터로 한 줄씩 읽고, 동시에 처리 중인 항목 수를 제한해 메모리 사용량 일정
+- 결과는 완료 순서대로 JSONL에 즉시 기록
+- 체크포인트(처리 완료 지점)를 주기적으로 저장하고, --resume 시 완료된 항목은 건너뜀
+
+사용 예:
+    python kenopi_batch.py inquiries.jsonl -o answers.jsonl --mode advanced --workers 8
+    python kenopi_batch.py inquiries.jsonl -o answers.jsonl --mode advanced --workers 8 --resume
+
+입력 형식:
+    JSONL: {"id": "...", "messages": [{"role": "user", "content": "..."}]} 또는 {"id": "...", "query": "..."}
+    CSV:   id(선택) + query/question/content 열, 또는 messages 열(JSON)
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from kenopi_chatbot import generate_advanced_response, generate_response
+
+QUERY_FIELDS = ("query", "question", "content")
+
+Item = Tuple[int, str, List[Dict[str, str]]]
+
+
+def _to_messages(record: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+    messages = record.get("messages")
+    if isinstance(messages, str):
+        messages = json.loads(messages)
+    if isinstance(messages, list):
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+    for field in QUERY_FIELDS:
+        if record.get(field):
+            return [{"role": "user", "content": str(record[field])}]
+    return None
+
+
+def _parse_line(line: str) -> Any:
+    """JSONL 한 줄 파싱 (깨진 줄은 None - 오류 레코드로 기록)"""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def iter_items(path: Path) -> Iterator[Item]:
+    """입력 파일을 (index, id, messages)로 한 건씩 읽기 - index는 재개 시에도 동일한 레코드 순번
+    
+    깨진 줄이나 객체가 아닌 레코드는 messages=[]로 넘겨 오류 레코드로 기록 (순번 유지)
+    """
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            records: Iterator[Any] = csv.DictReader(f)
+        else:
+            records = (_parse_line(line) for line in f if line.strip())
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                yield index, str(index), []
+                continue
+            item_id = str(record.get("id") or index)
+            try:
+                messages = _to_messages(record)
+            except (ValueError, KeyError, TypeError):
+                messages = None
+            yield index, item_id, messages or []
+
+
+class Checkpoint:
+    """
+    처리 진행 상황
+    - watermark: 이 번호 미만의 항목은 모두 완료
+    - done_above: watermark 이상이지만 먼저 완료된 항목 번호 (처리 창 크기로 제한됨)
+    - output_offset: 체크포인트 시점의 출력 파일 크기 (재개 시 그 이후 기록만 다시 확인)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.watermark = 0
+        self.done_above: Set[int] = set()
+        self.output_offset = 0
+        self.processed = 0
+        self.errors = 0
+
+    def mark_done(self, index: int) -> None:
+        self.done_above.add(index)
+        while self.watermark in self.done_above:
+            self.done_above.remove(self.watermark)
+            self.watermark += 1
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done_above
+
+    def load(self) -> None:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        self.watermark = data["watermark"]
+        self.done_above = set(data["done_above"])
+        self.output_offset = data["output_offset"]
+        self.processed = data.get("processed", 0)
+        self.errors = data.get("errors", 0)
+
+    def save(self, output_offset: int) -> None:
+        self.output_offset = output_offset
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps({
+            "watermark": self.watermark,
+            "done_above": sorted(self.done_above),
+            "output_offset": output_offset,
+            "processed": self.processed,
+            "errors": self.errors,
+            "updated_at": time.time(),
+        }), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def _recover_output(output_path: Path, checkpoint: Checkpoint) -> None:
+    """마지막 체크포인트 이후 출력에 기록된 항목을 완료로 반영하고, 잘린 마지막 줄 제거"""
+    if not output_path.exists():
+        return
+    with output_path.open("rb+") as f:
+        f.seek(checkpoint.output_offset)
+        valid_end = checkpoint.output_offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # 기록 도중 중단된 줄
+            record = json.loads(line)
+            checkpoint.mark_done(record["index"])
+            checkpoint.processed += 1
+            valid_end += len(line)
+        f.truncate(valid_end)
+
+
+def _process(mode: str, item: Item) -> Dict[str, Any]:
+    index, item_id, messages = item
+    started = time.perf_counter()
+    try:
+        if not messages:
+            raise ValueError("질문을 읽을 수 없는 레코드 (JSON 형식 또는 query/messages 필드 확인)")
+        if mode == "advanced":
+            record: Dict[str, Any] = dict(generate_advanced_response(messages))
+        else:
+            record = {"response": generate_response(messages, auto_mode=True)}
+    except Exception as e:
+        record = {"error": str(e)}
+    record.update(index=index, id=item_id, elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+    return record
+
+
+def run(args: argparse.Namespace) -> int:
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+    checkpoint = Checkpoint(Path(args.checkpoint or f"{args.output}.ckpt"))
+
+    if args.resume and checkpoint.path.exists():
+        checkpoint.load()
+        _recover_output(output_path, checkpoint)
+        print(f"♻️ 재개: {checkpoint.watermark}번 이전 항목 + {len(checkpoint.done_above)}건 완료 상태", file=sys.stderr)
+    elif output_path.exists() and output_path.stat().st_size > 0 and not args.overwrite:
+        print(f"❌ 출력 파일이 이미 있습니다: {output_path} (--resume 또는 --overwrite 사용)", file=sys.stderr)
+        return 2
+    else:
+        output_path.write_bytes(b"")
+
+    in_flight_limit = args.workers * 4
+    # 느린 항목 하나 때문에 done_above가 무한히 커지지 않도록 watermark 앞으로 허용할 최대 거리
+    window_limit = max(in_flight_limit * 16, 1000)
+
+    started = time.perf_counter()
+    last_report = last_checkpoint = started
+    processed_at_start = checkpoint.processed
+    last_report_count = checkpoint.processed
+    in_flight: Dict[Future, int] = {}
+
+    items = (item for item in iter_items(input_path) if not checkpoint.is_done(item[0]))
+    if args.limit:
+        items = itertools.islice(items, args.limit)
+    pending_item: Optional[Item] = None
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, output_path.open("ab") as out:
+        try:
+            while True:
+                # 처리 창 안에서 새 항목 투입
+                while not exhausted and len(in_flight) < in_flight_limit:
+                    if pending_item is None:
+                        pending_item = next(items, None)
+                        if pending_item is None:
+                            exhausted = True
+                            break
+                    if pending_item[0] - checkpoint.watermark >= window_limit:
+                        break
+                    in_flight[executor.submit(_process, args.mode, pending_item)] = pending_item[0]
+                    pending_item = None
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.pop(future)
+                    record = future.result()
+                    out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    checkpoint.mark_done(record["index"])
+                    checkpoint.processed += 1
+                    if "error" in record:
+                        checkpoint.errors += 1
+
+                now = time.perf_counter()
+                if now - last_checkpoint >= args.checkpoint_interval:
+                    out.flush()
+                    os.fsync(out.fileno())
+                    checkpoint.save(out.tell())
+                    last_checkpoint = now
+                if now - last_report >= args.report_interval:
+                    rate = (checkpoint.processed - last_report_count) / (now - last_report)
+                    print(f"⏱️ {checkpoint.processed}건 처리 | {rate:.1f} items/sec | 오류 {checkpoint.errors}건 "
+                          f"| 처리 중 {len(in_flight)}건", file=sys.stderr)
+                    last_report, last_report_count = now, checkpoint.processed
+        except KeyboardInterrupt:
+            print("\n⚠️ 중단 요청 - 체크포인트 저장 후 종료합니다 (--resume으로 재개)", file=sys.stderr)
+            for future in in_flight:
+                future.cancel()
+            return 130
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.save(out.tell())
+
+    elapsed = time.perf_counter() - started
+    done_now = checkpoint.processed - processed_at_start
+    print(f"✅ 완료: 이번 실행 {done_now}건 / 누적 {checkpoint.processed}건, 오류 {checkpoint.errors}건, "
+          f"{elapsed:.1f}초 ({done_now / elapsed if elapsed else 0:.1f} items/sec)", file=sys.stderr)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="케노피 문의 덤프 오프라인 일괄 처리")
+    parser.add_argument("input", help="입력 파일 (.jsonl 또는 .csv)")
+    parser.add_argument("-o", "--output", required=True, help="결과 JSONL 파일")
+    parser.add_argument("--mode", choices=["basic", "advanced"], default="advanced",
+                        help="basic: generate_response, advanced: generate_advanced_response")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint", help="체크포인트 파일 (기본값: <output>.ckpt)")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="체크포인트 저장 주기 (초)")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="처리량 출력 주기 (초)")
+    parser.add_argument("--limit", type=int, default=0, help="이번 실행에서 처리할 최대 항목 수")
+    parser.add_argument("--resume", action="store_true", help="체크포인트에서 이어서 처리")
+    parser.add_argument("--overwrite", action="store_true", help="기존 출력 파일 덮어쓰기")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,117 +1,272 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
 import os
+import contextvars
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from difflib import SequenceMatcher
 import csv
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
-from kenopi_prompt import (
-    KENOPI_SYSTEM_PROMPT, 
-    KENOPI_THINKING_PROMPT,
-    EMOTION_RESPONSIVE_PROMPT,
-    QUALITY_ASSURANCE_PROMPT
-)
+from cancellation import RequestCancelled, check_cancelled, run_on_loop
+from conversation_context import context_builder
+from log_config import get_logger
+from metrics import Counter
+from pipeline_trace import annotate, query_hash, record_fallback, record_usage, set_mode, stage, timed_stage
+from prompt_builder import build_basic_messages, build_rewrite_messages, build_thinking_context
+from query_splitter import split_compound_query
+from token_usage import llm_usage
+from tracing import tracer
+
+logger = get_logger(__name__)
 
 # Sequential Thinking MCP 통합
 try:
     from sequential_thinking_mcp import thinking_mcp
     THINKING_AVAILABLE = True
-    print("[Kenopi Chatbot] 🧠 Sequential Thinking MCP loaded successfully")
+    logger.info("Sequential Thinking MCP loaded")
 except ImportError as e:
-    print(f"[Kenopi Chatbot] ⚠️ Sequential Thinking not available: {e}")
+    logger.warning("Sequential Thinking not available", extra={"error": str(e)})
     THINKING_AVAILABLE = False
 
-# Map custom LANGSMITH_* env vars to LangChain expected keys
-if os.getenv("LANGSMITH_API_KEY") and not os.getenv("LANGCHAIN_API_KEY"):
-    os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
-if os.getenv("LANGSMITH_ENDPOINT") and not os.getenv("LANGCHAIN_ENDPOINT"):
-    os.environ["LANGCHAIN_ENDPOINT"] = os.getenv("LANGSMITH_ENDPOINT")
-# Handle tracing flag (사용자 오타 포함)
-tracing_flag = os.getenv("LANGSMITH_TRACING_V2") or os.getenv("LANGWSMITH_TRACING_V2")
-if tracing_flag and not os.getenv("LANGCHAIN_TRACING_V2"):
-    os.environ["LANGCHAIN_TRACING_V2"] = tracing_flag
-
-project_name_env = os.getenv("LANGSMITH_PROJECT", "kenopi-cs")
-
-# Enable LangSmith tracing via environment variables
-if os.getenv("LANGCHAIN_TRACING_V2") == "true":
-    print(f"[Kenopi Chatbot] LangSmith tracing enabled for project: {project_name_env}")
+# 추적은 tracing 모듈이 샘플링해서 내보냄 (전역 LANGCHAIN_TRACING_V2는 사용하지 않음)
+if tracer.enabled:
+    logger.info("Sampled tracing enabled", extra={"exporter": tracer.exporter.name})
 else:
-    print("[Kenopi Chatbot] LangSmith tracing disabled")
+    logger.info("Tracing export disabled")
+
+# FAQ 신뢰도 구간: high 이상은 FAQ 답변 그대로(LLM 미호출), mid 이상은 저가 모델로 재작성, 그 미만은 모드 선택
+FAQ_HIGH_THRESHOLD = float(os.getenv("KENOPI_FAQ_HIGH_THRESHOLD", "0.8"))
+FAQ_MID_THRESHOLD = float(os.getenv("KENOPI_FAQ_MID_THRESHOLD", "0.6"))
+REWRITE_MODEL = os.getenv("KENOPI_REWRITE_MODEL", "gpt-4o-mini")
+
+FAQ_TIERS = Counter("kenopi_faq_tier_total", "FAQ confidence tier of advanced-path queries", ["tier"])
+LLM_CALLS_AVOIDED = Counter(
+    "kenopi_llm_calls_avoided_total",
+    "Full-model/thinking calls avoided (faq_high: no model call, faq_mid: cheap rewrite instead)",
+    ["reason"],
+)
+
+# LangChain 설정 (OpenAI API 키가 있을 때만) - langchain_openai import와 클라이언트 생성은 첫 LLM 사용 시점으로 미룸
+_llm_clients: Optional[Tuple[Any, Any]] = None  # (기본 모델, FAQ 재작성 모델)
+_llm_lock = threading.Lock()
+
+def _create_llm_clients() -> Tuple[Any, Any]:
+    if not os.getenv("OPENAI_API_KEY"):
+        logger.warning("OpenAI API 키가 없습니다. FAQ 전용 모드로 실행됩니다.")
+        return None, None
+    try:
+        from langchain_openai import ChatOpenAI
 
-# LangChain 설정 (OpenAI API 키가 있을 때만)
-try:
-    if os.getenv("OPENAI_API_KEY"):
         llm = ChatOpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
             model="gpt-4o",
             temperature=0.3,
         )
-        print("INFO: GPT-4o 모델로 설정되었습니다.")
-    else:
-        llm = None
-        print("WARNING: OpenAI API 키가 없습니다. FAQ 전용 모드로 실행됩니다.")
-except Exception as e:
-    llm = None
-    print(f"WARNING: OpenAI 설정 실패: {e}. FAQ 전용 모드로 실행됩니다.")
-
-# Load FAQ dataset at import time
+        # 중간 신뢰도 FAQ 재작성용 저가 모델 (FAQ 답변 범위 안에서만 다듬음)
+        rewrite_llm = ChatOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model=REWRITE_MODEL,
+            temperature=0,
+            max_tokens=400,
+        )
+        logger.info("GPT-4o 모델로 설정되었습니다.")
+        return llm, rewrite_llm
+    except Exception as e:
+        logger.warning("OpenAI 설정 실패. FAQ 전용 모드로 실행됩니다.", extra={"error": str(e)})
+        return None, None
+
+def _get_llm_clients() -> Tuple[Any, Any]:
+    global _llm_clients
+    if _llm_clients is None:
+        with _llm_lock:
+            if _llm_clients is None:
+                _llm_clients = _create_llm_clients()
+    return _llm_clients
+
+def get_llm():
+    """기본 LLM (API 키가 없거나 설정 실패 시 None)"""
+    return _get_llm_clients()[0]
+
+def get_rewrite_llm():
+    """FAQ 재작성용 저가 LLM (API 키가 없거나 설정 실패 시 None)"""
+    return _get_llm_clients()[1]
+
+# FAQ 데이터셋은 첫 검색 시 로드
 FAQ_PATH = Path(__file__).parent / "data" / "kenopi_faq.csv"
-FAQ_LIST = []
-if FAQ_PATH.exists():
-    with FAQ_PATH.open("r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        next(reader)  # 헤더 스킵
-        for row in reader:
-            if len(row) >= 3 and row[1] and row[2]:  # 첫 번째는 번호, 두 번째는 질문, 세 번째는 답변
-                FAQ_LIST.append({"question": row[1], "answer": row[2]})
+_faq_list: Optional[List[Dict[str, str]]] = None
+
+def load_faq(path: Path = FAQ_PATH) -> List[Dict[str, str]]:
+    """FAQ CSV 로드 - 다시 로드하면 이전 데이터 기준의 검색 캐시도 비움"""
+    global _faq_list
+    entries = []
+    if path.exists():
+        with path.open("r", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)  # 헤더 스킵
+            for row in reader:
+                if len(row) >= 3 and row[1] and row[2]:  # 첫 번째는 번호, 두 번째는 질문, 세 번째는 답변
+                    entries.append({"question": row[1], "answer": row[2]})
+    with _faq_cache_lock:
+        _faq_list = entries
+        _faq_cache.clear()
+    return entries
+
+def get_faq_list() -> List[Dict[str, str]]:
+    faq_list = _faq_list
+    return faq_list if faq_list is not None else load_faq()
 
 SIM_THRESHOLD = 0.5
 
+# FAQ 검색 결과 캐시 (한 요청 안에서도 같은 질문을 여러 번 검색하므로)
+FAQ_CACHE_SIZE = int(os.getenv("KENOPI_FAQ_CACHE_SIZE", "4096"))
+_faq_cache: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+_faq_cache_lock = threading.Lock()
+
+def _faq_cache_get(query: str):
+    with _faq_cache_lock:
+        if query in _faq_cache:
+            _faq_cache.move_to_end(query)
+            return True, _faq_cache[query]
+    return False, None
+
+def _faq_cache_put(query: str, result: Optional[Dict[str, Any]]) -> None:
+    with _faq_cache_lock:
+        _faq_cache[query] = result
+        _faq_cache.move_to_end(query)
+        while len(_faq_cache) > FAQ_CACHE_SIZE:
+            _faq_cache.popitem(last=False)
+
+def _faq_match_result(best: Optional[Dict[str, str]], best_score: float) -> Optional[Dict[str, Any]]:
+    # 점수와 함께 가장 유사한 항목 보관 (구간 판정은 호출하는 쪽에서)
+    if best is None:
+        return None
+    return {"answer": best["answer"], "question": best["question"], "score": best_score}
+
+def _exact_match(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # 정확한 매칭만 허용 (KENOPI_FAQ_HIGH_THRESHOLD, 기본 0.8 이상)
+    if result and result["score"] >= FAQ_HIGH_THRESHOLD:
+        return dict(result)
+    return None
+
 def _search_faq(query: str):
     """FAQ에서 유사한 질문을 찾아 답변 반환 - 정확한 매칭만"""
-    best = None
-    best_score = 0
-    for item in FAQ_LIST:
-        score = SequenceMatcher(None, query.lower(), item["question"].lower()).ratio()
-        if score > best_score:
-            best_score = score
-            best = item
-    
-    # 정확한 매칭만 허용 (0.8 이상)
-    if best_score >= 0.8:
-        return {"answer": best["answer"], "question": best["question"], "score": best_score}
-    return None
+    return _exact_match(_search_faq_scored(query))
+
+@timed_stage("faq")
+def _search_faq_scored(query: str) -> Optional[Dict[str, Any]]:
+    """가장 유사한 FAQ 항목과 점수 (임계값 미적용)"""
+    cached, result = _faq_cache_get(query)
+    if not cached:
+        best = None
+        best_score = 0
+        for item in get_faq_list():
+            score = SequenceMatcher(None, query.lower(), item["question"].lower()).ratio()
+            if score > best_score:
+                best_score = score
+                best = item
+        result = _faq_match_result(best, best_score)
+        _faq_cache_put(query, result)
+    return dict(result) if result else None
+
+def _faq_tier(query: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """FAQ 신뢰도 구간 (high/mid/low)과 해당 FAQ 항목"""
+    result = _search_faq_scored(query)
+    tier = faq_tier_of(result)
+    return tier, result if tier != "low" else None
+
+def faq_tier_of(result: Optional[Dict[str, Any]]) -> str:
+    """FAQ 검색 결과(점수 포함)의 신뢰도 구간"""
+    score = result["score"] if result else 0.0
+    if score >= FAQ_HIGH_THRESHOLD:
+        return "high"
+    if score >= FAQ_MID_THRESHOLD:
+        return "mid"
+    return "low"
+
+def search_faq_batch(queries: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    여러 질문의 FAQ 검색을 한 번에 처리 (결과는 캐시에 적재되어 이후 파이프라인에서 재사용)
+    
+    캐시에 없는 질문만 score_faq_batch로 한 번에 점수 계산
+    """
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    pending = []
+    for query in dict.fromkeys(queries):
+        cached, result = _faq_cache_get(query)
+        if cached:
+            results[query] = _exact_match(result)
+        else:
+            pending.append(query)
+    
+    if pending:
+        for query, result in score_faq_batch(pending).items():
+            _faq_cache_put(query, result)
+            results[query] = _exact_match(result)
+    
+    return results
 
+def score_faq_batch(queries: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    여러 질문의 가장 유사한 FAQ 항목과 점수 (임계값 미적용, 검색 캐시를 읽거나 쓰지 않음)
+    
+    질문 중복을 제거하고, FAQ 문항별 SequenceMatcher를 한 번만 만들어
+    모든 질문에 재사용한다 (FAQ 쪽 인덱스 구축 비용을 질문 수만큼 반복하지 않음).
+    대량 분석(질문 일괄 분류)은 이 함수를 직접 써서 채팅용 캐시를 밀어내지 않는다.
+    """
+    unique = list(dict.fromkeys(queries))
+    lowered = [query.lower() for query in unique]
+    best: List[Optional[Dict[str, str]]] = [None] * len(unique)
+    best_scores = [0] * len(unique)
+    for item in get_faq_list():
+        matcher = SequenceMatcher(None, "", item["question"].lower())
+        for i, query_lower in enumerate(lowered):
+            matcher.set_seq1(query_lower)
+            score = matcher.ratio()
+            if score > best_scores[i]:
+                best_scores[i] = score
+                best[i] = item
+    return {query: _faq_match_result(best[i], best_scores[i]) for i, query in enumerate(unique)}
+
+def request_budget(history: List[Dict[str, str]], pipeline: str = "advanced") -> str:
+    """
+    속도 제한 예산 판정 - 규칙 기반 파이프라인(pipeline="rule"), FAQ 정확 매칭, LLM 없음이면 "faq", 그 외 "llm"
+    (검색 결과는 캐시되어 이어지는 파이프라인에서 재사용)
+    """
+    if pipeline == "rule" or not history or not os.getenv("OPENAI_API_KEY"):
+        return "faq"
+    tier, _ = _faq_tier(history[-1]["content"])
+    return "faq" if tier == "high" else "llm"
+
+# 의도별 키워드 매핑 (첫 번째 키워드가 해당 의도의 대표 키워드)
+INTENT_KEYWORDS = {
+    "환불": ["환불", "돈", "돌려", "취소", "안받", "반납"],
+    "교환": ["교환", "바꾸", "다른걸로", "사이즈", "색깔"],
+    "반품": ["반품", "보내", "돌려보내", "안받", "취소"],
+    "배송비": ["배송비", "택배비", "비용", "얼마", "가격"],
+    "고객센터": ["연락", "전화", "문의", "고객센터", "상담"],
+    "스크래치": ["스크래치", "긁힘", "상처", "흠집"],
+    "자수": ["자수", "로고", "브랜드"],
+    "물샘": ["물", "새", "비", "방수"],
+    "냄새": ["냄새", "향", "냄"],
+    "스트랩": ["스트랩", "끈", "고리", "연결"],
+    "길이조절": ["길이", "조절", "늘리", "줄이"],
+    "배송": ["배송", "언제", "출발", "도착"],
+    "주문확인": ["주문", "확인", "내역"],
+    "AS": ["AS", "품질", "보증", "하자"],
+    "브랜드": ["케노피", "브랜드", "회사"],
+    "대량주문": ["대량", "기업", "많이"],
+    "해외배송": ["해외", "외국", "국제"]
+}
+
+@timed_stage("intent")
 def _find_intent_match(query: str):
     """질문 의도를 파악해서 FAQ 주제와 매칭"""
     query_lower = query.lower()
     
-    # 의도별 키워드 매핑
-    intent_keywords = {
-        "환불": ["환불", "돈", "돌려", "취소", "안받", "반납"],
-        "교환": ["교환", "바꾸", "다른걸로", "사이즈", "색깔"],
-        "반품": ["반품", "보내", "돌려보내", "안받", "취소"],
-        "배송비": ["배송비", "택배비", "비용", "얼마", "가격"],
-        "고객센터": ["연락", "전화", "문의", "고객센터", "상담"],
-        "스크래치": ["스크래치", "긁힘", "상처", "흠집"],
-        "자수": ["자수", "로고", "브랜드"],
-        "물샘": ["물", "새", "비", "방수"],
-        "냄새": ["냄새", "향", "냄"],
-        "스트랩": ["스트랩", "끈", "고리", "연결"],
-        "길이조절": ["길이", "조절", "늘리", "줄이"],
-        "배송": ["배송", "언제", "출발", "도착"],
-        "주문확인": ["주문", "확인", "내역"],
-        "AS": ["AS", "품질", "보증", "하자"],
-        "브랜드": ["케노피", "브랜드", "회사"],
-        "대량주문": ["대량", "기업", "많이"],
-        "해외배송": ["해외", "외국", "국제"]
-    }
-    
     # 각 의도별로 키워드 매칭 점수 계산
     intent_scores = {}
-    for intent, keywords in intent_keywords.items():
+    for intent, keywords in INTENT_KEYWORDS.items():
         score = 0
         for keyword in keywords:
             if keyword in query_lower:
@@ -136,6 +291,8 @@ def generate_response(history: list[dict[str, str]], auto_mode: bool = True) ->
         return "안녕하세요! 케노피 고객지원팀 노피🤖입니다. 무엇을 도와드릴까요?"
     
     latest_query = history[-1]["content"]
+    set_mode("rule")
+    annotate(query_hash=query_hash(latest_query))
     
     # 🎯 1단계: 정확한 FAQ 매칭 시도
     faq_result = _search_faq(latest_query)
@@ -157,12 +314,17 @@ def generate_response(history: list[dict[str, str]], auto_mode: bool = True) ->
                 if faq_answer:
                     return f"네, 알려드릴게요! 😊\n\n{faq_answer}"
     
-    # 🤔 3단계: 의도 파악 및 확인 질문
+    # 🧩 3단계: 여러 질문이 섞인 메시지는 하위 질문별로 FAQ 답변
+    compound = _answer_compound_query(history, use_llm=False)
+    if compound:
+        return compound["response"]
+    
+    # 🤔 4단계: 의도 파악 및 확인 질문
     intent = _find_intent_match(latest_query)
     if intent:
         return _get_confirmation_question(intent, latest_query)
     
-    # 🚫 4단계: 의도도 파악 안되면 정중하게 거절
+    # 🚫 5단계: 의도도 파악 안되면 정중하게 거절
     return _get_rejection_response(latest_query)
 
 def _is_confirmation(query: str) -> bool:
@@ -237,7 +399,7 @@ def _get_faq_by_intent(intent: str) -> str:
     keywords = intent_to_faq_keywords.get(intent, [])
     
     # FAQ에서 키워드가 포함된 질문 찾기
-    for item in FAQ_LIST:
+    for item in get_faq_list():
         for keyword in keywords:
             if keyword in item["question"]:
                 return item["answer"]
@@ -277,108 +439,166 @@ def _get_rejection_response(user_question: str) -> str:
         "정확한 답변을 받으실 수 있습니다."
     )
 
-def _generate_auto_response(history: List[Dict[str, str]]) -> str:
-    """자동 모드 선택을 통한 응답 생성"""
-    try:
-        latest_query = history[-1]["content"]
-        
-        # 질문 복잡도 및 유형 분석
-        complexity_analysis = _analyze_query_complexity_detailed(latest_query)
-        complexity = complexity_analysis["complexity"]
-        question_type = complexity_analysis["type"]
-        urgency = complexity_analysis["urgency"]
-        
-        # FAQ 검색 및 컨텍스트 구성
-        faq_answer = _search_faq(latest_query)
-        conversation_context = _build_conversation_context(history)
-        
-        # 자동 모드 선택 로직
-        selected_mode = _select_optimal_mode(complexity, question_type, urgency, bool(faq_answer))
-        
-        print(f"[Auto Mode] 질문: '{latest_query[:50]}...' | 복잡도: {complexity} | 선택된 모드: {selected_mode}")
-        
-        # 선택된 모드에 따른 응답 생성
-        if selected_mode == "basic":
-            return _generate_basic_response(history)
-        elif selected_mode == "thinking":
-            return _generate_thinking_response_with_mode(history, "thinking")
-        elif selected_mode == "enhanced":
-            return _generate_thinking_response_with_mode(history, "enhanced")
-        else:
-            return _generate_basic_response(history)
-            
-    except Exception as e:
-        print(f"[Auto Response Error] {e}")
-        return _generate_basic_response(history)
+# 복합 질문 중 FAQ로 해결되지 않는 하위 질문을 병렬로 LLM에 보낼 때 사용
+FANOUT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("KENOPI_FANOUT_WORKERS", "4")),
+    thread_name_prefix="kenopi-fanout"
+)
 
-def _analyze_query_complexity_detailed(query: str) -> Dict[str, Any]:
-    """상세한 질문 복잡도 및 유형 분석"""
+def _has_topic(fragment: str) -> bool:
+    """하위 질문 후보가 독립적인 주제를 갖는지 - FAQ 매칭 또는 의도 이름/대표 키워드 포함
     
-    # 복잡도 지표들
-    complexity_indicators = {
-        "high": [
-            "어떻게", "왜", "이유", "방법", "절차", "단계", "과정", 
-            "비교해", "차이", "장단점", "문제해결", "불량", "고장",
-            "환불", "교환", "반품", "AS", "수리", "보상", "배상"
-        ],
-        "medium": [
-            "언제", "어디서", "얼마", "가격", "비용", "기간", "시간",
-            "정책", "규정", "조건", "방법", "안내", "설명"
-        ],
-        "low": [
-            "안녕", "감사", "네", "예", "아니오", "확인", "알려주세요",
-            "문의", "연락처", "전화번호"
-        ]
-    }
+    "언제", "비" 같은 보조 키워드만 걸린 조각은 주제로 보지 않아 과도한 분리를 막는다.
+    """
+    intent = _find_intent_match(fragment)
+    if intent is not None:
+        fragment_lower = fragment.lower()
+        if intent.lower() in fragment_lower or INTENT_KEYWORDS[intent][0] in fragment_lower:
+            return True
+    return _search_faq(fragment) is not None
+
+def _resolve_sub_question(sub_query: str, answer_intent: bool) -> Optional[Dict[str, str]]:
+    """하위 질문을 FAQ 또는 의도 매칭으로 즉시 해결 (LLM 미사용)
     
-    # 긴급도 지표
-    urgency_indicators = {
-        "high": ["긴급", "급해", "빨리", "즉시", "당장", "지금", "문제", "고장", "불량"],
-        "medium": ["오늘", "이번주", "빠른", "가능한"],
-        "low": ["언제", "나중에", "여유"]
-    }
+    answer_intent=False(규칙 기반 응답)면 의도만 맞은 하위 질문은 답변 대신 확인 질문
+    """
+    faq_result = _search_faq(sub_query)
+    if faq_result:
+        return {"answer": faq_result["answer"], "source": "faq"}
+    intent = _find_intent_match(sub_query)
+    if intent and not answer_intent:
+        return {"answer": _get_confirmation_question(intent, sub_query), "source": "confirmation"}
+    if intent:
+        faq_answer = _get_faq_by_intent(intent)
+        if faq_answer:
+            return {"answer": faq_answer, "source": "intent"}
+    return None
+
+def _answer_compound_query(history: List[Dict[str, str]], use_llm: bool) -> Optional[Dict[str, Any]]:
+    """
+    여러 질문이 섞인 메시지를 하위 질문으로 나눠 각각 답변 후 하나로 합침
     
-    # 질문 유형 분석
-    question_types = {
-        "complaint": ["불만", "화", "짜증", "문제", "불량", "고장", "잘못"],
-        "inquiry": ["문의", "궁금", "알고싶", "확인", "정보"],
-        "request": ["요청", "부탁", "도움", "처리", "해결"],
-        "greeting": ["안녕", "처음", "반가", "감사"]
-    }
+    - FAQ/의도 매칭으로 해결되는 하위 질문은 즉시 답변 (use_llm=False면 의도만 맞은 하위 질문은 확인 질문)
+    - 해결되지 않은 하위 질문만 병렬로 LLM 호출 (use_llm=True이고 LLM 설정 시)
+    - 복합 질문이 아니거나 해결된 하위 질문이 없으면 None
+    """
+    latest_query = history[-1]["content"]
+    sub_queries = split_compound_query(latest_query, _has_topic)
+    if len(sub_queries) < 2:
+        return None
+    
+    resolved = [_resolve_sub_question(sub_query, answer_intent=use_llm) for sub_query in sub_queries]
+    distinct_answers = {item["answer"] for item in resolved if item}
+    if not distinct_answers or len(distinct_answers) + resolved.count(None) < 2:
+        return None  # 실제로는 한 가지 주제에 대한 질문
+    if all(item is None or item["source"] == "confirmation" for item in resolved):
+        return None  # 바로 답할 하위 질문이 없으면 단일 질문 흐름(확인 질문 하나)으로
+    
+    pending = {}
+    if use_llm and get_llm():
+        for i, sub_query in enumerate(sub_queries):
+            if resolved[i] is None:
+                sub_history = history[:-1] + [{"role": "user", "content": sub_query}]
+                ctx = contextvars.copy_context()
+                pending[i] = FANOUT_EXECUTOR.submit(ctx.run, _generate_basic_response, sub_history)
+    for i, future in pending.items():
+        resolved[i] = {"answer": future.result(), "source": "llm"}
+    
+    sections = []
+    seen_answers = set()
+    for sub_query, item in zip(sub_queries, resolved):
+        if item is None:
+            answer = "이 부분은 케노피 고객센터(010-2747-9567, 평일 10시-17시)로 문의해주시면 정확히 안내해드릴게요."
+        elif item["answer"] in seen_answers:
+            continue  # 같은 FAQ 답변이 여러 하위 질문에 걸린 경우 한 번만
+        else:
+            answer = item["answer"]
+            seen_answers.add(answer)
+        sections.append(f"**Q. {sub_query}**\n{answer}")
     
+    return {
+        "response": "안녕하세요! 노피🤖입니다. 😊\n\n" + "\n\n".join(sections),
+        "sub_questions": [
+            {"question": sub_query, "source": item["source"] if item else "unresolved"}
+            for sub_query, item in zip(sub_queries, resolved)
+        ],
+        "llm_calls": len(pending)
+    }
+
+# 복잡도 지표들
+COMPLEXITY_INDICATORS = {
+    "high": [
+        "어떻게", "왜", "이유", "방법", "절차", "단계", "과정", 
+        "비교해", "차이", "장단점", "문제해결", "불량", "고장",
+        "환불", "교환", "반품", "AS", "수리", "보상", "배상"
+    ],
+    "medium": [
+        "언제", "어디서", "얼마", "가격", "비용", "기간", "시간",
+        "정책", "규정", "조건", "방법", "안내", "설명"
+    ],
+    "low": [
+        "안녕", "감사", "네", "예", "아니오", "확인", "알려주세요",
+        "문의", "연락처", "전화번호"
+    ]
+}
+
+# 긴급도 지표
+URGENCY_INDICATORS = {
+    "high": ["긴급", "급해", "빨리", "즉시", "당장", "지금", "문제", "고장", "불량"],
+    "medium": ["오늘", "이번주", "빠른", "가능한"],
+    "low": ["언제", "나중에", "여유"]
+}
+
+# 질문 유형 분석 (앞에 있는 유형이 우선)
+QUESTION_TYPE_INDICATORS = {
+    "complaint": ["불만", "화", "짜증", "문제", "불량", "고장", "잘못"],
+    "inquiry": ["문의", "궁금", "알고싶", "확인", "정보"],
+    "request": ["요청", "부탁", "도움", "처리", "해결"],
+    "greeting": ["안녕", "처음", "반가", "감사"]
+}
+
+def _complexity_level(high_count: int, medium_count: int, low_count: int, length_factor: int) -> str:
+    """지표 개수와 길이로 복잡도 결정"""
+    if high_count >= 2 or (high_count >= 1 and length_factor > 30):
+        return "high"
+    elif high_count >= 1 or medium_count >= 2 or length_factor > 50:
+        return "medium"
+    elif low_count >= 1 and length_factor < 20:
+        return "low"
+    else:
+        return "medium"  # 기본값
+
+def _urgency_level(urgency_high: int, urgency_medium: int) -> str:
+    """긴급도 지표 개수로 긴급도 결정"""
+    if urgency_high >= 1:
+        return "high"
+    elif urgency_medium >= 1:
+        return "medium"
+    else:
+        return "low"
+
+@timed_stage("complexity")
+def _analyze_query_complexity_detailed(query: str) -> Dict[str, Any]:
+    """상세한 질문 복잡도 및 유형 분석"""
     query_lower = query.lower()
     
     # 복잡도 계산
-    high_count = sum(1 for indicator in complexity_indicators["high"] if indicator in query_lower)
-    medium_count = sum(1 for indicator in complexity_indicators["medium"] if indicator in query_lower)
-    low_count = sum(1 for indicator in complexity_indicators["low"] if indicator in query_lower)
+    high_count = sum(1 for indicator in COMPLEXITY_INDICATORS["high"] if indicator in query_lower)
+    medium_count = sum(1 for indicator in COMPLEXITY_INDICATORS["medium"] if indicator in query_lower)
+    low_count = sum(1 for indicator in COMPLEXITY_INDICATORS["low"] if indicator in query_lower)
     
     # 길이 기반 복잡도 조정
     length_factor = len(query)
-    
-    if high_count >= 2 or (high_count >= 1 and length_factor > 30):
-        complexity = "high"
-    elif high_count >= 1 or medium_count >= 2 or length_factor > 50:
-        complexity = "medium"
-    elif low_count >= 1 and length_factor < 20:
-        complexity = "low"
-    else:
-        complexity = "medium"  # 기본값
+    complexity = _complexity_level(high_count, medium_count, low_count, length_factor)
     
     # 긴급도 분석
-    urgency_high = sum(1 for indicator in urgency_indicators["high"] if indicator in query_lower)
-    urgency_medium = sum(1 for indicator in urgency_indicators["medium"] if indicator in query_lower)
-    
-    if urgency_high >= 1:
-        urgency = "high"
-    elif urgency_medium >= 1:
-        urgency = "medium"
-    else:
-        urgency = "low"
+    urgency_high = sum(1 for indicator in URGENCY_INDICATORS["high"] if indicator in query_lower)
+    urgency_medium = sum(1 for indicator in URGENCY_INDICATORS["medium"] if indicator in query_lower)
+    urgency = _urgency_level(urgency_high, urgency_medium)
     
     # 질문 유형 분석
     question_type = "general"
-    for q_type, indicators in question_types.items():
+    for q_type, indicators in QUESTION_TYPE_INDICATORS.items():
         if any(indicator in query_lower for indicator in indicators):
             question_type = q_type
             break
@@ -427,42 +647,8 @@ def _generate_thinking_response_with_mode(history: List[Dict[str, str]], mode: s
         faq_answer = _search_faq(latest_query)
         conversation_context = _build_conversation_context(history)
         
-        # 모드별 프롬프트 구성
-        if mode == "enhanced":
-            context = f"""
-{KENOPI_THINKING_PROMPT}
-
-{EMOTION_RESPONSIVE_PROMPT}
-
-{QUALITY_ASSURANCE_PROMPT}
-
-**🔍 고급 분석 모드 활성화**
-- 복잡한 문의나 중요한 상황으로 판단됨
-- 다각도 검토 및 최적 솔루션 제시
-- 고객 만족도 최우선 고려
-
-대화 히스토리:
-{conversation_context}
-
-FAQ 매칭 결과:
-{faq_answer if faq_answer else "매칭되는 FAQ 없음"}
-            """.strip()
-        else:  # thinking mode
-            context = f"""
-{KENOPI_THINKING_PROMPT}
-
-{EMOTION_RESPONSIVE_PROMPT}
-
-**🧠 단계별 추론 모드 활성화**
-- 체계적인 분석을 통한 정확한 답변
-- 단계별 사고 과정 적용
-
-대화 히스토리:
-{conversation_context}
-
-FAQ 매칭 결과:
-{faq_answer if faq_answer else "매칭되는 FAQ 없음"}
-            """.strip()
+        # 모드별 정적 앞부분 + 히스토리/FAQ
+        context = build_thinking_context(mode, conversation_context, faq_answer)
         
         # MCP Sequential Thinking 분석 및 응답
         result = thinking_mcp.analyze_and_respond(latest_query, context)
@@ -473,14 +659,14 @@ FAQ 매칭 결과:
             if _validate_response_quality(response, latest_query):
                 return _enhance_response_with_mode_info(response, mode)
             else:
-                return _generate_basic_response(history)
+                return _fallback_response(history, "quality_check_failed")
         else:
             # Fallback to basic response
-            return _generate_basic_response(history)
+            return _fallback_response(history, "thinking_not_used")
             
     except Exception as e:
-        print(f"[Thinking Response Error] {e}")
-        return _generate_basic_response(history)
+        logger.error("Thinking response failed", exc_info=True, extra={"mode": mode})
+        return _fallback_response(history, "thinking_error")
 
 def _enhance_response_with_mode_info(response: str, mode: str) -> str:
     """응답에 선택된 모드 정보 추가"""
@@ -501,9 +687,15 @@ def _enhance_response_with_mode_info(response: str, mode: str) -> str:
     
     return response
 
+def _fallback_response(history: List[Dict[str, str]], reason: str) -> str:
+    """추론 경로 실패 시 기본 응답으로 폴백 (사유는 메트릭에 기록)"""
+    record_fallback(reason)
+    with stage("fallback"):
+        return _generate_basic_response(history)
+
 def _generate_basic_response(history: List[Dict[str, str]]) -> str:
     """기존 방식의 기본 응답 생성 (Fallback)"""
-    if not llm:
+    if not get_llm():
         # OpenAI가 없으면 FAQ 기반 응답
         if history:
             latest_query = history[-1]["content"]
@@ -513,39 +705,74 @@ def _generate_basic_response(history: List[Dict[str, str]]) -> str:
         
         return _get_rejection_response(history[-1]["content"] if history else "")
     
-    messages = [SystemMessage(content=KENOPI_SYSTEM_PROMPT)]
-    
-    for m in history:
-        if m["role"] == "user":
-            messages.append(HumanMessage(content=m["content"]))
-        else:
-            messages.append(AIMessage(content=m["content"]))
-
-    # FAQ 검색 및 컨텍스트 추가
-    if history:
-        faq_answer = _search_faq(history[-1]["content"])
-        if faq_answer:
-            messages.insert(1, SystemMessage(content=f"FAQ 참고 답변:\n{faq_answer}"))
+    # 고정 시스템 메시지 → 히스토리 → FAQ 순서 (앞부분이 요청 간 동일하게 유지되도록)
+    messages = build_basic_messages(history, _search_faq(history[-1]["content"]) if history else None)
 
     # LLM 호출 및 응답 생성
-    answer = llm.invoke(messages)
+    answer = _invoke_llm(messages)
     return answer.content
 
-def _build_conversation_context(history: List[Dict[str, str]]) -> str:
-    """대화 히스토리를 컨텍스트로 구성"""
-    if not history:
-        return "첫 번째 문의입니다."
-    
-    context_parts = []
-    # 최근 4개 대화만 포함 (컨텍스트 크기 제한)
-    recent_history = history[-8:] if len(history) > 8 else history
-    
-    for i, msg in enumerate(recent_history):
-        role = "고객" if msg["role"] == "user" else "케노피"
-        context_parts.append(f"{role}: {msg['content']}")
+@timed_stage("llm")
+def _invoke_llm(messages: list, model=None):
+    """LLM 호출 - 요청이 취소되면 진행 중인 HTTP 호출도 함께 중단 (model 미지정 시 기본 모델)"""
+    model = model or get_llm()
+    check_cancelled()
+    answer = run_on_loop(lambda: model.ainvoke(messages), lambda: model.invoke(messages))
+    record_usage(llm_usage(messages, answer, getattr(model, "model_name", "unknown")))
+    return answer
+
+# 재작성 모델이 FAQ 답변으로 답할 수 없다고 판단할 때 돌려주는 표시
+REWRITE_NO_ANSWER = "NO_ANSWER"
+
+def _answer_from_faq_tier(latest_query: str) -> Optional[Tuple[str, str]]:
+    """
+    FAQ 신뢰도 구간에 따라 모드 선택 전에 답변 (답변, 구간) - low 구간이거나 재작성 실패 시 None
     
-    return "\n".join(context_parts)
+    - high: 검수된 FAQ 답변을 그대로 반환 (LLM 미호출)
+    - mid: 저가 모델로 FAQ 답변 범위 안에서만 질문에 맞게 재작성
+    """
+    tier, faq_result = _faq_tier(latest_query)
+    FAQ_TIERS.inc(tier=tier)
+    annotate(faq_tier=tier)
+    if tier == "high":
+        LLM_CALLS_AVOIDED.inc(reason="faq_high")
+        return f"안녕하세요! 노피🤖입니다. 😊\n\n{faq_result['answer']}", tier
+    rewrite_llm = get_rewrite_llm() if tier == "mid" else None
+    if rewrite_llm:
+        try:
+            answer = _invoke_llm(build_rewrite_messages(latest_query, faq_result), rewrite_llm).content.strip()
+        except RequestCancelled:
+            raise
+        except Exception:
+            logger.warning("FAQ rewrite failed", exc_info=True)
+            return None
+        if answer and REWRITE_NO_ANSWER not in answer:
+            LLM_CALLS_AVOIDED.inc(reason="faq_mid")
+            return answer, tier
+    return None
+
+def _faq_tier_result(response: str, tier: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "response": response,
+        "selected_mode": "faq",
+        "complexity": analysis["complexity"],
+        "question_type": analysis["type"],
+        "urgency": analysis["urgency"],
+        "quality_score": "curated" if tier == "high" else "faq_rewrite",
+        "faq_matched": True,
+        "faq_tier": tier,
+        "auto_selection": True,
+        "analysis": {
+            "length": analysis["length"],
+            "indicators": analysis["indicators"]
+        }
+    }
+
+def _build_conversation_context(history: List[Dict[str, str]]) -> str:
+    """대화 히스토리를 컨텍스트로 구성 (토큰 예산 안에서 최근 대화 + 오래된 대화 요약)"""
+    return context_builder.build(history).as_text()
 
+@timed_stage("validation")
 def _validate_response_quality(response: str, query: str) -> bool:
     """응답 품질 기본 검증"""
     try:
@@ -579,9 +806,43 @@ def generate_advanced_response(history: list[dict[str, str]]) -> Dict[str, Any]:
             "auto_selection": True
         }
     
+    # 여러 질문이 섞인 메시지: 하위 질문별로 병렬 답변 (불만/긴급 문의는 고급 모드로)
+    compound_analysis = _analyze_query_complexity_detailed(history[-1]["content"])
+    annotate(
+        query_hash=query_hash(history[-1]["content"]),
+        analysis=compound_analysis,
+        intent=_find_intent_match(history[-1]["content"])
+    )
+    if compound_analysis["type"] != "complaint" and compound_analysis["urgency"] != "high":
+        compound = _answer_compound_query(history, use_llm=True)
+        if compound:
+            set_mode("basic")
+            return {
+                "response": compound["response"],
+                "selected_mode": "basic",
+                "complexity": compound_analysis["complexity"],
+                "question_type": compound_analysis["type"],
+                "urgency": compound_analysis["urgency"],
+                "quality_score": "basic",
+                "faq_matched": all(q["source"] in ("faq", "intent") for q in compound["sub_questions"]),
+                "auto_selection": True,
+                "sub_questions": compound["sub_questions"],
+                "analysis": {
+                    "length": compound_analysis["length"],
+                    "indicators": compound_analysis["indicators"]
+                }
+            }
+    
+    # FAQ 신뢰도가 높거나 중간이면 모드 선택 없이 FAQ 기반으로 답변
+    faq_tier = _answer_from_faq_tier(history[-1]["content"])
+    if faq_tier:
+        set_mode("faq")
+        return _faq_tier_result(faq_tier[0], faq_tier[1], compound_analysis)
+    
     if not THINKING_AVAILABLE:
+        set_mode("basic")
         return {
-            "response": _generate_basic_response(history),
+            "response": _fallback_response(history, "thinking_unavailable"),
             "selected_mode": "basic",
             "complexity": "unknown",
             "quality_score": "basic",
@@ -592,18 +853,18 @@ def generate_advanced_response(history: list[dict[str, str]]) -> Dict[str, Any]:
     try:
         latest_query = history[-1]["content"]
         
-        # 상세 분석
-        complexity_analysis = _analyze_query_complexity_detailed(latest_query)
+        # 상세 분석 (복합 질문 판단 때 같은 질문으로 계산한 결과 재사용)
+        complexity_analysis = compound_analysis
         complexity = complexity_analysis["complexity"]
         question_type = complexity_analysis["type"]
         urgency = complexity_analysis["urgency"]
         
-        # FAQ 및 컨텍스트 구성
+        # FAQ 검색
         faq_answer = _search_faq(latest_query)
-        conversation_context = _build_conversation_context(history)
         
         # 자동 모드 선택
         selected_mode = _select_optimal_mode(complexity, question_type, urgency, bool(faq_answer))
+        set_mode(selected_mode)
         
         # 선택된 모드로 응답 생성
         if selected_mode == "basic":
@@ -627,9 +888,9 @@ def generate_advanced_response(history: list[dict[str, str]]) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        print(f"[Advanced Response Error] {e}")
+        logger.error("Advanced response failed", exc_info=True)
         return {
-            "response": _generate_basic_response(history),
+            "response": _fallback_response(history, "advanced_error"),
             "selected_mode": "basic",
             "complexity": "error",
             "quality_score": "fallback",
@@ -0,0 +1,148 @@
+"""
+구조화 로깅 설정
+요청 경로에서 print()로 stdout에 직접 쓰면 컨테이너 로그 수집이 밀릴 때 요청이 함께 멈추므로
+- 로그 레코드는 제한된 큐에 넣기만 하고(가득 차면 버림) 백그라운드 스레드가 JSON 한 줄로 출력
+- WARNING 이상은 호출 위치별로 window당 burst개까지만 출력 (장애 시 같은 오류 폭주 방지)
+- 질문 원문 대신 query_hash 등 extra 필드를 구조화해서 남김
+
+환경변수: KENOPI_LOG_LEVEL(INFO), KENOPI_LOG_FORMAT(json|text), KENOPI_LOG_QUEUE_SIZE(10000),
+          KENOPI_LOG_ERROR_BURST(10), KENOPI_LOG_ERROR_WINDOW(60)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from metrics import Counter
+
+LOG_LEVEL = os.getenv("KENOPI_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("KENOPI_LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("KENOPI_LOG_QUEUE_SIZE", "10000"))
+LOG_ERROR_BURST = int(os.getenv("KENOPI_LOG_ERROR_BURST", "10"))
+LOG_ERROR_WINDOW = float(os.getenv("KENOPI_LOG_ERROR_WINDOW", "60"))
+
+LOG_RECORDS_DROPPED = Counter(
+    "kenopi_log_records_dropped_total", "Log records dropped (queue_full or rate_limited)", ["reason"]
+)
+
+# LogRecord 기본 속성 (이외의 속성은 extra 필드로 출력)
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """레코드 1개 = JSON 한 줄 (extra로 넘긴 필드 포함)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """WARNING 이상 로그를 호출 위치별로 window초당 burst개까지만 통과 (다음 통과 시 suppressed 개수 표시)"""
+
+    def __init__(self, burst: int = 10, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._state: Dict[Tuple[str, int], List[float]] = {}  # 호출 위치 → [window 시작, 개수, 생략 수]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = int(state[2])
+                self._state[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        LOG_RECORDS_DROPPED.inc(reason="rate_limited")
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """큐가 가득 차면 기다리지 않고 버리는 QueueHandler - 포맷은 백그라운드 스레드에서 수행"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 메시지 인자만 지금 확정 (예외 트레이스백 포맷은 출력 스레드에서)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+def configure_logging() -> QueueListener:
+    """루트 로거에 큐 핸들러를 연결하고 출력 스레드 시작"""
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(LOG_ERROR_BURST, LOG_ERROR_WINDOW))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # 종료 시 남은 로그 출력
+    return listener
+
+
+def get_logger(name: Optional[str] = None) -> logging.Logger:
+    """로깅 설정이 적용된 로거 (이 모듈을 import하면 설정이 먼저 적용됨)"""
+    return logging.getLogger(name)
+
+
+def _restart_listener_in_child() -> None:
+    """fork된 자식 프로세스에는 출력 스레드가 없으므로 새 큐와 출력 스레드로 다시 연결 (serve.py 워커 등)"""
+    global log_listener
+    atexit.unregister(log_listener.stop)
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            handler.queue = log_queue
+    log_listener = QueueListener(log_queue, *log_listener.handlers, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+
+# 전역 출력 스레드
+log_listener = configure_logging()
+os.register_at_fork(after_in_child=_restart_listener_in_child)
@@ -0,0 +1,137 @@
+"""
+이벤트 루프 지연(lag) 감시
+async 핸들러 안의 블로킹 호출(llm.invoke, subprocess.run 등)로 루프가 멈추면 모든 요청의 지연이 함께 늘어나므로
+- 루프 안의 샘플러: 주기적으로 sleep 후 예정 시각 대비 늦어진 시간(스케줄링 지연)을 측정
+- 루프 밖의 감시 스레드: 샘플러 신호가 끊기면 그 순간 루프 스레드의 스택을 캡처 (멈추게 한 호출 위치)
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from metrics import Counter, Histogram
+
+LOOP_MONITOR_ENABLED = os.getenv("KENOPI_LOOP_MONITOR", "1") != "0"
+LOOP_LAG_INTERVAL = float(os.getenv("KENOPI_LOOP_LAG_INTERVAL", "0.1"))  # 샘플링 주기 (초)
+LOOP_STALL_THRESHOLD = float(os.getenv("KENOPI_LOOP_STALL_THRESHOLD", "0.1"))  # 멈춤으로 볼 지연 (초)
+LOOP_STALL_HISTORY = int(os.getenv("KENOPI_LOOP_STALL_HISTORY", "50"))  # 보관할 최근 멈춤 기록 수
+
+# 캡처할 스택 프레임 수 (안쪽부터)
+_STACK_LIMIT = 40
+
+LOOP_LAG = Histogram(
+    "kenopi_event_loop_lag_seconds", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_STALLS = Counter(
+    "kenopi_event_loop_stalls_total", "Event loop stalls longer than the configured threshold"
+)
+
+
+def _format_stack(frame: Any) -> List[str]:
+    return [
+        f"{summary.filename}:{summary.lineno} in {summary.name}" + (f" | {summary.line}" if summary.line else "")
+        for summary in traceback.extract_stack(frame)[-_STACK_LIMIT:]
+    ]
+
+
+class LoopMonitor:
+    """이벤트 루프 지연 샘플러 + 멈춤 감시 스레드"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self._stalls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._pending_stack: Optional[List[str]] = None
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    @classmethod
+    def from_env(cls) -> "LoopMonitor":
+        return cls(interval=LOOP_LAG_INTERVAL, threshold=LOOP_STALL_THRESHOLD, history=LOOP_STALL_HISTORY)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """실행 중인 이벤트 루프에서 호출"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="kenopi-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(lag)
+            with self._lock:
+                self._last_tick = time.monotonic()
+                self._last_lag = lag
+                self._max_lag = max(self._max_lag, lag)
+                stack, self._pending_stack = self._pending_stack, None
+                if lag >= self.threshold:
+                    LOOP_STALLS.inc()
+                    self._stalls.append({
+                        "at": time.time(),
+                        "lag_ms": round(lag * 1000, 1),
+                        "stack": stack,  # 멈춘 동안 캡처하지 못했으면 None
+                    })
+
+    def _watch(self) -> None:
+        """샘플러 신호가 threshold 이상 끊기면 루프 스레드 스택 캡처 (멈춤 1회당 한 번)"""
+        check_every = max(0.01, self.threshold / 2)
+        while not self._stop.wait(check_every):
+            with self._lock:
+                stalled = time.monotonic() - self._last_tick > self.interval + self.threshold
+                if not stalled or self._pending_stack is not None:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = _format_stack(frame)
+            with self._lock:
+                if self._pending_stack is None:
+                    self._pending_stack = stack
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stalls = list(self._stalls)
+            last_lag, max_lag = self._last_lag, self._max_lag
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 1),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "last_lag_ms": round(last_lag * 1000, 1),
+            "max_lag_ms": round(max_lag * 1000, 1),
+            "stalls_total": int(LOOP_STALLS.value()),
+            "recent_stalls": stalls[::-1],  # 최신순
+        }
+
+
+# 전역 인스턴스
+loop_monitor = LoopMonitor.from_env()
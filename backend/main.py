@@ -1,28 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
-from langsmith import Client
-from routers.kenopi import router as kenopi_router
 
-# 환경 변수 로드 (루트 디렉토리의 .env 파일)
+# 환경 변수 로드 (루트 디렉토리의 .env 파일) - 모듈 import 시 환경변수를 읽는 설정보다 먼저
 load_dotenv("../.env")
 
+from routers.kenopi import router as kenopi_router
+from routers.jobs import router as jobs_router
+from routers.debug import router as debug_router
+from jobs import JOBS_API_ENABLED, job_store
+from rate_limit import rate_limiter
+from cancellation import abandoned_work_stats
+from metrics import CONTENT_TYPE, REGISTRY
+from loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
+from tracing import tracer
+from warmup import warmup
+from log_config import get_logger
+
 # Map custom LangSmith env vars to LangChain expected
 if os.getenv("LANGSMITH_API_KEY") and not os.getenv("LANGCHAIN_API_KEY"):
     os.environ["LANGCHAIN_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
 if os.getenv("LANGSMITH_ENDPOINT") and not os.getenv("LANGCHAIN_ENDPOINT"):
     os.environ["LANGCHAIN_ENDPOINT"] = os.getenv("LANGSMITH_ENDPOINT")
-tracing_flag = os.getenv("LANGSMITH_TRACING_V2") or os.getenv("LANGWSMITH_TRACING_V2")
-if tracing_flag and not os.getenv("LANGCHAIN_TRACING_V2"):
-    os.environ["LANGCHAIN_TRACING_V2"] = tracing_flag
+# 추적은 전역 LANGCHAIN_TRACING_V2 대신 tracing 모듈이 샘플링해 비동기로 내보냄
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    # 백그라운드 예열 (끝나면 /ready가 200)
+    warmup.start()
+    yield
+    warmup.stop()
+    loop_monitor.stop()
+    # 종료 시 남은 비동기 작업 취소, 대기 중인 추적 내보내기
+    job_store.shutdown()
+    tracer.shutdown()
 
-app = FastAPI(title="Kenopi CS Chatbot API", version="1.0.0")
+app = FastAPI(title="Kenopi CS Chatbot API", version="1.0.0", lifespan=lifespan)
 
-# include kenopi router
+# include kenopi routers
 app.include_router(kenopi_router)
+if JOBS_API_ENABLED:
+    app.include_router(jobs_router)
+app.include_router(debug_router)
 
 # CORS 설정 - 카페24 도메인 추가
 app.add_middleware(
@@ -38,19 +63,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 위젯 스크립트에서 단계별 소요 시간, 속도 제한 상태 확인
+    expose_headers=["Server-Timing", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset",
+                    "RateLimit-Policy", "Retry-After"],
 )
 
+logger = get_logger(__name__)
+
 # LangSmith client status check
 LS_ENABLED = False
 try:
     if os.getenv("LANGSMITH_API_KEY"):
+        from langsmith import Client  # 키가 있을 때만 import (FAQ 전용 배포의 시작 시간 단축)
+
         client = Client()
-        print(f"[Main] LangSmith client enabled for project: {os.getenv('LANGSMITH_PROJECT','kenopi-cs-chatbot')}")
+        logger.info("LangSmith client enabled", extra={"project": os.getenv("LANGSMITH_PROJECT", "kenopi-cs-chatbot")})
         LS_ENABLED = True
     else:
-        print("[Main] LangSmith API key not found")
+        logger.info("LangSmith API key not found")
 except Exception:
-    print("[Main] LangSmith client NOT enabled")
+    logger.warning("LangSmith client NOT enabled")
     LS_ENABLED = False
 
 @app.get("/")
@@ -63,8 +95,24 @@ async def health_check():
         "status": "healthy",
         "openai_configured": bool(os.getenv("OPENAI_API_KEY")),
         "langsmith_enabled": LS_ENABLED,
+        "abandoned_work": abandoned_work_stats(),
+        "jobs": job_store.stats(),
+        "rate_limit": rate_limiter.stats(),
     }
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """예열(FAQ 인덱스, LLM 연결, MCP 패키지)이 끝난 뒤에만 200 - 롤링 배포 시 트래픽 전환 기준"""
+    status = warmup.status()
+    if not warmup.ready:
+        response.status_code = 503
+    return status
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 스크레이프용 메트릭 (단계별 지연 시간, 폴백, 버려진 작업 등)"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Pydantic 모델 (일반 채팅용 - 제한된 응답)
 class ChatMessage(BaseModel):
     role: str
@@ -0,0 +1,191 @@
+"""
+요청 단위 파이프라인 추적
+단계별(FAQ 검색, 의도 파악, 복잡도 분석, MCP, LLM, 품질 검증, 폴백) 소요 시간을 모아 두었다가
+요청이 끝나면 선택된 모드/처리 결과 라벨로 메트릭에 반영
+"""
+
+import contextvars
+import functools
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cancellation import RequestCancelled
+from log_config import get_logger
+from metrics import FALLBACKS, REQUEST_DURATION, REQUESTS, STAGE_DURATION
+from slow_requests import slow_request_log
+from token_usage import usage_ledger
+from tracing import tracer
+
+# 요청 완료 로그 (KENOPI_LOG_LEVEL=WARNING이면 출력 안 함)
+request_logger = get_logger("kenopi.request")
+
+# 처리 결과 라벨
+OK = "ok"
+FALLBACK = "fallback"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class RequestTrace:
+    """한 요청의 단계별 소요 시간 기록 (팬아웃 스레드에서도 같은 객체에 기록)"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.mode = "unknown"
+        self.outcome = OK
+        self.fallback_reason: Optional[str] = None
+        self.stages: List[Tuple[str, float, float]] = []  # (단계, 시작 perf_counter, 소요 초)
+        self.attributes: Dict[str, Any] = {}  # query_hash, analysis, mcp_exit 등 진단 정보
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.sample_draw = random.random()  # 추적 샘플링 결정값 (요청 시작 시 고정)
+        self.duration: Optional[float] = None
+
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """이 추적을 현재 컨텍스트에 설정하고 func 실행 (워커 스레드의 ctx.run 안에서 호출)"""
+        token = _current_trace.set(self)
+        try:
+            return func(*args)
+        except RequestCancelled:
+            self.outcome = CANCELLED
+            raise
+        except Exception:
+            self.outcome = ERROR
+            raise
+        finally:
+            _current_trace.reset(token)
+            self.finish()
+
+    def finish(self) -> None:
+        """요청 종료 - 전체/단계별 소요 시간을 메트릭에 반영 (한 번만)"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.started
+        if self.outcome == OK and self.fallback_reason:
+            self.outcome = FALLBACK
+        REQUESTS.inc(endpoint=self.endpoint, mode=self.mode, outcome=self.outcome)
+        REQUEST_DURATION.observe(self.duration, endpoint=self.endpoint, mode=self.mode, outcome=self.outcome)
+        for name, _, seconds in self.stages:
+            STAGE_DURATION.observe(seconds, stage=name, mode=self.mode, outcome=self.outcome)
+        if "usage" in self.attributes:
+            usage_ledger.add(self.mode, self.attributes.get("intent"), self.attributes["usage"])
+        slow_request_log.offer(self)
+        tracer.offer(self)
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info("request finished", extra={
+                "endpoint": self.endpoint,
+                "mode": self.mode,
+                "outcome": self.outcome,
+                "fallback_reason": self.fallback_reason,
+                "query_hash": self.attributes.get("query_hash"),
+                "timings": self.timings_ms(),
+            })
+
+    def stage_totals(self) -> Dict[str, float]:
+        """단계별 누적 소요 시간 (초)"""
+        totals: Dict[str, float] = {}
+        for name, _, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def timings_ms(self) -> Dict[str, float]:
+        """단계별 누적 소요 시간 + 전체 시간 (밀리초)"""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.stage_totals().items()}
+        total = self.duration if self.duration is not None else time.perf_counter() - self.started
+        timings["total"] = round(total * 1000, 2)
+        return timings
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (예: "faq;dur=0.41, llm;dur=812.3, total;dur=815.02")"""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings_ms().items())
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "kenopi_request_trace", default=None
+)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+class stage:
+    """단계 소요 시간 측정 컨텍스트 매니저 (추적 중인 요청이 없으면 아무 것도 하지 않음)"""
+
+    __slots__ = ("name", "_trace", "_started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self._trace = _current_trace.get()
+        if self._trace is not None:
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._trace is not None:
+            self._trace.stages.append((self.name, self._started, time.perf_counter() - self._started))
+
+
+def timed_stage(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """함수 전체를 하나의 단계로 측정하는 데코레이터"""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                trace.stages.append((name, started, time.perf_counter() - started))
+        return wrapper
+    return decorator
+
+
+def set_mode(mode: str) -> None:
+    """파이프라인이 선택한 모드 기록 (메트릭 라벨)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mode = mode
+
+
+def annotate(**values: Any) -> None:
+    """현재 요청 추적에 진단 정보 기록"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(values)
+
+
+def annotate_append(key: str, value: Any) -> None:
+    """여러 번 발생할 수 있는 진단 정보(MCP 종료 상태 등)를 목록으로 기록"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.setdefault(key, []).append(value)
+
+
+def record_usage(usage: Dict[str, Any]) -> None:
+    """LLM/MCP 호출 토큰 사용량 기록 (요청 종료 시 최종 모드/의도 기준으로 집계)"""
+    trace = _current_trace.get()
+    if trace is None:
+        usage_ledger.add("untraced", None, [usage])
+    else:
+        trace.attributes.setdefault("usage", []).append(usage)
+
+
+def query_hash(text: str) -> str:
+    """질문 원문 대신 남기는 식별용 해시"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def record_fallback(reason: str) -> None:
+    """기본 응답으로 폴백한 사유 기록"""
+    FALLBACKS.inc(reason=reason)
+    trace = _current_trace.get()
+    if trace is not None and trace.fallback_reason is None:
+        trace.fallback_reason = reason
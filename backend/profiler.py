@@ -0,0 +1,92 @@
+"""
+프로세스 내부 스택 샘플링 프로파일러
+운영 컨테이너에 외부 프로파일러를 붙일 수 없을 때, 일정 시간 동안 모든 스레드의 스택을 주기적으로 수집해
+flamegraph.pl / speedscope 등에 바로 넣을 수 있는 collapsed stack 형식("스레드;바깥;...;안쪽 횟수")으로 반환
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+
+PROFILE_MAX_SECONDS = float(os.getenv("KENOPI_PROFILE_MAX_SECONDS", "60"))
+PROFILE_DEFAULT_INTERVAL = 0.01  # 100Hz
+
+_BACKEND_DIR = str(Path(__file__).parent) + os.sep
+
+# 동시에 하나의 프로파일만 실행
+_profile_lock = threading.Lock()
+
+
+class ProfileInProgress(Exception):
+    """다른 프로파일이 실행 중"""
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    if filename.startswith(_BACKEND_DIR):
+        return filename[len(_BACKEND_DIR):]
+    marker = "site-packages" + os.sep
+    index = filename.rfind(marker)
+    if index >= 0:
+        return filename[index + len(marker):]
+    return filename.rsplit(os.sep, 2)[-1] if os.sep in filename else filename
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _is_idle_worker(leaf_code) -> bool:
+    """작업을 기다리는 스레드풀 워커 (work_queue.get에서 대기 중)"""
+    return leaf_code.co_name == "_worker" and leaf_code.co_filename.endswith(os.path.join("futures", "thread.py"))
+
+
+def sample_stacks(seconds: float, interval: float = PROFILE_DEFAULT_INTERVAL,
+                  include_idle: bool = False) -> Dict[str, int]:
+    """
+    seconds 동안 interval마다 모든 스레드 스택을 수집해 collapsed stack → 샘플 수로 집계
+
+    include_idle=False면 작업 대기 중인 스레드풀 워커는 제외 (I/O 대기 중인 스레드는 포함).
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileInProgress()
+    try:
+        own_id = threading.get_ident()
+        counts: Counter = Counter()
+        names: Dict[int, str] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                if not include_idle and _is_idle_worker(frame.f_code):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, f"thread-{thread_id}").replace(";", ","))
+                counts[";".join(reversed(labels))] += 1
+            del frames
+            time.sleep(interval)
+        return dict(counts)
+    finally:
+        _profile_lock.release()
+
+
+def to_collapsed(counts: Dict[str, int]) -> str:
+    """collapsed stack 텍스트 (샘플 수 내림차순)"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def profile(seconds: float, interval: float = PROFILE_DEFAULT_INTERVAL,
+            include_idle: bool = False) -> str:
+    return to_collapsed(sample_stacks(seconds, interval, include_idle))
@@ -0,0 +1,279 @@
+"""
+프롬프트 조립
+정적 블록(시스템/사고/감정/품질 프롬프트, MCP 지시문)은 모드별로 한 번만 이어 붙여 두고
+요청마다 바뀌는 대화 히스토리·FAQ·질문은 항상 그 뒤에만 붙인다.
+→ 제공자 측 프롬프트 캐시(앞부분이 같은 요청 재사용)가 적중하도록 앞부분을 바이트 단위로 고정
+
+환경변수: KENOPI_PROMPT_CACHE_TTL(300, 제공자 캐시 유지 시간 근사),
+          KENOPI_PROMPT_CACHE_MIN_TOKENS(1024, 캐시 대상이 되는 최소 앞부분 길이)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from conversation_context import context_builder
+from kenopi_prompt import (
+    EMOTION_RESPONSIVE_PROMPT,
+    KENOPI_SYSTEM_PROMPT,
+    KENOPI_THINKING_PROMPT,
+    QUALITY_ASSURANCE_PROMPT,
+)
+from metrics import Counter, Histogram
+from token_usage import estimate_message_tokens, estimate_messages_tokens, estimate_tokens
+
+PROMPT_CACHE_TTL = float(os.getenv("KENOPI_PROMPT_CACHE_TTL", "300"))
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("KENOPI_PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+PROMPT_TOKENS = Histogram(
+    "kenopi_prompt_tokens", "Estimated prompt size sent to the model (total or static prefix)",
+    ["template", "part"], buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+PROMPT_PREFIX = Counter(
+    "kenopi_prompt_prefix_total", "Prompts whose static prefix was sent within the cache TTL (reused) or not (cold)",
+    ["template", "result"],
+)
+
+
+class PromptTemplate:
+    """정적 앞부분(import 시 한 번 조립) + 요청마다 채우는 뒷부분"""
+
+    def __init__(self, name: str, static_blocks: List[str], suffix: str):
+        self.name = name
+        self.prefix = "\n\n".join(block.strip() for block in static_blocks) + "\n\n"
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.suffix = suffix
+
+    def render(self, **values: Any) -> str:
+        return self.prefix + self.suffix.format(**values)
+
+
+# 추론/고급 모드 컨텍스트 (MCP 프롬프트 안에 그대로 들어감)
+THINKING_CONTEXT = PromptTemplate(
+    "thinking",
+    [
+        KENOPI_THINKING_PROMPT,
+        EMOTION_RESPONSIVE_PROMPT,
+        """
+**🧠 단계별 추론 모드 활성화**
+- 체계적인 분석을 통한 정확한 답변
+- 단계별 사고 과정 적용
+""",
+    ],
+    "대화 히스토리:\n{history}\n\nFAQ 매칭 결과:\n{faq}",
+)
+
+ENHANCED_CONTEXT = PromptTemplate(
+    "enhanced",
+    [
+        KENOPI_THINKING_PROMPT,
+        EMOTION_RESPONSIVE_PROMPT,
+        QUALITY_ASSURANCE_PROMPT,
+        """
+**🔍 고급 분석 모드 활성화**
+- 복잡한 문의나 중요한 상황으로 판단됨
+- 다각도 검토 및 최적 솔루션 제시
+- 고객 만족도 최우선 고려
+""",
+    ],
+    "대화 히스토리:\n{history}\n\nFAQ 매칭 결과:\n{faq}",
+)
+
+MODE_CONTEXTS = {"thinking": THINKING_CONTEXT, "enhanced": ENHANCED_CONTEXT}
+
+# MCP Sequential Thinking 지시문 (지시문 → 컨텍스트 → 질문 순서, 마무리 지시도 앞으로 이동)
+MCP_STEP_PROMPT = PromptTemplate(
+    "mcp_step",
+    [
+        """
+당신은 케노피(Kenopi) 생활용품 브랜드의 전문 고객지원 담당자입니다.
+
+다음 단계로 생각해주세요:
+
+1. 🔍 고객 질문 분석
+   - 고객이 실제로 원하는 것은 무엇인가요?
+   - 어떤 감정 상태인가요? (불만, 궁금, 걱정 등)
+
+2. 💡 최적 해결책 탐색
+   - 케노피 정책에 맞는 해결 방법은?
+   - 고객에게 가장 도움이 되는 방법은?
+
+3. ✨ 친절한 응답 구성
+   - 이해하기 쉬운 설명
+   - 구체적인 행동 지침
+   - 추가 도움 제안
+
+단계별로 생각하여 친절하고 정확한 답변을 만들어주세요.
+
+컨텍스트:
+""",
+    ],
+    "{context}\n\n고객 질문: {query}",
+)
+
+MCP_ENHANCED_PROMPT = PromptTemplate(
+    "mcp_enhanced",
+    [
+        """
+복잡한 고객 문의를 해결하기 위해 다음과 같이 종합적으로 접근하세요:
+
+🔍 **문제 분석**
+- 고객의 정확한 니즈 파악
+- 관련된 케노피 정책 검토
+- 가능한 해결 옵션들 나열
+
+💭 **다각도 검토**
+방법 A: 즉시 해결 가능한 방법
+방법 B: 단계적 해결 방법
+방법 C: 장기적 만족도를 위한 방법
+
+✅ **최적 솔루션 선택**
+- 고객에게 가장 유리한 방법
+- 실행 가능성 검토
+- 명확한 안내
+
+각 단계를 거쳐 최고의 고객 경험을 제공하는 답변을 만들어주세요.
+
+컨텍스트:
+""",
+    ],
+    "{context}\n\n고객 문의: {query}",
+)
+
+MCP_QUICK_PROMPT = PromptTemplate(
+    "mcp_quick",
+    [
+        """
+케노피 고객지원 담당자로서 다음 질문에 친절하고 정확하게 답변해주세요.
+
+응답 시 다음을 포함해주세요:
+- 명확하고 이해하기 쉬운 설명
+- 필요한 경우 구체적인 절차 안내
+- 추가 도움이 필요한지 문의
+
+컨텍스트:
+""",
+    ],
+    "{context}\n\n질문: {query}",
+)
+
+BASIC_PREFIX_TOKENS = estimate_message_tokens(KENOPI_SYSTEM_PROMPT)
+
+# 중간 신뢰도 FAQ 재작성 (저가 모델, FAQ 답변 밖의 정보는 추가하지 않도록 제한)
+REWRITE_SYSTEM_PROMPT = KENOPI_SYSTEM_PROMPT.strip() + """
+
+아래 FAQ 답변만 근거로 고객 질문에 맞게 답변을 다듬어.
+- FAQ 답변에 없는 정보(수치, 기간, 정책, 연락처)는 절대 추가하지 마.
+- 질문과 관련된 부분만 간결하게 존댓말로 전달해.
+- FAQ 답변으로 질문에 답할 수 없으면 NO_ANSWER 한 단어만 출력해.
+"""
+REWRITE_PREFIX_TOKENS = estimate_message_tokens(REWRITE_SYSTEM_PROMPT)
+
+
+def _message_classes():
+    """LangChain 메시지 클래스 (import가 무거우므로 LLM 프롬프트를 처음 조립할 때 로드)"""
+    from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+    return AIMessage, HumanMessage, SystemMessage
+
+
+class PromptStats:
+    """템플릿별 프롬프트 크기와 정적 앞부분 재사용률 (TTL 안에 같은 앞부분을 보냈으면 재사용으로 간주)"""
+
+    def __init__(self, cache_ttl: float = 300.0, cache_min_tokens: int = 1024):
+        self.cache_ttl = cache_ttl
+        self.cache_min_tokens = cache_min_tokens
+        self._lock = threading.Lock()
+        # 템플릿 → [프롬프트 수, 재사용 수, 앞부분 토큰, 전체 토큰 합계, 마지막 전송 시각]
+        self._rows: Dict[str, List[float]] = {}
+
+    def record(self, template: str, prefix_tokens: int, prompt_tokens: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            row = self._rows.setdefault(template, [0, 0, prefix_tokens, 0, float("-inf")])
+            reused = now - row[4] <= self.cache_ttl
+            row[0] += 1
+            row[1] += reused
+            row[2] = prefix_tokens
+            row[3] += prompt_tokens
+            row[4] = now
+        PROMPT_PREFIX.inc(template=template, result="reused" if reused else "cold")
+        PROMPT_TOKENS.observe(prompt_tokens, template=template, part="total")
+        PROMPT_TOKENS.observe(prefix_tokens, template=template, part="prefix")
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = {template: list(values) for template, values in self._rows.items()}
+        return {
+            "cache_ttl_seconds": self.cache_ttl,
+            "cache_min_tokens": self.cache_min_tokens,
+            "templates": {
+                template: {
+                    "prompts": int(prompts),
+                    "prefix_reuse_rate": round(reused / prompts, 3) if prompts else 0.0,
+                    "prefix_tokens": int(prefix_tokens),
+                    "avg_prompt_tokens": round(total / prompts, 1) if prompts else 0.0,
+                    "prefix_share": round(prefix_tokens * prompts / total, 3) if total else 0.0,
+                    "cacheable": prefix_tokens >= self.cache_min_tokens,
+                }
+                for template, (prompts, reused, prefix_tokens, total, _) in sorted(rows.items())
+            },
+        }
+
+
+def format_faq(faq: Optional[Dict[str, Any]]) -> str:
+    if not faq:
+        return "매칭되는 FAQ 없음"
+    return f"Q: {faq['question']}\nA: {faq['answer']}"
+
+
+def build_thinking_context(mode: str, conversation_context: str, faq: Optional[Dict[str, Any]]) -> str:
+    """추론/고급 모드 컨텍스트 - 모드별 정적 앞부분 + 히스토리 + FAQ"""
+    return MODE_CONTEXTS[mode].render(history=conversation_context, faq=format_faq(faq))
+
+
+def build_mcp_prompt(template: PromptTemplate, context: str, query: str) -> str:
+    """MCP 지시문 + 컨텍스트 + 질문 (컨텍스트가 모드 앞부분으로 시작하면 그만큼 정적 앞부분이 길어짐)"""
+    prompt = template.render(context=context, query=query)
+    name, prefix_tokens = template.name, template.prefix_tokens
+    for mode_context in MODE_CONTEXTS.values():
+        if context.startswith(mode_context.prefix):
+            name = f"{name}+{mode_context.name}"
+            prefix_tokens += mode_context.prefix_tokens
+            break
+    prompt_stats.record(name, prefix_tokens, estimate_tokens(prompt))
+    return prompt
+
+
+def build_basic_messages(history: List[Dict[str, str]], faq: Optional[Dict[str, Any]]) -> List[Any]:
+    """기본 모드 메시지 - 고정 시스템 메시지 → 이전 대화 요약 → 최근 대화 → FAQ 참고 답변 (FAQ는 맨 뒤)"""
+    AIMessage, HumanMessage, SystemMessage = _message_classes()
+    messages: List[Any] = [SystemMessage(content=KENOPI_SYSTEM_PROMPT)]
+    context = context_builder.build(history)
+    if context.summary:
+        messages.append(SystemMessage(content=context.summary))
+    for m in context.recent:
+        if m["role"] == "user":
+            messages.append(HumanMessage(content=m["content"]))
+        else:
+            messages.append(AIMessage(content=m["content"]))
+    if faq:
+        messages.append(SystemMessage(content=f"FAQ 참고 답변:\n{format_faq(faq)}"))
+    prompt_stats.record("basic", BASIC_PREFIX_TOKENS, estimate_messages_tokens(messages))
+    return messages
+
+
+def build_rewrite_messages(query: str, faq: Dict[str, Any]) -> List[Any]:
+    """FAQ 재작성 메시지 - 고정 시스템 메시지 → FAQ 항목 + 고객 질문"""
+    _, HumanMessage, SystemMessage = _message_classes()
+    messages = [
+        SystemMessage(content=REWRITE_SYSTEM_PROMPT),
+        HumanMessage(content=f"{format_faq(faq)}\n\n고객 질문: {query}"),
+    ]
+    prompt_stats.record("faq_rewrite", REWRITE_PREFIX_TOKENS, estimate_messages_tokens(messages))
+    return messages
+
+
+# 전역 인스턴스
+prompt_stats = PromptStats(cache_ttl=PROMPT_CACHE_TTL, cache_min_tokens=PROMPT_CACHE_MIN_TOKENS)
@@ -0,0 +1,171 @@
+"""
+질문 복잡도/긴급도/유형 일괄 분류기
+로그에 쌓인 대량의 질문을 _analyze_query_complexity_detailed / FAQ 신뢰도 구간 / _select_optimal_mode와
+동일한 결과로 빠르게 분류 (임계값 튜닝용)
+
+- 모든 지표 문자열을 한 번에 검사하는 첫 글자 인덱스 + 지표 비트마스크(행렬)로 사전 컴파일
+- 질문별로 '어떤 지표가 포함됐는지'를 비트마스크 하나로 구한 뒤 범주별 개수는 popcount로 계산
+- 같은 질문은 한 번만 분류, 대량 입력은 여러 프로세스로 분할 처리
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from kenopi_chatbot import (
+    COMPLEXITY_INDICATORS,
+    QUESTION_TYPE_INDICATORS,
+    URGENCY_INDICATORS,
+    _complexity_level,
+    _select_optimal_mode,
+    _urgency_level,
+    faq_tier_of,
+    get_rewrite_llm,
+    score_faq_batch,
+)
+
+# 지표 조합 → 판정 결과 메모 (로그 질문은 조합이 크게 겹침)
+_DECISION_CACHE_SIZE = 65536
+
+# (complexity, type, urgency, length, high, medium, low)
+Analysis = Tuple[str, str, str, int, int, int, int]
+
+
+class QueryClassifier:
+    """사전 컴파일된 지표 인덱스로 질문을 분류"""
+
+    def __init__(self):
+        tables = [
+            COMPLEXITY_INDICATORS["high"],
+            COMPLEXITY_INDICATORS["medium"],
+            COMPLEXITY_INDICATORS["low"],
+            URGENCY_INDICATORS["high"],
+            URGENCY_INDICATORS["medium"],
+        ] + list(QUESTION_TYPE_INDICATORS.values())
+
+        patterns = list(dict.fromkeys(indicator for table in tables for indicator in table))
+        bits = {pattern: 1 << i for i, pattern in enumerate(patterns)}
+
+        # 첫 글자 → [(지표, 비트)] : 질문에 없는 글자로 시작하는 지표는 검사하지 않음
+        self._by_first_char: Dict[str, List[Tuple[str, int]]] = {}
+        for pattern in patterns:
+            self._by_first_char.setdefault(pattern[0], []).append((pattern, bits[pattern]))
+        self._first_chars = frozenset(self._by_first_char)
+
+        # 지표 행렬: 범주별 비트마스크
+        masks = [sum(bits[indicator] for indicator in table) for table in tables]
+        (self._high_mask, self._medium_mask, self._low_mask,
+         self._urgency_high_mask, self._urgency_medium_mask) = masks[:5]
+        self._type_masks = list(zip(QUESTION_TYPE_INDICATORS.keys(), masks[5:]))
+
+        self._decisions: Dict[Tuple[int, int], Tuple[Any, ...]] = {}
+
+    def match_mask(self, query_lower: str) -> int:
+        """질문에 포함된 지표들의 비트마스크"""
+        mask = 0
+        for char in self._first_chars.intersection(query_lower):
+            for pattern, bit in self._by_first_char[char]:
+                if pattern in query_lower:
+                    mask |= bit
+        return mask
+
+    def _decide(self, mask: int, length: int) -> Tuple[Any, ...]:
+        high = (mask & self._high_mask).bit_count()
+        medium = (mask & self._medium_mask).bit_count()
+        low = (mask & self._low_mask).bit_count()
+        urgency = _urgency_level(
+            (mask & self._urgency_high_mask).bit_count(),
+            (mask & self._urgency_medium_mask).bit_count(),
+        )
+        question_type = next((q_type for q_type, type_mask in self._type_masks if mask & type_mask), "general")
+        return _complexity_level(high, medium, low, length), question_type, urgency, high, medium, low
+
+    def analyze(self, query: str) -> Analysis:
+        """(complexity, type, urgency, length, high, medium, low) 튜플 - 프로세스 간 전달용 압축 형태"""
+        length = len(query)
+        mask = self.match_mask(query.lower())
+        # 복잡도 판정은 길이 경계(<20, ≤30, ≤50, >50)만 보므로 구간별로 메모
+        key = (mask, 0 if length < 20 else 1 if length <= 30 else 2 if length <= 50 else 3)
+        decision = self._decisions.get(key)
+        if decision is None:
+            decision = self._decide(mask, length)
+            if len(self._decisions) < _DECISION_CACHE_SIZE:
+                self._decisions[key] = decision
+        complexity, question_type, urgency, high, medium, low = decision
+        return complexity, question_type, urgency, length, high, medium, low
+
+    def classify(self, query: str) -> Dict[str, Any]:
+        """_analyze_query_complexity_detailed(query)와 동일한 결과"""
+        return _to_dict(self.analyze(query))
+
+
+def _to_dict(analysis: Analysis) -> Dict[str, Any]:
+    complexity, question_type, urgency, length, high, medium, low = analysis
+    return {
+        "complexity": complexity,
+        "type": question_type,
+        "urgency": urgency,
+        "length": length,
+        "indicators": {"high": high, "medium": medium, "low": low},
+    }
+
+
+_classifier: Optional[QueryClassifier] = None
+
+
+def get_classifier() -> QueryClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = QueryClassifier()
+    return _classifier
+
+
+def _analyze_chunk(queries: List[str]) -> List[Analysis]:
+    analyze = get_classifier().analyze
+    return [analyze(query) for query in queries]
+
+
+def classify_queries(queries: Sequence[str], include_mode: bool = False,
+                     processes: int = 1, chunk_size: int = 20000) -> List[Dict[str, Any]]:
+    """
+    질문 목록 일괄 분류 (입력 순서 유지, 각 항목은 _analyze_query_complexity_detailed 결과와 동일)
+
+    include_mode=True면 FAQ 일괄 점수 계산(검색 캐시 미사용) 후 "faq_tier"(high/mid/low)와
+    generate_advanced_response가 고를 "selected_mode"(faq/basic/thinking/enhanced)를 추가.
+    (복합 질문 분리, MCP 미설치·LLM 오류 폴백처럼 실행해야 알 수 있는 경로는 반영하지 않음)
+    processes>1이고 고유 질문이 chunk_size보다 많으면 여러 프로세스로 나눠 처리.
+    """
+    unique = list(dict.fromkeys(queries))
+    get_classifier()  # fork 전에 컴파일해 자식 프로세스가 그대로 물려받도록
+
+    if processes > 1 and len(unique) > chunk_size:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            analyses = [analysis for chunk in pool.map(_analyze_chunk, chunks) for analysis in chunk]
+    else:
+        analyses = _analyze_chunk(unique)
+
+    by_query = dict(zip(unique, analyses))
+    if not include_mode:
+        return [_to_dict(by_query[query]) for query in queries]
+
+    # 채팅용 FAQ 검색 캐시를 거치지 않음 (대량 분석이 실시간 대화의 캐시 항목을 밀어내지 않도록)
+    faq_results = score_faq_batch(unique)
+    rewrite_available = get_rewrite_llm() is not None
+    decisions = {}
+    for query, analysis in by_query.items():
+        # 채팅 파이프라인처럼 high 구간(재작성 LLM이 있으면 mid 구간도)은 모드 선택 없이 FAQ로 답변
+        tier = faq_tier_of(faq_results[query])
+        if tier == "high" or (tier == "mid" and rewrite_available):
+            mode = "faq"
+        else:
+            mode = _select_optimal_mode(analysis[0], analysis[1], analysis[2], False)
+        decisions[query] = (tier, mode)
+    results = []
+    for query in queries:
+        result = _to_dict(by_query[query])
+        result["faq_tier"], result["selected_mode"] = decisions[query]
+        results.append(result)
+    return results
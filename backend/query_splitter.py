@@ -0,0 +1,49 @@
+"""
+복합 질문 분리기
+"교환하고 싶은데 배송비는 얼마고 반품 주소는 어디예요?" 같은 메시지를 하위 질문으로 분리
+"""
+
+import re
+from typing import Callable, List
+
+# 문장 경계 (물음표/느낌표/마침표 뒤 공백, 줄바꿈)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[?？!！.。])\s+|\n+")
+
+# 연결어/연결 어미 경계: "그리고", "또", "~는데", "~고", 쉼표
+_CLAUSE_BOUNDARY = re.compile(
+    r"(?:^|\s+)(?:그리고|그리고요|또한|또|그런데|근데)\s+"
+    r"|(?<=는데|은데|인데|던데)[,\s]+"
+    r"|(?<=[가-힣]고)[,\s]+"
+    r"|,\s*"
+)
+
+
+def split_compound_query(query: str, has_topic: Callable[[str], bool]) -> List[str]:
+    """
+    메시지를 하위 질문 목록으로 분리
+
+    has_topic: 조각이 독립적인 주제(FAQ/의도)를 갖는지 판단하는 함수.
+    주제가 없는 조각("싶은데" 등)은 인접한 조각에 다시 붙여 의미 단위를 유지한다.
+    분리할 수 없으면 원문 하나만 담긴 리스트를 반환한다.
+    """
+    fragments = []
+    for sentence in _SENTENCE_BOUNDARY.split(query.strip()):
+        fragments.extend(part.strip() for part in _CLAUSE_BOUNDARY.split(sentence) if part and part.strip())
+
+    if len(fragments) <= 1:
+        return [query.strip()]
+
+    parts: List[str] = []
+    prefix = ""
+    for fragment in fragments:
+        if has_topic(fragment):
+            parts.append(f"{prefix} {fragment}".strip())
+            prefix = ""
+        elif parts:
+            parts[-1] = f"{parts[-1]} {fragment}"
+        else:
+            prefix = f"{prefix} {fragment}".strip()
+
+    if prefix or len(parts) < 2:  # 주제가 하나뿐이거나 없음
+        return [query.strip()]
+    return parts
@@ -0,0 +1,148 @@
+"""
+클라이언트별 요청 속도 제한 (token bucket)
+위젯 무한 루프나 악성 클라이언트 하나가 LLM 호출을 무제한으로 만들지 못하도록 채팅 라우트 앞에서 확인
+
+- 예산은 두 가지: faq(FAQ 정확 매칭/LLM 키 없음 - 저렴), llm(그 외 - LLM 호출 가능성 있음)
+- 클라이언트 키는 IP (KENOPI_RATE_LIMIT_KEY=session이면 X-Session-Id 헤더, 없으면 IP)
+- 버킷은 최근 사용 순으로 최대 KENOPI_RATE_LIMIT_MAX_KEYS개만 보관 (오래 안 쓴 버킷부터 제거 = 가득 찬 상태로 초기화)
+- 응답 헤더: RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset / RateLimit-Policy, 거절 시 429 + Retry-After
+
+환경변수: KENOPI_RATE_LIMIT(1), KENOPI_RATE_LIMIT_FAQ(60/60 = 60회/60초), KENOPI_RATE_LIMIT_LLM(10/60),
+          KENOPI_RATE_LIMIT_KEY(ip), KENOPI_RATE_LIMIT_PROXY_HOPS(0, 앞단 프록시 수 - X-Forwarded-For에서 클라이언트 IP 선택),
+          KENOPI_RATE_LIMIT_MAX_KEYS(10000)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from metrics import Counter, Gauge
+
+RATE_LIMIT_ENABLED = os.getenv("KENOPI_RATE_LIMIT", "1") != "0"
+RATE_LIMIT_KEY = os.getenv("KENOPI_RATE_LIMIT_KEY", "ip")
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("KENOPI_RATE_LIMIT_PROXY_HOPS", "0"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("KENOPI_RATE_LIMIT_MAX_KEYS", "10000"))
+
+SESSION_HEADER = "x-session-id"
+
+RATE_LIMITED = Counter("kenopi_rate_limited_total", "Requests rejected by the per-client rate limiter", ["budget"])
+
+
+def _parse_budget(spec: str) -> Tuple[int, float]:
+    """"횟수/초" → (버킷 크기, 초당 충전량)"""
+    capacity, period = spec.split("/", 1)
+    return int(capacity), int(capacity) / float(period)
+
+
+class RateLimitDecision:
+    """버킷 확인 결과 (헤더 값 포함)"""
+
+    def __init__(self, allowed: bool, budget: str, limit: int, remaining: int, reset: int,
+                 retry_after: int, period: int):
+        self.allowed = allowed
+        self.budget = budget
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+        self.period = period
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+            "RateLimit-Policy": f'{self.limit};w={self.period};comment="{self.budget}"',
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class RateLimiter:
+    """예산별 token bucket (키 수 제한 LRU 저장소)"""
+
+    def __init__(self, budgets: Dict[str, Tuple[int, float]], max_keys: int = 10000, enabled: bool = True):
+        self.budgets = budgets
+        self.max_keys = max_keys
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # (예산, 클라이언트 키) → [남은 토큰, 마지막 충전 시각]
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        budgets = {
+            "faq": _parse_budget(os.getenv("KENOPI_RATE_LIMIT_FAQ", "60/60")),
+            "llm": _parse_budget(os.getenv("KENOPI_RATE_LIMIT_LLM", "10/60")),
+        }
+        return cls(budgets, max_keys=RATE_LIMIT_MAX_KEYS, enabled=RATE_LIMIT_ENABLED)
+
+    def acquire(self, key: str, budget: str, cost: float = 1.0,
+                now: Optional[float] = None) -> Optional[RateLimitDecision]:
+        """토큰 cost개 사용 시도 (비활성화면 None)"""
+        if not self.enabled:
+            return None
+        capacity, rate = self.budgets[budget]
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get((budget, key))
+            if bucket is None:
+                bucket = self._buckets[(budget, key)] = [float(capacity), now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._buckets.move_to_end((budget, key))
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            allowed = bucket[0] >= cost
+            if allowed:
+                bucket[0] -= cost
+            tokens = bucket[0]
+        if not allowed:
+            RATE_LIMITED.inc(budget=budget)
+        return RateLimitDecision(
+            allowed=allowed,
+            budget=budget,
+            limit=capacity,
+            remaining=int(tokens),
+            reset=math.ceil((capacity - tokens) / rate),
+            retry_after=0 if allowed else max(1, math.ceil((cost - tokens) / rate)),
+            period=round(capacity / rate),
+        )
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "buckets": len(self._buckets),
+                "max_keys": self.max_keys,
+                "evicted": self._evicted,
+                "budgets": {name: {"limit": capacity, "per_second": round(rate, 4)}
+                            for name, (capacity, rate) in self.budgets.items()},
+            }
+
+
+def client_key(headers: Dict[str, str], peer: Optional[str]) -> str:
+    """요청 헤더와 접속 주소로 클라이언트 키 결정 (헤더 이름은 소문자)"""
+    if RATE_LIMIT_KEY == "session" and headers.get(SESSION_HEADER):
+        return "session:" + headers[SESSION_HEADER][:128]
+    ip = peer or "unknown"
+    if RATE_LIMIT_PROXY_HOPS > 0 and headers.get("x-forwarded-for"):
+        # 앞단 프록시들이 각자 오른쪽에 덧붙이므로 오른쪽에서 hops번째가 실제 클라이언트 (그보다 왼쪽은 위조 가능)
+        forwarded = [part.strip() for part in headers["x-forwarded-for"].split(",") if part.strip()]
+        if forwarded:
+            ip = forwarded[-min(RATE_LIMIT_PROXY_HOPS, len(forwarded))]
+    return "ip:" + ip
+
+
+# 전역 인스턴스
+rate_limiter = RateLimiter.from_env()
+
+RATE_LIMIT_BUCKETS = Gauge("kenopi_rate_limit_buckets", "Client buckets currently held by the rate limiter",
+                           callback=lambda: float(len(rate_limiter._buckets)))
@@ -0,0 +1,86 @@
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from loop_monitor import loop_monitor
+from profiler import PROFILE_MAX_SECONDS, ProfileInProgress, profile
+from prompt_builder import prompt_stats
+from slow_requests import slow_request_log
+from token_usage import usage_ledger
+
+# 운영 진단용 토큰 (설정하지 않으면 /debug 엔드포인트 전체 비활성화)
+DEBUG_TOKEN = os.getenv("KENOPI_DEBUG_TOKEN", "")
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None),
+                        authorization: Optional[str] = Header(None)) -> None:
+    """X-Debug-Token 또는 Authorization: Bearer 헤더로 인증 (비활성화 상태면 존재 자체를 숨김)"""
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = x_debug_token
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token or not secrets.compare_digest(token, DEBUG_TOKEN):
+        raise HTTPException(status_code=401, detail="유효한 디버그 토큰이 필요합니다")
+
+router = APIRouter(prefix="/debug", tags=["Debug"], dependencies=[Depends(require_debug_token)],
+                   include_in_schema=False)
+
+@router.get("/loop")
+async def get_loop_stats():
+    """
+    이벤트 루프 지연 통계 + 최근 멈춤 기록 (최신순)
+
+    recent_stalls[].stack: 루프가 멈춰 있는 동안 캡처한 루프 스레드 스택 (안쪽 호출이 마지막)
+    """
+    return loop_monitor.stats()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+                      interval_ms: float = Query(10.0, ge=1.0, le=1000.0),
+                      include_idle: bool = False):
+    """
+    seconds 동안 워커 프로세스의 모든 스레드(이벤트 루프 + 스레드풀)를 샘플링한 collapsed stack
+
+    flamegraph.pl 또는 speedscope.app에 그대로 입력해 렌더링합니다.
+    (예: SequenceMatcher, pydantic 검증, LangChain 메시지 구성, I/O 대기 비중 확인)
+    """
+    try:
+        collapsed = await run_in_threadpool(profile, seconds, interval_ms / 1000, include_idle)
+    except ProfileInProgress:
+        raise HTTPException(status_code=409, detail="이미 프로파일링이 진행 중입니다")
+    return PlainTextResponse(collapsed)
+
+@router.get("/slow")
+async def get_slow_requests(limit: int = Query(0, ge=0)):
+    """
+    최근 window 안에서 가장 느린 요청들의 파이프라인 추적 (느린 순)
+
+    항목: 질문 해시, 선택 모드, 복잡도 분석, 단계별 소요 시간, MCP 종료 상태, 폴백 사유
+    """
+    return {
+        "capacity": slow_request_log.capacity,
+        "window_seconds": slow_request_log.window_seconds,
+        "requests": slow_request_log.snapshot(limit)
+    }
+
+@router.get("/usage")
+async def get_token_usage():
+    """
+    토큰 사용량/비용 집계 (프로세스 시작 이후 누적)
+
+    - by_mode: 모드별 요청당 평균 입력/출력 토큰과 비용 (기본 vs 추론/고급 모드 비교)
+    - rows: 모드·모델·의도별 상세 (estimated_calls: 제공자 usage 없이 추정한 호출 수)
+    """
+    return usage_ledger.report()
+
+@router.get("/prompts")
+async def get_prompt_stats():
+    """
+    템플릿별 프롬프트 크기와 정적 앞부분 재사용률 (프로세스 시작 이후 누적, 토큰 수는 추정값)
+
+    - prefix_reuse_rate: 같은 정적 앞부분을 cache_ttl 안에 다시 보낸 비율 (제공자 프롬프트 캐시 적중 근사)
+    - prefix_share: 전체 프롬프트 중 정적 앞부분 비중, cacheable: 캐시 최소 길이 이상 여부
+    """
+    return prompt_stats.report()
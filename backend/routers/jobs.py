@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from typing import Optional
+from jobs import job_store, JobQueueFull, Job
+from kenopi_chatbot import generate_advanced_response
+from pipeline_trace import RequestTrace
+from routers.kenopi import ChatReq, AdvancedChatResponse, check_rate_limit, to_advanced_response
+
+router = APIRouter(prefix="/kenopi/jobs", tags=["Kenopi Jobs"])
+
+# long-poll 최대 대기 시간 (초)
+MAX_WAIT_SECONDS = 30.0
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    poll_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str  # queued/running/succeeded/failed/cancelled
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[AdvancedChatResponse] = None
+    error: Optional[str] = None
+
+def _to_status_response(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result=to_advanced_response(job.result) if job.result else None,
+        error=job.error
+    )
+
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다 (만료되었거나 존재하지 않음)")
+    return job
+
+@router.post("", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(req: ChatReq, request: Request, response: Response):
+    """
+    대화를 비동기 작업으로 등록하고 즉시 job_id 반환
+    
+    고급 모드처럼 수십 초 걸릴 수 있는 응답을 HTTP 연결을 붙잡지 않고 처리합니다.
+    결과는 GET /kenopi/jobs/{job_id}?wait=N 으로 조회(long-poll)합니다.
+    """
+    history = [m.model_dump() for m in req.messages]
+    await check_rate_limit(request, response, history)
+    try:
+        trace = RequestTrace("jobs")
+        job = job_store.submit(trace.run, generate_advanced_response, history)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="대기 중인 작업이 너무 많습니다. 잠시 후 다시 시도해주세요.",
+            headers={"Retry-After": "5"}
+        )
+    
+    return JobSubmitResponse(job_id=job.id, status=job.status, poll_url=f"/kenopi/jobs/{job.id}")
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, wait: float = Query(0.0, ge=0.0, le=MAX_WAIT_SECONDS)):
+    """
+    작업 상태/결과 조회
+    
+    - wait=0: 즉시 현재 상태 반환 (poll)
+    - wait>0: 완료되거나 wait초가 지날 때까지 대기 후 반환 (long-poll)
+    """
+    job = _get_job_or_404(job_id)
+    await job_store.wait(job, wait)
+    return _to_status_response(job)
+
+@router.delete("/{job_id}", response_model=JobStatusResponse)
+async def cancel_job(job_id: str):
+    """작업 취소 (진행 중인 LLM/MCP 호출도 중단 - 실행 중인 작업은 멈출 때까지 running, 이후 cancelled)"""
+    job = _get_job_or_404(job_id)
+    job_store.cancel(job_id)
+    return _to_status_response(job)
@@ -1,10 +1,32 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import asyncio
+import json
+import os
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
-from kenopi_chatbot import generate_response, generate_advanced_response
+from cancellation import CancelScope, discard_result, record_abandoned, run_cancellable, scoped_context
+from kenopi_chatbot import generate_response, generate_advanced_response, request_budget, search_faq_batch
+from pipeline_trace import RequestTrace
+from rate_limit import RateLimitDecision, client_key, rate_limiter
+from query_classifier import classify_queries
 
 router = APIRouter(prefix="/kenopi", tags=["Kenopi CS"])
 
+# WebSocket 설정
+WS_IDLE_TIMEOUT = float(os.getenv("KENOPI_WS_IDLE_TIMEOUT", "600"))  # 무응답 연결 종료 (초)
+WS_PROGRESS_INTERVAL = float(os.getenv("KENOPI_WS_PROGRESS_INTERVAL", "2"))  # "생각 중" 알림 주기 (초)
+WS_CHUNK_CHARS = int(os.getenv("KENOPI_WS_CHUNK_CHARS", "40"))  # 답변 스트리밍 조각 크기
+
+# 배치 처리 설정
+BATCH_MAX_ITEMS = int(os.getenv("KENOPI_BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("KENOPI_BATCH_MAX_CONCURRENCY", "16"))
+
+# 질문 일괄 분류 설정
+ANALYZE_MAX_QUERIES = int(os.getenv("KENOPI_ANALYZE_MAX_QUERIES", "100000"))
+ANALYZE_PROCESSES = int(os.getenv("KENOPI_ANALYZE_PROCESSES", "1"))
+
 class ChatMsg(BaseModel):
     role: str  # 'user' or 'bot'
     content: str
@@ -17,6 +39,18 @@ class ChatResponse(BaseModel):
     response: str
     selected_mode: Optional[str] = None  # AI가 선택한 모드 표시
 
+class BatchItem(BaseModel):
+    id: Optional[str] = None  # 호출자가 결과를 매칭하기 위한 식별자 (없으면 index 사용)
+    messages: List[ChatMsg]
+
+class BatchChatReq(BaseModel):
+    items: List[BatchItem] = Field(..., max_length=BATCH_MAX_ITEMS)
+    concurrency: int = Field(4, ge=1, le=BATCH_MAX_CONCURRENCY)
+
+class AnalyzeBatchReq(BaseModel):
+    queries: List[str] = Field(..., max_length=ANALYZE_MAX_QUERIES)
+    include_mode: bool = True  # FAQ 매칭 포함 자동 모드 선택 결과도 계산
+
 class AdvancedChatResponse(BaseModel):
     response: str
     selected_mode: str
@@ -25,10 +59,12 @@ class AdvancedChatResponse(BaseModel):
     urgency: Optional[str] = None
     quality_score: Optional[str] = None
     faq_matched: Optional[bool] = None
+    faq_tier: Optional[str] = None  # FAQ 신뢰도 구간으로 답변한 경우 high/mid (selected_mode="faq")
     auto_selection: bool = True
+    timings: Optional[Dict[str, float]] = None  # 단계별 소요 시간 (ms, "total" 포함)
 
 @router.post("/chat", response_model=ChatResponse)
-async def kenopi_chat(req: ChatReq):
+async def kenopi_chat(req: ChatReq, request: Request, response: Response):
     """
     케노피 CS 챗봇 엔드포인트 (자동 모드 선택)
     
@@ -37,8 +73,12 @@ async def kenopi_chat(req: ChatReq):
     - 보통 질문 → 추론 모드 (단계적 사고)
     - 복잡한 질문 → 고급 모드 (종합 분석)
     """
-    # 항상 자동 모드 사용
-    reply = generate_response([m.dict() for m in req.messages], auto_mode=True)
+    history = [m.model_dump() for m in req.messages]
+    await check_rate_limit(request, response, history, pipeline="rule")
+    # 항상 자동 모드 사용 (고객 연결이 끊기면 진행 중인 작업 취소)
+    trace = RequestTrace("chat")
+    reply = await run_cancellable(request, trace.run, generate_response, history, True)
+    _set_server_timing(response, trace)
     
     return ChatResponse(
         response=reply,
@@ -46,19 +86,174 @@ async def kenopi_chat(req: ChatReq):
     )
 
 @router.post("/chat/advanced", response_model=AdvancedChatResponse)
-async def kenopi_advanced_chat(req: ChatReq):
+async def kenopi_advanced_chat(req: ChatReq, request: Request, response: Response):
     """
     자동 모드 선택 + 상세 분석 정보 포함 엔드포인트
     
     AI가 자동으로 선택한 모드와 분석 과정을 함께 제공:
-    - selected_mode: AI가 선택한 모드 (basic/thinking/enhanced)
+    - selected_mode: AI가 선택한 모드 (faq/basic/thinking/enhanced - faq는 FAQ 신뢰도 구간으로 답변, faq_tier 참고)
     - complexity: 질문 복잡도 (low/medium/high)
     - question_type: 질문 유형 (greeting/inquiry/complaint/request)
     - urgency: 긴급도 (low/medium/high)
     - quality_score: 응답 품질 점수
+    - timings: 단계별 소요 시간 (ms) - Server-Timing 헤더와 동일
+    """
+    history = [m.model_dump() for m in req.messages]
+    await check_rate_limit(request, response, history)
+    trace = RequestTrace("chat_advanced")
+    result = await run_cancellable(request, trace.run, generate_advanced_response, history)
+    _set_server_timing(response, trace)
+    
+    return to_advanced_response(result, timings=trace.timings_ms())
+
+async def _acquire_rate_limit(connection: Request, history: List[Dict[str, str]],
+                              pipeline: str = "advanced") -> Optional[RateLimitDecision]:
+    """클라이언트 키 + 예산(faq/llm)으로 토큰 사용 (속도 제한 비활성화면 None)
+    
+    pipeline: "rule"(generate_response, LLM 미사용) / "advanced"(generate_advanced_response)
+    """
+    if not rate_limiter.enabled:
+        return None
+    budget = await run_in_threadpool(request_budget, history, pipeline)
+    key = client_key(connection.headers, connection.client.host if connection.client else None)
+    return rate_limiter.acquire(key, budget)
+
+async def check_rate_limit(request: Request, response: Response, history: List[Dict[str, str]],
+                           pipeline: str = "advanced") -> None:
+    """채팅 요청 속도 제한 - 초과 시 429 + Retry-After, 통과 시 RateLimit-* 헤더 추가"""
+    decision = await _acquire_rate_limit(request, history, pipeline)
+    if decision is None:
+        return
+    _raise_if_limited(decision)
+    response.headers.update(decision.headers())
+
+def check_batch_rate_limit(request: Request, conversations: int) -> Dict[str, str]:
+    """일괄 처리 속도 제한 - 고유 대화 수만큼 llm 예산 차감 (초과 시 처리 시작 전 429), 응답 헤더 반환"""
+    if not rate_limiter.enabled:
+        return {}
+    key = client_key(request.headers, request.client.host if request.client else None)
+    decision = rate_limiter.acquire(key, "llm", cost=conversations)
+    if not decision.allowed and conversations > decision.limit:
+        raise HTTPException(
+            status_code=429,
+            detail=f"한 번에 처리할 수 있는 대화는 최대 {decision.limit}개입니다 (고유 대화 {conversations}개). "
+                   "나눠서 보내거나 오프라인 CLI(kenopi_batch.py)를 사용해주세요.",
+            headers=decision.headers()
+        )
+    _raise_if_limited(decision)
+    return decision.headers()
+
+def _raise_if_limited(decision: RateLimitDecision) -> None:
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="요청이 너무 많습니다. 잠시 후 다시 시도해주세요.",
+            headers=decision.headers()
+        )
+
+def _set_server_timing(response: Response, trace: RequestTrace) -> None:
+    """단계별 소요 시간을 Server-Timing 헤더로 노출 (위젯 도메인에서도 브라우저 개발자 도구로 확인 가능)"""
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["Timing-Allow-Origin"] = "*"
+
+@router.post("/chat/batch")
+async def kenopi_batch_chat(req: BatchChatReq, request: Request):
+    """
+    여러 독립 대화를 한 번에 처리 (게시판 문의 일괄 사전 답변 등)
+    
+    - generate_advanced_response와 동일한 로직을 concurrency개까지 동시에 실행
+    - 완전히 같은 대화는 한 번만 처리 후 결과 공유 (deduplicated=true)
+    - 마지막 질문들의 FAQ 검색을 미리 일괄 처리
+    - 결과는 완료 순서대로 NDJSON(한 줄에 JSON 하나)으로 스트리밍
+    - 속도 제한: 고유 대화 1개당 llm 예산 1회 (처리 시작 전 한 번에 차감)
+    """
+    # 같은 대화 묶기
+    groups: Dict[str, List[int]] = {}
+    histories: Dict[str, List[Dict[str, str]]] = {}
+    for index, item in enumerate(req.items):
+        history = [m.model_dump() for m in item.messages]
+        key = json.dumps(history, ensure_ascii=False)
+        groups.setdefault(key, []).append(index)
+        histories.setdefault(key, history)
+    rate_limit_headers = check_batch_rate_limit(request, len(histories))
+    
+    # FAQ 검색 일괄 처리 (캐시에 적재되어 파이프라인에서 재사용)
+    await run_in_threadpool(search_faq_batch, [h[-1]["content"] for h in histories.values() if h])
+    
+    return StreamingResponse(_stream_batch(req, groups, histories), media_type="application/x-ndjson",
+                             headers=rate_limit_headers)
+
+async def _stream_batch(req: BatchChatReq, groups: Dict[str, List[int]],
+                        histories: Dict[str, List[Dict[str, str]]]):
+    loop = asyncio.get_running_loop()
+    scope = CancelScope(loop)
+    semaphore = asyncio.Semaphore(req.concurrency)
+    batch_started = loop.time()
+    
+    async def run_one(key: str):
+        async with semaphore:
+            started = loop.time()
+            trace = RequestTrace("chat_batch")
+            try:
+                ctx = scoped_context(scope)
+                result = await loop.run_in_executor(None, ctx.run, trace.run, generate_advanced_response, histories[key])
+                error = None
+            except Exception as e:
+                result, error = None, str(e)
+            return key, result, error, started, loop.time(), trace
+    
+    tasks = [asyncio.ensure_future(run_one(key)) for key in groups]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, result, error, started, finished, trace = await next_done
+            for n, index in enumerate(groups[key]):
+                line: Dict[str, Any] = {
+                    "index": index,
+                    "id": req.items[index].id,
+                    "status": "ok" if result else "error",
+                    "deduplicated": n > 0,
+                    "timing": {
+                        "queued_ms": round((started - batch_started) * 1000, 1),
+                        "processing_ms": round((finished - started) * 1000, 1)
+                    }
+                }
+                if result:
+                    line.update(to_advanced_response(result, timings=trace.timings_ms()).model_dump())
+                else:
+                    line["error"] = error
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # 클라이언트가 중간에 연결을 끊으면 남은 작업 취소
+        if not all(task.done() for task in tasks):
+            scope.cancel()
+            record_abandoned("requests")
+            for task in tasks:
+                task.cancel()
+
+@router.post("/analyze/batch")
+async def analyze_batch(req: AnalyzeBatchReq):
+    """
+    질문 목록의 복잡도/긴급도/유형(+FAQ 신뢰도 구간, 자동 선택 모드) 일괄 분류
+    
+    결과는 입력 순서대로이며 각 항목은 채팅 파이프라인의 분석 결과와 동일합니다.
+    (복합 질문 분리, MCP 미설치·LLM 오류 폴백처럼 실행해야 알 수 있는 경로는 제외)
+    (로그 기반 임계값 튜닝용 - LLM 호출 없음)
     """
-    result = generate_advanced_response([m.dict() for m in req.messages])
+    import time
     
+    start_time = time.time()
+    results = await run_in_threadpool(classify_queries, req.queries, req.include_mode, ANALYZE_PROCESSES)
+    
+    return {
+        "results": results,
+        "count": len(results),
+        "unique": len(set(req.queries)),
+        "processing_time": round(time.time() - start_time, 3)
+    }
+
+def to_advanced_response(result: Dict[str, Any],
+                         timings: Optional[Dict[str, float]] = None) -> AdvancedChatResponse:
+    """generate_advanced_response 결과를 응답 모델로 변환"""
     return AdvancedChatResponse(
         response=result["response"],
         selected_mode=result.get("selected_mode", "basic"),
@@ -67,9 +262,131 @@ async def kenopi_advanced_chat(req: ChatReq):
         urgency=result.get("urgency"),
         quality_score=result.get("quality_score"),
         faq_matched=result.get("faq_matched"),
-        auto_selection=result.get("auto_selection", True)
+        faq_tier=result.get("faq_tier"),
+        auto_selection=result.get("auto_selection", True),
+        timings=timings
     )
 
+@router.websocket("/ws")
+async def kenopi_ws(websocket: WebSocket):
+    """
+    대화 1건당 WebSocket 연결 1개를 유지하는 채팅 채널
+    
+    클라이언트 → 서버:
+    - {"type": "message", "content": "..."}: 고객 메시지 (대화 히스토리는 서버가 유지)
+    - {"type": "cancel"}: 진행 중인 답변 생성 취소
+    - {"type": "reset"}: 대화 히스토리 초기화
+    - {"type": "ping"}
+    
+    서버 → 클라이언트:
+    - {"type": "progress", "stage": "thinking", "elapsed": 초}: 답변 생성 중 주기적 알림
+    - {"type": "delta", "content": "..."}: 답변 조각
+    - {"type": "done", ...}: 답변 완료 + 분석 정보 (selected_mode, complexity 등)
+    - {"type": "cancelled"} / {"type": "error", "detail": "..."} / {"type": "pong"}
+    - 속도 제한 초과 시 {"type": "error", "detail": "...", "retry_after": 초} (질문은 히스토리에서 제외)
+    """
+    await websocket.accept()
+    history: List[Dict[str, str]] = []
+    
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(websocket.receive_json(), timeout=WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle timeout")
+                return
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "JSON 형식의 메시지만 지원합니다"})
+                continue
+            
+            msg_type = data.get("type") if isinstance(data, dict) else None
+            if msg_type == "ping":
+                await websocket.send_json({"type": "pong"})
+            elif msg_type == "reset":
+                history.clear()
+                await websocket.send_json({"type": "reset"})
+            elif msg_type == "message" and isinstance(data.get("content"), str) and data["content"].strip():
+                history.append({"role": "user", "content": data["content"]})
+                decision = await _acquire_rate_limit(websocket, history)
+                if decision is not None and not decision.allowed:
+                    history.pop()
+                    await websocket.send_json({
+                        "type": "error",
+                        "detail": "요청이 너무 많습니다. 잠시 후 다시 시도해주세요.",
+                        "retry_after": decision.retry_after
+                    })
+                    continue
+                result = await _ws_answer(websocket, history)
+                if result is None:
+                    return  # 연결 종료
+                if result:
+                    history.append({"role": "bot", "content": result["response"]})
+                else:
+                    history.pop()  # 취소된 질문은 히스토리에서 제외
+            else:
+                await websocket.send_json({"type": "error", "detail": "알 수 없는 메시지 형식입니다"})
+    except WebSocketDisconnect:
+        return
+
+async def _ws_answer(websocket: WebSocket, history: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """
+    답변을 생성하며 진행 상황을 push하고, 완료되면 답변을 조각으로 스트리밍
+    
+    반환값: 결과 dict / 취소 시 빈 dict / 연결 종료 시 None
+    """
+    loop = asyncio.get_running_loop()
+    scope = CancelScope(loop)
+    ctx = scoped_context(scope)
+    trace = RequestTrace("ws")
+    future = loop.run_in_executor(None, ctx.run, trace.run, generate_advanced_response, list(history))
+    receiver = asyncio.ensure_future(websocket.receive_json())
+    started = loop.time()
+    
+    try:
+        while True:
+            done, _ = await asyncio.wait({future, receiver}, timeout=WS_PROGRESS_INTERVAL,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if future in done:
+                break
+            if receiver in done:
+                exc = receiver.exception()
+                if isinstance(exc, ValueError):
+                    await websocket.send_json({"type": "error", "detail": "JSON 형식의 메시지만 지원합니다"})
+                    receiver = asyncio.ensure_future(websocket.receive_json())
+                    continue
+                disconnected = exc is not None
+                incoming = None if disconnected else receiver.result()
+                if disconnected or (isinstance(incoming, dict) and incoming.get("type") == "cancel"):
+                    scope.cancel()
+                    record_abandoned("requests")
+                    future.add_done_callback(discard_result)
+                    if disconnected:
+                        return None
+                    await websocket.send_json({"type": "cancelled"})
+                    return {}
+                await websocket.send_json({"type": "error", "detail": "이전 답변을 생성하는 중입니다"})
+                receiver = asyncio.ensure_future(websocket.receive_json())
+                continue
+            await websocket.send_json({
+                "type": "progress",
+                "stage": "thinking",
+                "elapsed": round(loop.time() - started, 1)
+            })
+    finally:
+        if not receiver.done():
+            receiver.cancel()
+    
+    try:
+        result = future.result()
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": f"답변 생성 실패: {e}"})
+        return {}
+    response = result["response"]
+    for i in range(0, len(response), WS_CHUNK_CHARS):
+        await websocket.send_json({"type": "delta", "content": response[i:i + WS_CHUNK_CHARS]})
+    await websocket.send_json({"type": "done", **to_advanced_response(result, timings=trace.timings_ms()).model_dump()})
+    return result
+
 @router.get("/thinking/status")
 async def get_thinking_status():
     """자동 모드 선택 시스템 상태 확인"""
@@ -138,7 +455,7 @@ async def get_thinking_status():
         }
 
 @router.post("/thinking/demo")
-async def demo_auto_mode_selection(req: ChatReq):
+async def demo_auto_mode_selection(req: ChatReq, request: Request, response: Response):
     """
     자동 모드 선택 데모 (여러 질문 유형별 테스트)
     """
@@ -147,7 +464,8 @@ async def demo_auto_mode_selection(req: ChatReq):
     
     import time
     
-    messages = [m.dict() for m in req.messages]
+    messages = [m.model_dump() for m in req.messages]
+    await check_rate_limit(request, response, messages)
     query = messages[-1]["content"]
     
     # 자동 모드 선택 상세 분석
@@ -228,12 +546,21 @@ async def get_auto_mode_examples():
                 "query": "감사합니다",
                 "expected_mode": "basic",
                 "reason": "간단한 감사 인사 - 기본 응답"
+            },
+            {
+                "query": "주문 취소하고 싶은데 어떻게 하나요?",
+                "expected_mode": "faq",
+                "reason": "FAQ와 거의 같은 질문 - 검수된 FAQ 답변 그대로 (모드 선택/LLM 호출 없음)"
             }
         ],
         "selection_logic": {
+            "faq_mode": [
+                "FAQ 유사도 high(≥0.8) - FAQ 답변 그대로",
+                "FAQ 유사도 mid(≥0.6) - 저가 모델로 FAQ 범위 안에서 재작성 (LLM 설정 시)",
+                "모드 선택보다 먼저 판정"
+            ],
             "basic_mode": [
                 "인사말 (안녕, 감사 등)",
-                "FAQ 매칭되는 간단한 질문",
                 "짧고 명확한 확인 질문"
             ],
             "thinking_mode": [
@@ -8,15 +8,37 @@ import json
 import os
 import asyncio
 from typing import Dict, Any, Optional
-import logging
+import signal
 
-logger = logging.getLogger(__name__)
+from cancellation import (
+    RequestCancelled,
+    check_cancelled,
+    current_scope,
+    record_abandoned,
+    register_cancel_callback,
+)
+from log_config import get_logger
+from pipeline_trace import annotate_append, record_usage, timed_stage
+from prompt_builder import MCP_ENHANCED_PROMPT, MCP_QUICK_PROMPT, MCP_STEP_PROMPT, build_mcp_prompt
+from token_usage import mcp_usage
+
+logger = get_logger(__name__)
+
+# npx로 실행하는 MCP 도구 패키지
+MCP_PACKAGE = "@smithery/sequential-thinking-tools"
 
 class SequentialThinkingMCP:
     """MCP Sequential Thinking Tools와의 간단한 인터페이스"""
     
     def __init__(self):
-        self.mcp_available = self._check_mcp_availability()
+        self._mcp_available: Optional[bool] = None
+    
+    @property
+    def mcp_available(self) -> bool:
+        """MCP 사용 가능 여부 (import 시점이 아닌 첫 사용 시 한 번만 확인)"""
+        if self._mcp_available is None:
+            self._mcp_available = self._check_mcp_availability()
+        return self._mcp_available
         
     def _check_mcp_availability(self) -> bool:
         """MCP Sequential Thinking Tools 사용 가능성 확인"""
@@ -37,6 +59,24 @@ class SequentialThinkingMCP:
             logger.error(f"MCP availability check failed: {e}")
             return False
     
+    def warm_up(self, timeout: float = 120.0) -> bool:
+        """npx 패키지를 미리 받아 두어 첫 요청이 다운로드/설치를 기다리지 않도록 함"""
+        if not self.mcp_available:
+            return False
+        proc = subprocess.Popen(
+            ["npx", "-y", MCP_PACKAGE, "--help"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_tree(proc)
+            proc.wait()
+            raise
+        return True
+    
     def think_step_by_step(self, query: str, context: str = "") -> str:
         """단계별 사고를 통한 응답 생성"""
         if not self.mcp_available:
@@ -44,29 +84,7 @@ class SequentialThinkingMCP:
         
         try:
             # MCP Sequential Thinking 호출
-            thinking_prompt = f"""
-당신은 케노피(Kenopi) 생활용품 브랜드의 전문 고객지원 담당자입니다.
-
-다음 단계로 생각해주세요:
-
-1. 🔍 고객 질문 분석
-   - 고객이 실제로 원하는 것은 무엇인가요?
-   - 어떤 감정 상태인가요? (불만, 궁금, 걱정 등)
-
-2. 💡 최적 해결책 탐색
-   - 케노피 정책에 맞는 해결 방법은?
-   - 고객에게 가장 도움이 되는 방법은?
-
-3. ✨ 친절한 응답 구성
-   - 이해하기 쉬운 설명
-   - 구체적인 행동 지침
-   - 추가 도움 제안
-
-컨텍스트: {context}
-고객 질문: {query}
-
-단계별로 생각하여 친절하고 정확한 답변을 만들어주세요.
-"""
+            thinking_prompt = build_mcp_prompt(MCP_STEP_PROMPT, context, query)
             
             result = self._call_mcp_tool(thinking_prompt)
             return result.get('final_answer', self._fallback_response(query, context))
@@ -129,50 +147,19 @@ class SequentialThinkingMCP:
     
     def _enhanced_thinking(self, query: str, context: str) -> str:
         """복잡한 문제에 대한 향상된 사고"""
-        enhanced_prompt = f"""
-복잡한 고객 문의를 해결하기 위해 다음과 같이 종합적으로 접근하세요:
-
-🔍 **문제 분석**
-- 고객의 정확한 니즈 파악
-- 관련된 케노피 정책 검토
-- 가능한 해결 옵션들 나열
-
-💭 **다각도 검토**
-방법 A: 즉시 해결 가능한 방법
-방법 B: 단계적 해결 방법
-방법 C: 장기적 만족도를 위한 방법
-
-✅ **최적 솔루션 선택**
-- 고객에게 가장 유리한 방법
-- 실행 가능성 검토
-- 명확한 안내
-
-컨텍스트: {context}
-고객 문의: {query}
-
-각 단계를 거쳐 최고의 고객 경험을 제공하는 답변을 만들어주세요.
-"""
+        enhanced_prompt = build_mcp_prompt(MCP_ENHANCED_PROMPT, context, query)
         
         result = self._call_mcp_tool(enhanced_prompt)
         return result.get('final_answer', self._fallback_response(query, context))
     
     def _quick_thinking(self, query: str, context: str) -> str:
         """간단한 질문에 대한 빠른 응답"""
-        quick_prompt = f"""
-케노피 고객지원 담당자로서 다음 질문에 친절하고 정확하게 답변해주세요:
-
-질문: {query}
-컨텍스트: {context}
-
-응답 시 다음을 포함해주세요:
-- 명확하고 이해하기 쉬운 설명
-- 필요한 경우 구체적인 절차 안내
-- 추가 도움이 필요한지 문의
-"""
+        quick_prompt = build_mcp_prompt(MCP_QUICK_PROMPT, context, query)
         
         result = self._call_mcp_tool(quick_prompt)
         return result.get('final_answer', self._fallback_response(query, context))
     
+    @timed_stage("mcp")
     def _call_mcp_tool(self, prompt: str) -> Dict[str, Any]:
         """MCP Sequential Thinking Tool 호출"""
         try:
@@ -187,31 +174,51 @@ class SequentialThinkingMCP:
             
             # MCP 서버 호출 (subprocess를 통한 npx 실행)
             cmd = [
-                "npx", "-y", "@smithery/sequential-thinking-tools",
+                "npx", "-y", MCP_PACKAGE,
                 "--input", json.dumps(mcp_request)
             ]
             
             env = os.environ.copy()
-            result = subprocess.run(
+            check_cancelled()
+            # npx가 띄우는 node 자식 프로세스까지 한 번에 종료할 수 있도록 별도 세션으로 실행
+            proc = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=30,
-                env=env
+                env=env,
+                start_new_session=True
             )
+            unregister = register_cancel_callback(lambda: _kill_process_tree(proc))
+            try:
+                stdout, stderr = proc.communicate(timeout=30)
+            except subprocess.TimeoutExpired:
+                _kill_process_tree(proc)
+                proc.communicate()
+                annotate_append("mcp_exit", "timeout")
+                logger.error("MCP tool timeout")
+                return {"final_answer": ""}
+            finally:
+                unregister()
             
-            if result.returncode == 0:
+            scope = current_scope()
+            if scope is not None and scope.cancelled:
+                annotate_append("mcp_exit", "cancelled")
+                record_abandoned("mcp_processes_killed")
+                raise RequestCancelled()
+            
+            annotate_append("mcp_exit", proc.returncode)
+            if proc.returncode == 0:
                 # 성공적인 응답 파싱
-                response_data = json.loads(result.stdout)
+                response_data = json.loads(stdout)
+                record_usage(mcp_usage(prompt, str(response_data.get("final_answer", ""))))
                 return response_data
             else:
-                logger.error(f"MCP tool error: {result.stderr}")
+                logger.error(f"MCP tool error: {stderr}")
                 return {"final_answer": ""}
                 
-        except subprocess.TimeoutExpired:
-            logger.error("MCP tool timeout")
-            return {"final_answer": ""}
         except Exception as e:
+            annotate_append("mcp_exit", f"error: {type(e).__name__}")
             logger.error(f"MCP tool call failed: {e}")
             return {"final_answer": ""}
     
@@ -229,5 +236,17 @@ class SequentialThinkingMCP:
 추가 문의사항이 있으시면 언제든 말씀해 주세요.
 더 정확한 답변이 필요하시면 고객센터(1588-1234)로 연락 주시기 바랍니다."""
 
+def _kill_process_tree(proc: subprocess.Popen) -> None:
+    """MCP 서브프로세스와 그 자식 프로세스 그룹 강제 종료"""
+    if proc.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
 # 전역 인스턴스
 thinking_mcp = SequentialThinkingMCP() 
\ No newline at end of file
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+멀티 프로세스 서버 (preload + fork)
+단일 `uvicorn main:app` 프로세스는 SequenceMatcher, pydantic 검증 같은 CPU 작업에 코어 1개만 사용하므로
+- 부모 프로세스가 앱, FAQ 데이터, 의도/지표 테이블, 프롬프트 템플릿을 한 번만 로드한 뒤 gc.freeze()
+- 리스닝 소켓을 부모에서 열고 워커를 fork → 워커들은 로드된 데이터를 copy-on-write로 공유
+- 워커 수는 기본 1개, KENOPI_WORKERS=auto면 cgroup CPU 할당량(없으면 사용 가능한 CPU 수)에서 결정
+- 워커가 비정상 종료되면 다시 띄우고, SIGHUP이면 워커를 하나씩 교체(graceful restart)
+
+환경변수: KENOPI_WORKERS(1, 숫자 또는 auto), KENOPI_HOST(0.0.0.0), KENOPI_PORT(8000), KENOPI_GRACEFUL_TIMEOUT(30)
+
+주의 - 아래 상태는 워커 프로세스마다 따로 있음 (워커가 2개 이상이면 요청이 어느 워커로 가는지에 따라 달라짐):
+    - 비동기 작업 저장소(/kenopi/jobs): 제출한 워커가 아닌 곳으로 조회가 가면 404 → 워커 2개 이상은 KENOPI_JOBS_API=0일 때만 시작
+    - 속도 제한 버킷 (클라이언트별 한도가 워커 수만큼 늘어남), /metrics 카운터/히스토그램, /debug/slow, /debug/usage, /debug/prompts, FAQ 검색 캐시, 대화 요약 캐시
+    - WebSocket 대화 히스토리 (연결이 한 워커에 고정되므로 문제 없음)
+
+사용 예:
+    python serve.py
+    KENOPI_WORKERS=4 KENOPI_JOBS_API=0 python serve.py
+    kill -HUP <부모 PID>   # 워커 순차 재시작
+"""
+
+import gc
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+# 앱과 데이터 로드 중에는 GC를 멈춰 두었다가 fork 직전에 freeze (자식에서 GC가 공유 페이지에 쓰지 않도록)
+gc.disable()
+
+import uvicorn
+
+import log_config
+import main
+from jobs import JOBS_API_ENABLED
+from kenopi_chatbot import get_faq_list
+from log_config import get_logger
+from query_classifier import get_classifier
+
+logger = get_logger("serve")
+
+HOST = os.getenv("KENOPI_HOST", "0.0.0.0")
+PORT = int(os.getenv("KENOPI_PORT", "8000"))
+GRACEFUL_TIMEOUT = float(os.getenv("KENOPI_GRACEFUL_TIMEOUT", "30"))
+
+# 이 시간 안에 죽은 워커는 재시작 전에 잠시 대기 (시작 직후 계속 죽는 경우 과도한 fork 방지)
+_CRASH_WINDOW = 5.0
+_MAX_RESPAWN_DELAY = 10.0
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """컨테이너 CPU 할당량 (코어 수, 제한 없으면 None) - cgroup v2 → v1 순서로 확인"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota_us = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period_us = int(f.read())
+        return None if quota_us <= 0 else quota_us / period_us
+    except (OSError, ValueError):
+        return None
+
+
+def default_workers() -> int:
+    """CPU 할당량(올림)과 사용 가능한 CPU 수 중 작은 값"""
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        available = min(available, math.ceil(limit))
+    return max(1, available)
+
+
+def preload() -> None:
+    """워커들이 공유할 데이터를 부모에서 미리 로드"""
+    get_faq_list()
+    get_classifier()
+    import prompt_builder  # noqa: F401  (정적 프롬프트 앞부분 조립)
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket) -> None:
+    """자식 프로세스: uvicorn 서버를 공유 소켓으로 실행"""
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    gc.enable()
+    config = uvicorn.Config(
+        main.app,
+        ws_per_message_deflate=False,
+        ws_max_size=65536,
+        timeout_graceful_shutdown=int(GRACEFUL_TIMEOUT),
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """워커 fork / 재시작 / 종료 관리"""
+
+    def __init__(self, sock: socket.socket, workers: int):
+        self.sock = sock
+        self.workers = workers
+        self._children: Dict[int, float] = {}  # pid → 시작 시각
+        self._draining: Dict[int, float] = {}  # 순차 재시작으로 종료 중인 pid → SIGKILL 시각
+        self._restart_queue: List[int] = []  # 순차 재시작으로 교체할 기존 워커
+        self._reload = False
+        self._stopping = False
+        self._respawn_delay = 0.0
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                # os._exit는 atexit을 건너뛰므로 큐에 남은 로그를 직접 출력
+                log_config.log_listener.stop()
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        logger.info("Worker started", extra={"pid": pid})
+        return pid
+
+    def run(self) -> int:
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Serving", extra={"host": HOST, "port": PORT, "workers": self.workers, "pid": os.getpid()})
+
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._restart_queue = list(self._children)
+                logger.info("Rolling restart", extra={"workers": len(self._restart_queue)})
+            self._reap()
+            self._restart_step()
+            time.sleep(0.2)
+
+        self.terminate(list(self._children) + list(self._draining))
+        return 0
+
+    def _restart_step(self) -> None:
+        """
+        순차 재시작 한 단계 - 종료 중인 워커가 없으면 새 워커를 띄우고 기존 워커 하나에 SIGTERM
+        (메인 루프에서 매 반복 호출되므로 재시작 중에도 죽은 워커를 회수/재시작)
+        """
+        now = time.monotonic()
+        for pid, kill_at in list(self._draining.items()):
+            if now >= kill_at:
+                logger.warning("Worker did not exit in time, killing", extra={"pid": pid})
+                _signal(pid, signal.SIGKILL)
+                if _exited(pid):
+                    del self._draining[pid]
+        if self._draining:
+            return
+        while self._restart_queue:
+            old_pid = self._restart_queue.pop(0)
+            if old_pid in self._children:  # 그 사이 죽어서 이미 교체된 워커는 건너뜀
+                self.spawn()
+                del self._children[old_pid]
+                self._draining[old_pid] = now + GRACEFUL_TIMEOUT + 5
+                _signal(old_pid, signal.SIGTERM)
+                return
+
+    def terminate(self, pids: List[int]) -> None:
+        """SIGTERM 후 GRACEFUL_TIMEOUT까지 기다리고, 남은 워커는 SIGKILL
+        
+        대상 pid만 회수 - 그 사이 다른 워커가 죽으면 메인 루프의 _reap이 다시 띄움
+        """
+        for pid in pids:
+            _signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                if _exited(pid):
+                    remaining.discard(pid)
+                    self._children.pop(pid, None)
+            if remaining:
+                time.sleep(0.1)
+        for pid in remaining:
+            logger.warning("Worker did not exit in time, killing", extra={"pid": pid})
+            _signal(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._children.pop(pid, None)
+
+    def _reap(self) -> None:
+        """예상치 못하게 종료된 워커 회수 후 다시 띄움"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self._children.pop(pid, None)
+            if started is None:
+                self._draining.pop(pid, None)  # 순차 재시작으로 종료된 워커
+                continue
+            if self._stopping:
+                continue
+            logger.warning("Worker exited unexpectedly", extra={
+                "pid": pid, "exit_code": os.waitstatus_to_exitcode(status)
+            })
+            if time.monotonic() - started < _CRASH_WINDOW:
+                self._respawn_delay = min(_MAX_RESPAWN_DELAY, self._respawn_delay * 2 or 0.5)
+                time.sleep(self._respawn_delay)
+            else:
+                self._respawn_delay = 0.0
+            self.spawn()
+
+
+def _exited(pid: int) -> bool:
+    """자식 pid가 종료됐으면 회수하고 True"""
+    try:
+        done, _ = os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        return True
+    return done != 0
+
+
+def _signal(pid: int, signum: int) -> None:
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def main_entry() -> int:
+    setting = os.getenv("KENOPI_WORKERS", "1").strip() or "1"
+    workers = default_workers() if setting == "auto" else max(1, int(setting))
+    if workers > 1 and JOBS_API_ENABLED:
+        logger.error("Multiple workers need KENOPI_JOBS_API=0: the job store is per worker, "
+                     "so job polls landing on another worker would return 404", extra={"workers": workers})
+        return 2
+    if workers > 1:
+        logger.warning("Multiple workers: rate limits, metrics and debug stores are per worker", extra={"workers": workers})
+    preload()
+    sock = bind_socket(HOST, PORT)
+    return Supervisor(sock, workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main_entry())
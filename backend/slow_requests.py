@@ -0,0 +1,97 @@
+"""
+가장 느린 최근 요청 기록
+평균이 아닌 꼬리 지연(최악의 대화)을 보기 위해, 최근 window 안에서 가장 느린 N개 요청의 전체 파이프라인 추적을 보관
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+SLOW_REQUEST_CAPACITY = int(os.getenv("KENOPI_SLOW_REQUESTS", "50"))
+SLOW_REQUEST_WINDOW = float(os.getenv("KENOPI_SLOW_REQUEST_WINDOW", "3600"))  # 보관 기간 (초)
+
+
+class SlowRequestLog:
+    """소요 시간 기준 최소 힙 - 힙이 가득 찼을 때 가장 빠른 항목보다 빠른 요청은 바로 버림"""
+
+    def __init__(self, capacity: int = 50, window_seconds: float = 3600.0):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> "SlowRequestLog":
+        return cls(capacity=SLOW_REQUEST_CAPACITY, window_seconds=SLOW_REQUEST_WINDOW)
+
+    def offer(self, trace: Any) -> None:
+        """완료된 RequestTrace 제출 (느린 요청만 기록 항목으로 변환)"""
+        if self.capacity <= 0:
+            return
+        duration = trace.duration
+        heap = self._heap
+        cutoff = time.time() - self.window_seconds
+        # 빠른 요청은 잠금/항목 생성 없이 종료 (힙 최솟값이 window 안에 있을 때만 - 만료된 항목이 새 요청을 막지 않도록)
+        if len(heap) >= self.capacity:
+            try:
+                smallest = heap[0]
+            except IndexError:
+                smallest = None
+            if smallest is not None and duration <= smallest[0] and smallest[2]["at"] >= cutoff:
+                return
+        with self._lock:
+            self._purge_expired(force=bool(heap) and heap[0][2]["at"] < cutoff)
+            if len(heap) < self.capacity:
+                heapq.heappush(heap, (duration, next(self._seq), _to_entry(trace)))
+            elif duration > heap[0][0]:
+                heapq.heapreplace(heap, (duration, next(self._seq), _to_entry(trace)))
+
+    def _purge_expired(self, force: bool = False) -> None:
+        """window보다 오래된 항목 제거 (force가 아니면 window의 1/10 주기로만 검사)"""
+        now = time.monotonic()
+        if not force and now - self._last_purge < self.window_seconds / 10:
+            return
+        self._last_purge = now
+        cutoff = time.time() - self.window_seconds
+        kept = [item for item in self._heap if item[2]["at"] >= cutoff]
+        if len(kept) != len(self._heap):
+            heapq.heapify(kept)
+            self._heap[:] = kept
+
+    def snapshot(self, limit: int = 0) -> List[Dict[str, Any]]:
+        """느린 순서로 정렬된 기록"""
+        with self._lock:
+            self._purge_expired(force=True)
+            entries = [entry for _, _, entry in sorted(self._heap, key=lambda item: -item[0])]
+        return entries[:limit] if limit > 0 else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+def _to_entry(trace: Any) -> Dict[str, Any]:
+    attributes = trace.attributes
+    return {
+        "at": trace.started_at,
+        "endpoint": trace.endpoint,
+        "duration_ms": round(trace.duration * 1000, 1),
+        "mode": trace.mode,
+        "outcome": trace.outcome,
+        "fallback_reason": trace.fallback_reason,
+        "query_hash": attributes.get("query_hash"),
+        "analysis": attributes.get("analysis"),
+        "mcp_exit": attributes.get("mcp_exit", []),
+        "stage_totals_ms": {name: round(seconds * 1000, 2) for name, seconds in trace.stage_totals().items()},
+        # 실행 순서대로의 단계 (팬아웃 스레드 단계는 섞여 있을 수 있음)
+        "stages": [[name, round(seconds * 1000, 2)] for name, _, seconds in trace.stages],
+    }
+
+
+# 전역 인스턴스
+slow_request_log = SlowRequestLog.from_env()
@@ -0,0 +1,187 @@
+"""
+토큰 사용량/비용 집계
+LLM/MCP 호출마다 입력(prompt)·출력(completion) 토큰을 기록하고 모드·모델·의도별로 집계
+(고급 모드의 긴 프롬프트 조합이 기본 모드 대비 한 턴에 얼마나 드는지 확인용)
+
+제공자가 usage를 돌려주지 않으면(MCP 서브프로세스 등) 문자 종류 기반 추정값을 사용하고 source="estimate"로 표시
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import Counter
+
+# 모델별 가격 (USD / 100만 토큰, 입력/출력) - KENOPI_MODEL_PRICES="gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6"로 변경
+DEFAULT_MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# MCP Sequential Thinking 서브프로세스가 사용하는 모델 (사용량을 돌려주지 않으므로 추정)
+MCP_MODEL = os.getenv("KENOPI_MCP_MODEL", "gpt-4o")
+
+# 메시지당 역할/구분자 오버헤드 (OpenAI chat 형식 근사값)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+LLM_TOKENS = Counter(
+    "kenopi_llm_tokens_total", "LLM tokens by kind (prompt/completion)",
+    ["kind", "mode", "model", "intent", "source"],
+)
+LLM_CALLS = Counter("kenopi_llm_calls_total", "LLM and MCP calls", ["caller", "mode", "model"])
+LLM_COST = Counter("kenopi_llm_cost_usd_total", "Estimated LLM spend in USD", ["mode", "model"])
+
+
+def _parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    for part in spec.split(","):
+        if "=" in part and "/" in part:
+            model, rates = part.split("=", 1)
+            prompt_rate, completion_rate = rates.split("/", 1)
+            prices[model.strip()] = (float(prompt_rate), float(completion_rate))
+    return prices
+
+
+MODEL_PRICES = _parse_prices(os.getenv("KENOPI_MODEL_PRICES", ""))
+
+
+def price_key(model: str) -> Optional[str]:
+    """응답의 모델명(gpt-4o-2024-08-06 등)에 해당하는 가격표 항목 (가장 긴 접두어 일치)"""
+    matches = [key for key in MODEL_PRICES if model.startswith(key)]
+    return max(matches, key=len) if matches else None
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    key = price_key(model)
+    if key is None:
+        return 0.0
+    prompt_rate, completion_rate = MODEL_PRICES[key]
+    return (prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1_000_000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 토큰 수 추정 (o200k 계열 근사)
+    한글 음절 ≈ 0.75토큰, 영문/숫자/기호 4자 ≈ 1토큰, 그 외(이모지 등) 1자 ≈ 1토큰
+    """
+    if not text:
+        return 0
+    hangul = ascii_chars = 0
+    for char in text:
+        if char < "\x80":
+            ascii_chars += 1
+        elif "가" <= char <= "힣":
+            hangul += 1
+    other = len(text) - hangul - ascii_chars
+    return max(1, round(hangul * 0.75 + ascii_chars / 4 + other))
+
+
+def estimate_message_tokens(content: str) -> int:
+    """메시지 1개 (본문 + 역할/구분자 오버헤드)"""
+    return estimate_tokens(content) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_messages_tokens(messages: Iterable[Any]) -> int:
+    return sum(estimate_message_tokens(str(message.content)) for message in messages)
+
+
+def usage_entry(caller: str, model: str, prompt_tokens: int, completion_tokens: int,
+                estimated: bool) -> Dict[str, Any]:
+    return {
+        "caller": caller,
+        "model": price_key(model) or model,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "source": "estimate" if estimated else "provider",
+    }
+
+
+def llm_usage(messages: List[Any], answer: Any, default_model: str) -> Dict[str, Any]:
+    """LangChain 응답의 usage_metadata (없으면 추정)"""
+    model = (getattr(answer, "response_metadata", None) or {}).get("model_name") or default_model
+    usage = getattr(answer, "usage_metadata", None)
+    if usage:
+        return usage_entry("llm", model, usage.get("input_tokens", 0), usage.get("output_tokens", 0), False)
+    return usage_entry("llm", model, estimate_messages_tokens(messages),
+                       estimate_tokens(str(getattr(answer, "content", ""))), True)
+
+
+def mcp_usage(prompt: str, answer: str) -> Dict[str, Any]:
+    return usage_entry("mcp", MCP_MODEL, estimate_tokens(prompt), estimate_tokens(answer), True)
+
+
+class UsageLedger:
+    """모드·모델·의도별 누적 사용량 (관리용 조회)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (mode, model, intent) → [요청 수, 호출 수, 입력 토큰, 출력 토큰, 비용, 추정 호출 수]
+        self._rows: Dict[Tuple[str, str, str], List[float]] = {}
+        self._requests_by_mode: Dict[str, int] = {}
+
+    def add(self, mode: str, intent: Optional[str], usages: Iterable[Dict[str, Any]]) -> None:
+        """요청 1건의 사용량 반영 (요청 종료 시 최종 모드로 한 번 호출)"""
+        intent = intent or "none"
+        usages = list(usages)
+        if not usages:
+            return
+        seen = set()
+        with self._lock:
+            self._requests_by_mode[mode] = self._requests_by_mode.get(mode, 0) + 1
+            for usage in usages:
+                key = (mode, usage["model"], intent)
+                row = self._rows.setdefault(key, [0, 0, 0, 0, 0.0, 0])
+                if key not in seen:
+                    row[0] += 1
+                    seen.add(key)
+                cost = cost_usd(usage["model"], usage["prompt_tokens"], usage["completion_tokens"])
+                row[1] += 1
+                row[2] += usage["prompt_tokens"]
+                row[3] += usage["completion_tokens"]
+                row[4] += cost
+                row[5] += usage["source"] == "estimate"
+        for usage in usages:
+            labels = {"mode": mode, "model": usage["model"]}
+            LLM_CALLS.inc(caller=usage["caller"], **labels)
+            LLM_TOKENS.inc(usage["prompt_tokens"], kind="prompt", intent=intent, source=usage["source"], **labels)
+            LLM_TOKENS.inc(usage["completion_tokens"], kind="completion", intent=intent, source=usage["source"],
+                           **labels)
+            LLM_COST.inc(cost_usd(usage["model"], usage["prompt_tokens"], usage["completion_tokens"]), **labels)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = {key: list(values) for key, values in self._rows.items()}
+            requests_by_mode = dict(self._requests_by_mode)
+
+        by_mode: Dict[str, Dict[str, float]] = {}
+        for (mode, _, _), (_, calls, prompt, completion, cost, _) in rows.items():
+            totals = by_mode.setdefault(mode, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+            totals["calls"] += calls
+            totals["prompt_tokens"] += prompt
+            totals["completion_tokens"] += completion
+            totals["cost_usd"] += cost
+        for mode, totals in by_mode.items():
+            requests = requests_by_mode.get(mode, 0) or 1
+            totals["requests"] = requests_by_mode.get(mode, 0)
+            totals["cost_usd"] = round(totals["cost_usd"], 6)
+            totals["avg_prompt_tokens_per_request"] = round(totals["prompt_tokens"] / requests, 1)
+            totals["avg_completion_tokens_per_request"] = round(totals["completion_tokens"] / requests, 1)
+            totals["avg_cost_usd_per_request"] = round(totals["cost_usd"] / requests, 6)
+
+        return {
+            "prices_usd_per_1m_tokens": {model: {"prompt": p, "completion": c} for model, (p, c) in MODEL_PRICES.items()},
+            "by_mode": by_mode,
+            "rows": [
+                {
+                    "mode": mode, "model": model, "intent": intent,
+                    "requests": int(values[0]), "calls": int(values[1]),
+                    "prompt_tokens": int(values[2]), "completion_tokens": int(values[3]),
+                    "cost_usd": round(values[4], 6), "estimated_calls": int(values[5]),
+                }
+                for (mode, model, intent), values in sorted(rows.items(), key=lambda item: -item[1][4])
+            ],
+        }
+
+
+# 전역 인스턴스
+usage_ledger = UsageLedger()
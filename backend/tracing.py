@@ -0,0 +1,308 @@
+"""
+샘플링 기반 비동기 추적(trace) 내보내기
+모든 요청을 LangSmith로 보내거나(LANGCHAIN_TRACING_V2=true) 전혀 보내지 않는 대신
+- 모드별 샘플링 비율 + 오류/느린 요청은 항상 수집
+- 요청 경로에서는 큐에 넣기만 하고, 백그라운드 스레드가 모아서 일괄 전송
+- 네트워크 없이 확인할 수 있는 JSONL 파일 내보내기 지원
+
+환경변수:
+    KENOPI_TRACE_EXPORTER: none | file | langsmith
+        (미설정 시 LANGSMITH_TRACING_V2=true + API 키가 있으면 langsmith, 아니면 none)
+        어느 내보내기든 기존 전역 플래그(LANGCHAIN_TRACING_V2 등)는 무시하고 해제함
+    KENOPI_TRACE_SAMPLE_RATE: 기본 샘플링 비율 (0.05)
+    KENOPI_TRACE_SAMPLE_RATES: 모드별 비율 (예: "rule=0.01,basic=0.02,thinking=0.1,enhanced=0.2")
+    KENOPI_TRACE_SLOW_MS: 이 시간 이상 걸린 요청은 항상 수집 (5000)
+    KENOPI_TRACE_FILE: file 내보내기 경로 (kenopi_traces.jsonl)
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from log_config import get_logger
+from metrics import Counter
+
+logger = get_logger(__name__)
+
+TRACE_QUEUE_SIZE = int(os.getenv("KENOPI_TRACE_QUEUE_SIZE", "10000"))
+TRACE_BATCH_SIZE = int(os.getenv("KENOPI_TRACE_BATCH_SIZE", "100"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("KENOPI_TRACE_FLUSH_INTERVAL", "2"))  # 초
+
+# 단계 → LangSmith run_type
+_RUN_TYPES = {"llm": "llm", "mcp": "tool"}
+
+TRACES_SAMPLED = Counter("kenopi_traces_sampled_total", "Traces selected for export", ["reason"])
+TRACES_DROPPED = Counter("kenopi_traces_dropped_total", "Traces dropped because the export queue was full")
+TRACES_EXPORTED = Counter("kenopi_traces_exported_total", "Trace export results", ["exporter", "result"])
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in spec.split(","):
+        if "=" in part:
+            mode, rate = part.split("=", 1)
+            rates[mode.strip()] = float(rate)
+    return rates
+
+
+class FileExporter:
+    """추적을 JSONL 파일에 한 줄씩 추가 (테스트/로컬 확인용)"""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, records: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class LangSmithExporter:
+    """요청 1건 = 루트 run 1개 + 단계별 자식 run으로 변환해 batch_ingest_runs로 일괄 전송"""
+
+    name = "langsmith"
+
+    def __init__(self, project: str):
+        from langsmith import Client
+
+        self.project = project
+        self.client = Client()
+
+    def export(self, records: List[Dict[str, Any]]) -> None:
+        runs = [run for record in records for run in self._to_runs(record)]
+        self.client.batch_ingest_runs(create=runs, pre_sampled=True)
+
+    def _to_runs(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        trace_id = record["trace_id"]
+        started = record["start_time"]
+        root_order = f"{_dotted_time(started)}{trace_id}"
+        root = {
+            "id": trace_id,
+            "trace_id": trace_id,
+            "dotted_order": root_order,
+            "session_name": self.project,
+            "name": f"kenopi.{record['endpoint']}",
+            "run_type": "chain",
+            "start_time": _to_datetime(started),
+            "end_time": _to_datetime(started + record["duration_ms"] / 1000),
+            "inputs": {"query_hash": record["attributes"].get("query_hash")},
+            "outputs": {"mode": record["mode"], "outcome": record["outcome"]},
+            "error": record["outcome"] if record["outcome"] in ("error", "cancelled") else None,
+            "extra": {"metadata": {
+                "sample_reason": record["sample_reason"],
+                "fallback_reason": record["fallback_reason"],
+                **record["attributes"],
+            }},
+        }
+        runs = [root]
+        for span in record["spans"]:
+            span_id = str(uuid.uuid4())
+            span_started = started + span["start_offset_ms"] / 1000
+            runs.append({
+                "id": span_id,
+                "trace_id": trace_id,
+                "parent_run_id": trace_id,
+                "dotted_order": f"{root_order}.{_dotted_time(span_started)}{span_id}",
+                "session_name": self.project,
+                "name": span["name"],
+                "run_type": _RUN_TYPES.get(span["name"], "chain"),
+                "start_time": _to_datetime(span_started),
+                "end_time": _to_datetime(span_started + span["duration_ms"] / 1000),
+                "inputs": {},
+                "outputs": {},
+            })
+        return runs
+
+
+def _to_datetime(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _dotted_time(epoch: float) -> str:
+    return _to_datetime(epoch).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+class Tracer:
+    """샘플링 결정 + 내보내기 큐 + 배치 전송 스레드"""
+
+    def __init__(self, exporter: Any = None, default_rate: float = 0.05,
+                 mode_rates: Optional[Dict[str, float]] = None, slow_ms: float = 5000.0,
+                 queue_size: int = 10000, batch_size: int = 100, flush_interval: float = 2.0):
+        self.exporter = exporter
+        self.default_rate = default_rate
+        self.mode_rates = mode_rates or {}
+        self.slow_ms = slow_ms
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            exporter=_exporter_from_env(),
+            default_rate=float(os.getenv("KENOPI_TRACE_SAMPLE_RATE", "0.05")),
+            mode_rates=_parse_rates(os.getenv("KENOPI_TRACE_SAMPLE_RATES", "")),
+            slow_ms=float(os.getenv("KENOPI_TRACE_SLOW_MS", "5000")),
+            queue_size=TRACE_QUEUE_SIZE,
+            batch_size=TRACE_BATCH_SIZE,
+            flush_interval=TRACE_FLUSH_INTERVAL,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def sample_reason(self, trace: Any) -> Optional[str]:
+        """수집 사유 (수집하지 않으면 None)
+
+        모드는 요청 처리 중에 정해지므로, 요청 시작 시 뽑아 둔 값(trace.sample_draw)을
+        최종 모드의 비율과 비교한다 (요청마다 결정은 시작 시점에 고정).
+        """
+        if trace.outcome == "error":
+            return "error"
+        if trace.duration * 1000 >= self.slow_ms:
+            return "slow"
+        if trace.sample_draw < self.mode_rates.get(trace.mode, self.default_rate):
+            return "sampled"
+        return None
+
+    def offer(self, trace: Any) -> None:
+        """완료된 RequestTrace 제출 - 요청 경로에서는 큐에 넣기만 함 (가득 차면 버림)"""
+        if self.exporter is None:
+            return
+        reason = self.sample_reason(trace)
+        if reason is None:
+            return
+        TRACES_SAMPLED.inc(reason=reason)
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(_to_record(trace, reason))
+        except queue.Full:
+            TRACES_DROPPED.inc()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="kenopi-trace-export", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = {}
+            if record is None:  # 종료 신호
+                self._export(batch)
+                return
+            if record:
+                batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _export(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+            TRACES_EXPORTED.inc(len(batch), exporter=self.exporter.name, result="ok")
+        except Exception as e:
+            TRACES_EXPORTED.inc(len(batch), exporter=self.exporter.name, result="error")
+            logger.warning(f"Trace export failed ({len(batch)} traces): {e}")
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """남은 추적을 내보내고 전송 스레드 종료"""
+        if self._worker is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+        self._worker = None
+
+
+def _to_record(trace: Any, reason: str) -> Dict[str, Any]:
+    return {
+        "trace_id": str(uuid.uuid4()),
+        "endpoint": trace.endpoint,
+        "mode": trace.mode,
+        "outcome": trace.outcome,
+        "fallback_reason": trace.fallback_reason,
+        "sample_reason": reason,
+        "start_time": trace.started_at,
+        "duration_ms": round(trace.duration * 1000, 2),
+        "attributes": dict(trace.attributes),
+        "spans": [
+            {
+                "name": name,
+                "start_offset_ms": round((started - trace.started) * 1000, 2),
+                "duration_ms": round(seconds * 1000, 2),
+            }
+            for name, started, seconds in trace.stages
+        ],
+    }
+
+
+def _legacy_tracing_flag() -> bool:
+    """기존 전역 추적 플래그 (사용자 오타 LANGWSMITH_ 포함)"""
+    names = ("LANGSMITH_TRACING_V2", "LANGWSMITH_TRACING_V2", "LANGCHAIN_TRACING_V2")
+    return any(os.getenv(name, "").lower() == "true" for name in names)
+
+
+def _exporter_from_env() -> Any:
+    name = os.getenv("KENOPI_TRACE_EXPORTER", "").lower()
+    if not name:
+        has_key = os.getenv("LANGSMITH_API_KEY") or os.getenv("LANGCHAIN_API_KEY")
+        name = "langsmith" if has_key and _legacy_tracing_flag() else "none"
+
+    # 어떤 내보내기를 쓰든 LangChain 전역 추적은 끔 (file/none에서도 모든 호출이 따로 전송되지 않도록)
+    _disable_global_langchain_tracing()
+
+    if name == "langsmith":
+        try:
+            return LangSmithExporter(os.getenv("LANGSMITH_PROJECT", "kenopi-cs"))
+        except Exception as e:
+            logger.warning(f"LangSmith exporter not available: {e}")
+            return None
+    if name == "file":
+        return FileExporter(os.getenv("KENOPI_TRACE_FILE", "kenopi_traces.jsonl"))
+    return None
+
+
+def _disable_global_langchain_tracing() -> None:
+    """기존 전역 플래그를 샘플링 내보내기로 대체 - LangChain이 모든 호출을 따로 추적하지 않도록 해제"""
+    ignored = [
+        name
+        for name in ("LANGSMITH_TRACING_V2", "LANGCHAIN_TRACING_V2", "LANGSMITH_TRACING", "LANGCHAIN_TRACING")
+        if os.environ.pop(name, None) is not None
+    ]
+    if ignored:
+        logger.warning(
+            f"Ignoring {', '.join(ignored)}: tracing is sampled by KENOPI_TRACE_EXPORTER instead"
+        )
+    try:
+        from langsmith import utils
+
+        utils.get_env_var.cache_clear()
+    except Exception:
+        pass
+
+
+# 전역 인스턴스
+tracer = Tracer.from_env()
@@ -0,0 +1,160 @@
+"""
+시작 시 예열(warm-up)
+프로세스가 뜨자마자 /health는 정상이지만 첫 요청들은 LLM 연결 수립, MCP 패키지 설치, FAQ 인덱스 구축 비용을 떠안으므로
+lifespan에서 백그라운드 태스크로 미리 수행하고, 끝난 뒤에만 /ready가 200을 반환
+
+단계: faq(FAQ 로드 + 전체 문항 검색으로 캐시 적재) → classifier(지표 인덱스 컴파일)
+      → llm(연결 풀 미리 열기) → mcp(npx 패키지 받아 두기) → replay(예시 질문 재생, 선택)
+실패한 단계는 기록만 하고 다음 단계로 진행 (예열 실패로 인스턴스가 영영 준비되지 않는 일이 없도록)
+
+환경변수: KENOPI_WARMUP(1), KENOPI_WARMUP_STEP_TIMEOUT(60, 단계별 초), KENOPI_WARMUP_REPLAY(0, 재생할 예시 질문 수)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from kenopi_chatbot import THINKING_AVAILABLE, generate_advanced_response, get_faq_list, get_llm, search_faq_batch
+from log_config import get_logger
+from metrics import Gauge
+from query_classifier import get_classifier
+
+logger = get_logger(__name__)
+
+WARMUP_ENABLED = os.getenv("KENOPI_WARMUP", "1") != "0"
+WARMUP_STEP_TIMEOUT = float(os.getenv("KENOPI_WARMUP_STEP_TIMEOUT", "60"))
+WARMUP_REPLAY = int(os.getenv("KENOPI_WARMUP_REPLAY", "0"))
+
+# 재생용 예시 질문 (FAQ/기본/추론 경로가 골고루 지나가도록)
+WARMUP_QUERIES = [
+    "환불은 어떻게 하면 되나요?",
+    "배송은 보통 얼마나 걸리나요?",
+    "교환하고 싶은데 사이즈가 안 맞아요",
+    "우산에 스크래치가 있는데 왜 이런 건지, 어떻게 처리해야 하나요?",
+    "고객센터 연락처 알려주세요",
+]
+
+WARMUP_STEP_SECONDS = Gauge("kenopi_warmup_step_seconds", "Duration of each startup warm-up step", ["step"])
+
+
+class Warmup:
+    """예열 단계 실행 + 준비 상태"""
+
+    def __init__(self, enabled: bool = True, step_timeout: float = 60.0, replay: int = 0):
+        self.enabled = enabled
+        self.step_timeout = step_timeout
+        self.replay = replay
+        self._ready = not enabled
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self._started: Optional[float] = None
+        self._duration: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "Warmup":
+        return cls(enabled=WARMUP_ENABLED, step_timeout=WARMUP_STEP_TIMEOUT, replay=WARMUP_REPLAY)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def start(self) -> None:
+        """실행 중인 이벤트 루프에서 호출 (lifespan 시작)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._started = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        if not self.enabled:
+            state = "disabled"
+        else:
+            state = "ready" if self._ready else "warming_up"
+        elapsed = self._duration
+        if elapsed is None and self._started is not None:
+            elapsed = time.monotonic() - self._started
+        return {
+            "status": state,
+            "elapsed_s": round(elapsed, 3) if elapsed is not None else None,
+            "steps": dict(self._steps),
+        }
+
+    async def _run(self) -> None:
+        steps: List[Tuple[str, Callable[[], Awaitable[str]]]] = [
+            ("faq", self._warm_faq),
+            ("classifier", self._warm_classifier),
+            ("llm", self._warm_llm),
+            ("mcp", self._warm_mcp),
+            ("replay", self._replay),
+        ]
+        for name, step in steps:
+            await self._run_step(name, step)
+        self._duration = time.monotonic() - self._started
+        self._ready = True
+        logger.info("Warm-up finished", extra={
+            "elapsed_s": round(self._duration, 3),
+            "steps": {name: step["status"] for name, step in self._steps.items()},
+        })
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[str]]) -> None:
+        started = time.perf_counter()
+        entry: Dict[str, Any] = {}
+        try:
+            entry["status"] = await asyncio.wait_for(step(), self.step_timeout)
+        except asyncio.TimeoutError:
+            entry.update(status="error", error="timeout")
+        except Exception as e:
+            entry.update(status="error", error=f"{type(e).__name__}: {e}")
+        seconds = time.perf_counter() - started
+        entry["seconds"] = round(seconds, 3)
+        self._steps[name] = entry
+        WARMUP_STEP_SECONDS.set(seconds, step=name)
+        if entry["status"] == "error":
+            logger.warning("Warm-up step failed", extra={"step": name, "error": entry["error"]})
+
+    async def _warm_faq(self) -> str:
+        # 모든 FAQ 문항을 한 번씩 검색해 정확히 같은 질문은 캐시에서 바로 응답
+        questions = [item["question"] for item in await asyncio.to_thread(get_faq_list)]
+        await asyncio.to_thread(search_faq_batch, questions)
+        return "ok"
+
+    async def _warm_classifier(self) -> str:
+        await asyncio.to_thread(get_classifier)
+        return "ok"
+
+    async def _warm_llm(self) -> str:
+        llm = await asyncio.to_thread(get_llm)  # langchain_openai import + 클라이언트 생성
+        if llm is None:
+            return "skipped"
+        # 요청 경로는 루프의 async 클라이언트를, 일괄 처리 등은 sync 클라이언트를 사용 - 둘 다 연결을 열어 둠
+        await asyncio.gather(
+            llm.root_async_client.models.list(),
+            asyncio.to_thread(llm.root_client.models.list),
+        )
+        return "ok"
+
+    async def _warm_mcp(self) -> str:
+        if not THINKING_AVAILABLE:
+            return "skipped"
+        from sequential_thinking_mcp import thinking_mcp
+
+        installed = await asyncio.to_thread(thinking_mcp.warm_up, self.step_timeout)
+        return "ok" if installed else "skipped"
+
+    async def _replay(self) -> str:
+        if self.replay <= 0:
+            return "skipped"
+        for query in WARMUP_QUERIES[:self.replay]:
+            await asyncio.to_thread(generate_advanced_response, [{"role": "user", "content": query}])
+        return "ok"
+
+
+# 전역 인스턴스
+warmup = Warmup.from_env()
+
+READY = Gauge("kenopi_ready", "1 once the startup warm-up has finished", callback=lambda: float(warmup.ready))
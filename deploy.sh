@@ -40,7 +40,7 @@ gcloud run deploy $SERVICE_NAME_BACKEND \
   --cpu 1 \
   --min-instances 0 \
   --max-instances 10 \
-  --set-env-vars="PYTHONUNBUFFERED=1" \
+  --set-env-vars="PYTHONUNBUFFERED=1,KENOPI_RATE_LIMIT_PROXY_HOPS=1" \
   --project $PROJECT_ID
 
 # 백엔드 URL 가져오기
@@ -46,6 +46,7 @@ const ChatbotComponent: React.FC = () => {
 
   const getModeIcon = (mode?: string) => {
     switch (mode) {
+      case 'faq': return '📚'
       case 'basic': return '💬'
       case 'thinking': return '🧠'
       case 'enhanced': return '⚡'
@@ -56,6 +57,7 @@ const ChatbotComponent: React.FC = () => {
 
   const getModeLabel = (mode?: string) => {
     switch (mode) {
+      case 'faq': return 'FAQ 답변'
       case 'basic': return '기본 모드'
       case 'thinking': return '추론 모드'
       case 'enhanced': return '고급 모드'
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+채팅 API 동시 부하 테스트
+test_auto_mode_selection.py의 TEST_QUESTIONS를 유형별 비율로 섞어서
+/kenopi/chat, /kenopi/chat/advanced, /kenopi/ws(스트리밍), /kenopi/chat/batch(NDJSON 스트리밍)에 동시에 요청
+
+- 부하 방식: --rps(열린 모델, 정해진 시각에 요청 시작) 또는 --concurrency(닫힌 모델, 동시 사용자 N명)
+- --rps 모드의 지연 시간은 예정 시각부터 측정 (서버가 밀려 요청 시작이 늦어진 시간도 포함)
+- 엔드포인트별 / 선택된 모드별 p50/p95/p99, 오류율, 처리량 + 스트리밍은 첫 조각까지 시간(ttfb)
+- 선택 모드 일치율: advanced/ws 응답의 selected_mode(faq/basic/thinking/enhanced)와 질문의 expected_mode 비교
+  (FAQ mid 구간 질문은 재작성 LLM이 설정된 서버에서는 faq로 답하므로 불일치로 집계될 수 있음)
+- 결과를 JSON으로 저장하고 --compare로 이전 실행과 비교 (--max-regression 초과 시 종료 코드 1)
+
+서버의 속도 제한(KENOPI_RATE_LIMIT)에 걸리면 429가 오류로 집계되므로 부하 테스트 시에는 KENOPI_RATE_LIMIT=0으로 실행
+
+사용 예:
+    python loadtest/kenopi_load.py --concurrency 20 --duration 60
+    python loadtest/kenopi_load.py --rps 30 --duration 60 --endpoints advanced=3,chat=1,ws=1 --output run.json
+    python loadtest/kenopi_load.py --rps 30 --mix basic=2,thinking=1,enhanced=1 --compare run.json --max-regression 20
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from test_auto_mode_selection import TEST_QUESTIONS  # noqa: E402
+
+ENDPOINTS = ("chat", "advanced", "ws", "batch")
+
+# 이 값이 다른 실행끼리는 지연/처리량을 직접 비교할 수 없음
+LOAD_SETTINGS = ("endpoints", "mix", "rps", "concurrency", "max_inflight", "poisson", "batch_size", "unique")
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """"a=3,b=1" → {"a": 3.0, "b": 1.0}"""
+    weights = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, weight = part.split("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Workload:
+    """엔드포인트 / 질문 선택 (질문은 유형(category) 또는 예상 모드(expected_mode) 이름으로 비율 지정)"""
+
+    def __init__(self, endpoint_weights: Dict[str, float], mix: Dict[str, float], seed: int, unique: bool):
+        self.endpoints = [name for name in ENDPOINTS if endpoint_weights.get(name, 0) > 0]
+        self.endpoint_weights = [endpoint_weights[name] for name in self.endpoints]
+        if not self.endpoints:
+            raise SystemExit(f"--endpoints에 {', '.join(ENDPOINTS)} 중 하나 이상 필요")
+        self.questions = TEST_QUESTIONS
+        self.question_weights = [
+            mix.get(q["category"], mix.get(q["expected_mode"], 0.0 if mix else 1.0)) for q in self.questions
+        ]
+        if not any(self.question_weights):
+            raise SystemExit("--mix에 해당하는 질문이 없습니다 (category 또는 expected_mode 이름 사용)")
+        self.random = random.Random(seed)
+        self.unique = unique
+        self._counter = 0
+
+    def next_endpoint(self) -> str:
+        return self.random.choices(self.endpoints, self.endpoint_weights)[0]
+
+    def next_question(self) -> Dict[str, str]:
+        question = self.random.choices(self.questions, self.question_weights)[0]
+        self._counter += 1
+        query = question["query"] + (f" ({self._counter})" if self.unique else "")
+        return {"query": query, "category": question["category"], "expected_mode": question["expected_mode"]}
+
+
+class Runner:
+    def __init__(self, base_url: str, workload: Workload, timeout: float, batch_size: int):
+        self.base_url = base_url.rstrip("/")
+        self.ws_url = "ws" + self.base_url[len("http"):] + "/kenopi/ws"
+        self.workload = workload
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.samples: List[Dict[str, Any]] = []
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def one(self, scheduled: Optional[float] = None) -> None:
+        endpoint = self.workload.next_endpoint()
+        question = self.workload.next_question()
+        started = scheduled if scheduled is not None else time.perf_counter()
+        sample: Dict[str, Any] = {"endpoint": endpoint, "category": question["category"],
+                                  "expected_mode": question["expected_mode"]}
+        try:
+            call = getattr(self, f"_{endpoint}")
+            status, mode, first_chunk = await asyncio.wait_for(call(question["query"]), self.timeout)
+            sample.update(status=status, selected_mode=mode)
+            if first_chunk is not None:
+                sample["ttfb"] = first_chunk - started
+        except asyncio.TimeoutError:
+            sample.update(status="timeout", selected_mode=None)
+        except Exception as e:
+            sample.update(status=type(e).__name__, selected_mode=None)
+        sample["latency"] = time.perf_counter() - started
+        self.samples.append(sample)
+
+    async def _chat(self, query: str) -> Tuple[Any, Optional[str], None]:
+        r = await self.client.post("/kenopi/chat", json={"messages": [{"role": "user", "content": query}]})
+        return (200 if r.status_code == 200 else r.status_code), "auto" if r.status_code == 200 else None, None
+
+    async def _advanced(self, query: str) -> Tuple[Any, Optional[str], None]:
+        r = await self.client.post("/kenopi/chat/advanced", json={"messages": [{"role": "user", "content": query}]})
+        if r.status_code != 200:
+            return r.status_code, None, None
+        return 200, r.json().get("selected_mode"), None
+
+    async def _ws(self, query: str) -> Tuple[Any, Optional[str], Optional[float]]:
+        first = None
+        async with websockets.connect(self.ws_url, open_timeout=self.timeout, ping_interval=None) as ws:
+            await ws.send(json.dumps({"type": "message", "content": query}))
+            while True:
+                data = json.loads(await ws.recv())
+                if data["type"] == "delta" and first is None:
+                    first = time.perf_counter()
+                elif data["type"] == "done":
+                    return 200, data.get("selected_mode"), first
+                elif data["type"] in ("error", "cancelled"):
+                    return f"ws_{data['type']}", None, first
+
+    async def _batch(self, query: str) -> Tuple[Any, Optional[str], Optional[float]]:
+        items = [{"id": "0", "messages": [{"role": "user", "content": query}]}]
+        items += [
+            {"id": str(i), "messages": [{"role": "user", "content": self.workload.next_question()["query"]}]}
+            for i in range(1, self.batch_size)
+        ]
+        first = None
+        status: Any = 200
+        async with self.client.stream("POST", "/kenopi/chat/batch", json={"items": items}) as r:
+            if r.status_code != 200:
+                return r.status_code, None, None
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                if first is None:
+                    first = time.perf_counter()
+                if json.loads(line).get("status") != "ok":
+                    status = "batch_item_error"
+        return status, "batch", first
+
+    async def run_concurrency(self, concurrency: int, duration: float, total: int) -> None:
+        """닫힌 모델 - 사용자 N명이 응답을 받으면 바로 다음 요청"""
+        deadline = float("inf") if total else time.perf_counter() + duration
+        issued = 0
+
+        async def user():
+            nonlocal issued
+            while time.perf_counter() < deadline and (not total or issued < total):
+                issued += 1
+                await self.one()
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def run_rps(self, rps: float, duration: float, total: int, max_inflight: int, poisson: bool) -> None:
+        """열린 모델 - 목표 RPS로 요청 시작 (동시 요청이 max_inflight를 넘으면 대기, 대기 시간도 지연에 포함)"""
+        count = total or int(rps * duration)
+        semaphore = asyncio.Semaphore(max_inflight)
+        start = time.perf_counter()
+        tasks = []
+        offset = 0.0
+
+        async def limited(scheduled: float):
+            async with semaphore:
+                await self.one(scheduled)
+
+        for i in range(count):
+            offset = offset + self.workload.random.expovariate(rps) if poisson else i / rps
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(limited(start + offset)))
+        await asyncio.gather(*tasks)
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s["status"] == 200]
+    latencies = [s["latency"] for s in ok]
+    codes: Dict[str, int] = {}
+    for s in samples:
+        codes[str(s["status"])] = codes.get(str(s["status"]), 0) + 1
+    stats: Dict[str, Any] = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+        "status": codes,
+    }
+    if latencies:
+        stats.update(
+            p50_ms=round(_percentile(latencies, 50) * 1000, 1),
+            p95_ms=round(_percentile(latencies, 95) * 1000, 1),
+            p99_ms=round(_percentile(latencies, 99) * 1000, 1),
+            mean_ms=round(statistics.mean(latencies) * 1000, 1),
+            max_ms=round(max(latencies) * 1000, 1),
+        )
+    ttfb = [s["ttfb"] for s in ok if "ttfb" in s]
+    if ttfb:
+        stats.update(ttfb_p50_ms=round(_percentile(ttfb, 50) * 1000, 1),
+                     ttfb_p95_ms=round(_percentile(ttfb, 95) * 1000, 1))
+    return stats
+
+
+def build_report(samples: List[Dict[str, Any]], elapsed: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    def grouped(key: str) -> Dict[str, Any]:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for s in samples:
+            groups.setdefault(str(s.get(key) or "error"), []).append(s)
+        return {name: summarize(group, elapsed) for name, group in sorted(groups.items())}
+
+    mode_checked = [s for s in samples if s["endpoint"] in ("advanced", "ws") and s["status"] == 200]
+    return {
+        "config": config,
+        "elapsed_s": round(elapsed, 2),
+        "overall": summarize(samples, elapsed),
+        "by_endpoint": grouped("endpoint"),
+        "by_mode": grouped("selected_mode"),
+        "mode_match_rate": round(
+            sum(s["selected_mode"] == s["expected_mode"] for s in mode_checked) / len(mode_checked), 3
+        ) if mode_checked else None,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'':<14}{'requests':>9}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'ttfb p50':>10}"
+    print(f"\n📊 결과 ({report['elapsed_s']}초)")
+    for title, rows in (("전체", {"overall": report["overall"]}), ("엔드포인트별", report["by_endpoint"]),
+                        ("선택 모드별", report["by_mode"])):
+        print(f"\n[{title}]\n{header}")
+        for name, s in rows.items():
+            ttfb = f"{s['ttfb_p50_ms']:.0f}ms" if "ttfb_p50_ms" in s else "-"
+            print(f"{name:<14}{s['requests']:>9}{s['error_rate'] * 100:>7.1f}%{s['throughput_rps']:>7.1f}/s"
+                  f"{s.get('p50_ms', 0):>7.0f}ms{s.get('p95_ms', 0):>7.0f}ms{s.get('p99_ms', 0):>7.0f}ms{ttfb:>10}")
+    codes = {code: n for code, n in report["overall"]["status"].items() if code != "200"}
+    if codes:
+        print(f"\n⚠️  오류 상태: {codes}")
+    if report["mode_match_rate"] is not None:
+        print(f"🎯 예상 모드 일치율 (advanced/ws): {report['mode_match_rate'] * 100:.1f}%")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """이전 실행 대비 변화 출력 - p95 증가율 또는 처리량 감소율이 max_regression(%)을 넘으면 False"""
+    ok = True
+    print(f"\n🔁 기준 실행과 비교")
+    changed = [key for key in LOAD_SETTINGS if report["config"].get(key) != baseline.get("config", {}).get(key)]
+    if changed:
+        print(f"  ⚠️  부하 설정이 다름 ({', '.join(changed)}) - 같은 설정으로 실행한 결과끼리 비교하세요")
+    rows = {"overall": (report["overall"], baseline.get("overall", {}))}
+    for name, stats in report["by_endpoint"].items():
+        rows[name] = (stats, baseline.get("by_endpoint", {}).get(name, {}))
+    for name, (current, base) in rows.items():
+        if not base:
+            print(f"  {name:<10} (기준 없음)")
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if base.get(key) and current.get(key) is not None:
+                change = (current[key] - base[key]) / base[key] * 100
+                parts.append(f"{key[:-3] if key.endswith('_ms') else 'rps'} {base[key]}→{current[key]} ({change:+.1f}%)")
+                worse = change if key == "p95_ms" else -change if key == "throughput_rps" else 0
+                if max_regression and worse > max_regression:
+                    ok = False
+        parts.append(f"오류율 {base.get('error_rate', 0) * 100:.1f}%→{current['error_rate'] * 100:.1f}%")
+        print(f"  {name:<10} " + ", ".join(parts))
+    if not ok:
+        print(f"❌ p95 또는 처리량이 {max_regression}% 넘게 나빠졌습니다", file=sys.stderr)
+    return ok
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workload = Workload(_parse_weights(args.endpoints), _parse_weights(args.mix), args.seed, args.unique)
+    runner = Runner(args.base_url, workload, args.timeout, args.batch_size)
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_inflight), max_keepalive_connections=None)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    async with httpx.AsyncClient(base_url=runner.base_url, timeout=args.timeout, limits=limits) as client:
+        runner.client = client
+        mode = f"{args.rps} RPS" if args.rps else f"동시 사용자 {args.concurrency}명"
+        print(f"🚀 {runner.base_url} - {mode}, {args.requests or f'{args.duration:.0f}초'}, 엔드포인트 {args.endpoints}")
+        started = time.perf_counter()
+        if args.rps:
+            await runner.run_rps(args.rps, args.duration, args.requests, args.max_inflight, args.poisson)
+        else:
+            await runner.run_concurrency(args.concurrency, args.duration, args.requests)
+        elapsed = time.perf_counter() - started
+    return build_report(runner.samples, elapsed, config)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="케노피 채팅 API 동시 부하 테스트")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--endpoints", default="advanced=3,chat=1,ws=1",
+                        help=f"엔드포인트별 비율 ({', '.join(ENDPOINTS)})")
+    parser.add_argument("--mix", default="", help="질문 비율 - category 또는 expected_mode 이름 (예: basic=2,faq=1,enhanced=1)")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, default=0.0, help="목표 초당 요청 수 (열린 모델)")
+    load.add_argument("--concurrency", type=int, default=10, help="동시 사용자 수 (닫힌 모델)")
+    parser.add_argument("--duration", type=float, default=30.0, help="실행 시간 (초)")
+    parser.add_argument("--requests", type=int, default=0, help="총 요청 수 (지정 시 --duration 대신 사용)")
+    parser.add_argument("--max-inflight", type=int, default=200, help="--rps 모드의 최대 동시 요청 수")
+    parser.add_argument("--poisson", action="store_true", help="--rps 모드에서 요청 간격을 지수 분포로")
+    parser.add_argument("--batch-size", type=int, default=5, help="batch 엔드포인트 요청당 항목 수")
+    parser.add_argument("--unique", action="store_true", help="질문마다 번호를 붙여 서버 캐시 적중 방지")
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청당 제한 시간 (초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.0, help="허용 p95/처리량 악화율 (%%, 0이면 검사 안 함)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 저장: {args.output}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if not compare(report, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
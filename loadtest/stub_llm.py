@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+OpenAI 호환 로컬 스텁 LLM 서버
+실제 OPENAI_API_KEY 없이 LLM 경로(기본 모드 답변, FAQ 재작성, 폴백)를 부하/장애 테스트하기 위한 서버
+ChatOpenAI / openai 클라이언트는 OPENAI_BASE_URL을 그대로 따르므로 백엔드 코드 수정 없이 연결됨
+
+- POST /v1/chat/completions (stream=true면 SSE, stream_options.include_usage 지원), GET /v1/models
+- 첫 토큰까지 지연: fixed / uniform / normal / lognormal / exponential 분포, 이후 --tokens-per-second 속도로 생성
+- 오류 주입: --error-rate(500), --rate-limit-rate(429 + Retry-After), --abort-rate(스트리밍 도중 연결 끊기),
+  --max-concurrency(동시 요청 초과 시 429, 제공자 한도 흉내)
+- 답변은 결정적: 같은 메시지면 같은 답변 (FAQ 재작성 프롬프트는 주어진 FAQ 답변을 그대로 사용, "NO_ANSWER" 규칙 포함)
+- GET /stub/stats: 요청/오류/토큰 집계, POST /stub/config: 실행 중 지연·오류율 변경 (장애 시나리오 전환)
+
+사용 예:
+    python loadtest/stub_llm.py --port 8099 --latency lognormal:0.6,0.5 --tokens-per-second 40
+    python loadtest/stub_llm.py --rate-limit-rate 0.05 --error-rate 0.01 --max-concurrency 20
+
+    # 백엔드를 스텁에 연결 (키는 아무 값)
+    OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=stub KENOPI_RATE_LIMIT=0 python backend/serve.py
+    curl -X POST localhost:8099/stub/config -d '{"error_rate": 0.5}'   # 실행 중 장애 주입
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+from token_usage import estimate_message_tokens, estimate_tokens  # noqa: E402
+
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# 결정적 답변 후보 (마지막 고객 메시지 해시로 선택)
+CANNED_ANSWERS = [
+    "문의 주셔서 감사합니다. 주문하신 상품은 결제 완료 후 1~3일 이내에 출고되며, 출고 후 보통 1~2일 안에 받아보실 수 있습니다. "
+    "배송 조회는 마이페이지 > 주문내역에서 확인하실 수 있어요.",
+    "불편을 드려 죄송합니다. 상품 수령 후 7일 이내라면 교환 또는 반품이 가능합니다. 마이페이지에서 신청해 주시면 "
+    "회수 기사님이 방문하며, 제품 하자인 경우 배송비는 케노피가 부담합니다.",
+    "케노피 우산은 구매일로부터 1년간 무상 A/S를 제공합니다. 살 휨이나 손잡이 파손 등은 고객센터(1588-0000)로 "
+    "사진과 함께 접수해 주시면 빠르게 안내드리겠습니다.",
+    "말씀하신 내용 확인했습니다. 정확한 안내를 위해 주문번호와 성함을 알려주시면 담당자가 확인 후 연락드리겠습니다. "
+    "추가로 궁금하신 점이 있으면 언제든 말씀해 주세요.",
+]
+
+
+class Latency:
+    """"분포:인자,인자" 형식의 첫 토큰 지연 분포 (초)"""
+
+    def __init__(self, spec: str):
+        name, _, params = spec.partition(":")
+        if name not in DISTRIBUTIONS:
+            raise ValueError(f"지원하지 않는 분포: {name} ({', '.join(DISTRIBUTIONS)})")
+        self.spec = spec
+        self.name = name
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.name == "fixed":
+            value = p[0] if p else 0.0
+        elif self.name == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.name == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.name == "lognormal":
+            # 인자: 중앙값, sigma (꼬리가 긴 실제 API 지연에 가까움)
+            value = p[0] * rng.lognormvariate(0.0, p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+
+class StubState:
+    """스텁 동작 설정 + 집계 (설정은 /stub/config로 실행 중 변경 가능)"""
+
+    def __init__(self, latency: Latency, tokens_per_second: float, error_rate: float, rate_limit_rate: float,
+                 abort_rate: float, max_concurrency: int, seed: int):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.abort_rate = abort_rate
+        self.max_concurrency = max_concurrency
+        self.rng = random.Random(seed)
+        self.in_flight = 0
+        self.counts: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def count(self, outcome: str) -> None:
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.spec,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "abort_rate": self.abort_rate,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def update(self, values: Dict[str, Any]) -> None:
+        if "latency" in values:
+            self.latency = Latency(values["latency"])
+        for key in ("tokens_per_second", "error_rate", "rate_limit_rate", "abort_rate"):
+            if key in values:
+                setattr(self, key, float(values[key]))
+        if "max_concurrency" in values:
+            self.max_concurrency = int(values["max_concurrency"])
+
+
+def _text(content: Any) -> str:
+    """메시지 content (문자열 또는 [{"type": "text", "text": ...}] 목록)"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def canned_answer(messages: List[Dict[str, Any]]) -> str:
+    """같은 대화면 항상 같은 답변"""
+    system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    last_user = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+    # FAQ 재작성 프롬프트: 사용자 메시지의 "A: ..." 부분을 답변으로 (FAQ가 없으면 NO_ANSWER)
+    if "NO_ANSWER" in system:
+        for line in last_user.splitlines():
+            if line.startswith("A: "):
+                return "안녕하세요! 노피🤖입니다. 😊\n\n" + line[3:]
+        return "NO_ANSWER"
+    digest = hashlib.sha1(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode()).digest()
+    return "안녕하세요! 노피🤖입니다. 😊\n\n" + CANNED_ANSWERS[digest[0] % len(CANNED_ANSWERS)]
+
+
+def _split_tokens(text: str, count: int) -> List[str]:
+    """답변을 추정 토큰 수만큼의 조각으로 나눔 (스트리밍 단위)"""
+    count = max(1, min(count, len(text)))
+    size, extra = divmod(len(text), count)
+    pieces, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        pieces.append(text[start:end])
+        start = end
+    return pieces
+
+
+def _error(status: int, message: str, error_type: str, code: str,
+           headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    body = {"error": {"message": message, "type": error_type, "param": None, "code": code}}
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="Kenopi stub LLM")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [
+            {"id": model, "object": "model", "created": 0, "owned_by": "stub"} for model in ("gpt-4o", "gpt-4o-mini")
+        ]}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return {
+            "config": state.config(),
+            "in_flight": state.in_flight,
+            "outcomes": dict(state.counts),
+            "prompt_tokens": state.prompt_tokens,
+            "completion_tokens": state.completion_tokens,
+        }
+
+    @app.post("/stub/config")
+    async def update_config(request: Request):
+        try:
+            state.update(await request.json())
+        except (ValueError, TypeError, IndexError) as e:
+            return JSONResponse({"detail": str(e)}, status_code=400)
+        return state.config()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model", "gpt-4o")
+
+        # 오류 주입 (지연 전에 결정 - 실제 API도 한도 초과는 바로 응답)
+        if state.max_concurrency and state.in_flight >= state.max_concurrency:
+            state.count("rate_limited_concurrency")
+            return _error(429, "Rate limit reached for requests (stub concurrency limit)", "requests",
+                          "rate_limit_exceeded", {"retry-after": "1", "retry-after-ms": "1000"})
+        roll = state.rng.random()
+        if roll < state.rate_limit_rate:
+            state.count("rate_limited")
+            return _error(429, "Rate limit reached for requests (stub injected)", "requests",
+                          "rate_limit_exceeded", {"retry-after": "1", "retry-after-ms": "1000"})
+        if roll < state.rate_limit_rate + state.error_rate:
+            state.count("server_error")
+            return _error(500, "The server had an error while processing your request (stub injected)",
+                          "server_error", "internal_error")
+
+        answer = canned_answer(messages)
+        pieces = _split_tokens(answer, estimate_tokens(answer))
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(pieces) > body["max_tokens"]:
+            pieces, finish_reason = pieces[:body["max_tokens"]], "length"
+        prompt_tokens = sum(estimate_message_tokens(_text(m.get("content"))) for m in messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                 "total_tokens": prompt_tokens + len(pieces)}
+        first_token_delay = state.latency.sample(state.rng)
+        token_interval = 1.0 / state.tokens_per_second if state.tokens_per_second > 0 else 0.0
+        abort_at = state.rng.randrange(len(pieces)) if state.rng.random() < state.abort_rate else None
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            state.in_flight += 1
+            try:
+                await asyncio.sleep(first_token_delay + token_interval * len(pieces))
+            finally:
+                state.in_flight -= 1
+            state.count("ok")
+            state.prompt_tokens += usage["prompt_tokens"]
+            state.completion_tokens += usage["completion_tokens"]
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "system_fingerprint": "stub",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                             "logprobs": None, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra: Any) -> str:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "system_fingerprint": "stub",
+                       "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish}]}
+            payload.update(extra)
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def stream():
+            state.in_flight += 1
+            try:
+                await asyncio.sleep(first_token_delay)
+                yield chunk({"role": "assistant", "content": ""})
+                for i, piece in enumerate(pieces):
+                    if i == abort_at:
+                        state.count("aborted")
+                        return  # 응답 도중 연결 끊김 (finish_reason/[DONE] 없이 종료)
+                    yield chunk({"content": piece})
+                    if token_interval:
+                        await asyncio.sleep(token_interval)
+                yield chunk({}, finish_reason)
+                if include_usage:
+                    payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                               "model": model, "choices": [], "usage": usage}
+                    yield f"data: {json.dumps(payload)}\n\n"
+                yield "data: [DONE]\n\n"
+                state.count("ok")
+                state.prompt_tokens += usage["prompt_tokens"]
+                state.completion_tokens += usage["completion_tokens"]
+            finally:
+                state.in_flight -= 1
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="OpenAI 호환 스텁 LLM 서버 (오프라인 부하/장애 테스트용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="lognormal:0.5,0.4",
+                        help=f"첫 토큰까지 지연 분포 ({', '.join(DISTRIBUTIONS)}), 예: fixed:0.2, uniform:0.1,0.8, "
+                             f"normal:0.5,0.1, lognormal:중앙값,sigma, exponential:평균")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="생성 속도 (0이면 즉시)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 오류 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 오류 비율")
+    parser.add_argument("--abort-rate", type=float, default=0.0, help="스트리밍 도중 연결을 끊는 비율")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="동시 요청 한도 (초과 시 429, 0이면 무제한)")
+    parser.add_argument("--seed", type=int, default=0, help="지연/오류 샘플링 시드")
+    args = parser.parse_args()
+
+    try:
+        latency = Latency(args.latency)
+        latency.sample(random.Random(0))
+    except (ValueError, IndexError) as e:
+        parser.error(f"--latency: {e}")
+    state = StubState(latency, args.tokens_per_second, args.error_rate, args.rate_limit_rate,
+                      args.abort_rate, args.max_concurrency, args.seed)
+    print(f"🧪 스텁 LLM: http://{args.host}:{args.port}/v1 ({json.dumps(state.config(), ensure_ascii=False)})")
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+WebSocket 유휴 연결 부하 테스트
+/kenopi/ws 에 유휴 연결 N개를 열어 유지하면서, 일부 연결의 ping 왕복 지연을 측정
+
+사용 예:
+    python loadtest/ws_idle.py --url ws://localhost:8000/kenopi/ws --connections 5000 --hold 60
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+
+async def _open(url: str, sem: asyncio.Semaphore):
+    async with sem:
+        return await websockets.connect(url, open_timeout=30, ping_interval=None)
+
+
+async def _ping(ws) -> float:
+    start = time.perf_counter()
+    await ws.send(json.dumps({"type": "ping"}))
+    await ws.recv()
+    return time.perf_counter() - start
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(url: str, connections: int, hold: float, ramp_concurrency: int, sample: int):
+    sem = asyncio.Semaphore(ramp_concurrency)
+    print(f"🔌 연결 {connections}개 생성 중... ({url})")
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_open(url, sem) for _ in range(connections)), return_exceptions=True)
+    sockets = [r for r in results if not isinstance(r, BaseException)]
+    failures = [r for r in results if isinstance(r, BaseException)]
+    print(f"✅ 연결 성공: {len(sockets)} / 실패: {len(failures)} ({time.perf_counter() - started:.1f}초)")
+    if failures:
+        print(f"   첫 번째 실패: {failures[0]!r}")
+
+    latencies = []
+    deadline = time.perf_counter() + hold
+    while time.perf_counter() < deadline and sockets:
+        probes = sockets[:: max(1, len(sockets) // sample)][:sample]
+        rounds = await asyncio.gather(*(_ping(ws) for ws in probes), return_exceptions=True)
+        latencies.extend(r for r in rounds if isinstance(r, float))
+        await asyncio.sleep(1)
+
+    alive = sum(1 for ws in sockets if ws.close_code is None)
+    print(f"\n📊 유휴 연결 {alive}/{len(sockets)}개 유지 ({hold:.0f}초)")
+    if latencies:
+        print(f"   ping 왕복: p50 {statistics.median(latencies) * 1000:.1f}ms, "
+              f"p99 {_percentile(latencies, 99) * 1000:.1f}ms (표본 {len(latencies)}회)")
+
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/kenopi/ws 유휴 연결 부하 테스트")
+    parser.add_argument("--url", default="ws://localhost:8000/kenopi/ws")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--hold", type=float, default=30.0, help="연결 유지 시간 (초)")
+    parser.add_argument("--ramp-concurrency", type=int, default=200, help="동시 연결 생성 수")
+    parser.add_argument("--sample", type=int, default=50, help="ping 측정 연결 수 (초당)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.connections, args.hold, args.ramp_concurrency, args.sample))
+
+
+if __name__ == "__main__":
+    main()
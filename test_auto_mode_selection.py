@@ -47,7 +47,7 @@ TEST_QUESTIONS = [
     },
     {
         "query": "주문 취소하고 싶은데 어떻게 하나요?",
-        "expected_mode": "thinking",
+        "expected_mode": "faq",  # FAQ와 거의 같은 질문 (high 구간) - 모드 선택 없이 FAQ 답변
         "category": "절차 문의"
     },
     {
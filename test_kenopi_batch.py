@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+오프라인 일괄 처리 CLI 테스트 스크립트
+깨진 JSONL 줄이 실행을 중단시키지 않고 오류 레코드로 기록되며, --resume 후에도 순번이 유지되는지 검증
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# 백엔드 경로 추가
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import kenopi_batch
+
+def _args(input_path: Path, output_path: Path, **overrides) -> argparse.Namespace:
+    args = argparse.Namespace(
+        input=str(input_path), output=str(output_path), mode="basic", workers=2, checkpoint=None,
+        checkpoint_interval=0.0, report_interval=60.0, limit=0, resume=False, overwrite=False
+    )
+    for key, value in overrides.items():
+        setattr(args, key, value)
+    return args
+
+def test_corrupt_lines_then_resume():
+    """깨진 줄/객체가 아닌 줄은 오류 레코드, 나머지는 정상 처리 - 재개 시 같은 줄에서 다시 실패하지 않음"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = Path(tmp) / "inquiries.jsonl"
+        output_path = Path(tmp) / "answers.jsonl"
+        input_path.write_text("\n".join([
+            json.dumps({"id": "q1", "query": "환불하고 싶어"}, ensure_ascii=False),
+            '{"id": "q2", "query": "깨진 줄',
+            "[1, 2, 3]",
+            json.dumps({"id": "q4", "query": "교환하고 싶어요"}, ensure_ascii=False),
+        ]) + "\n", encoding="utf-8")
+
+        assert kenopi_batch.run(_args(input_path, output_path, limit=2)) == 0
+        assert kenopi_batch.run(_args(input_path, output_path, resume=True)) == 0
+
+        records = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        by_index = {record["index"]: record for record in records}
+        assert sorted(by_index) == [0, 1, 2, 3]
+        assert len(records) == 4
+        assert "error" in by_index[1] and "error" in by_index[2]
+        assert "response" in by_index[0] and "response" in by_index[3]
+        assert by_index[3]["id"] == "q4"
+
+        checkpoint = json.loads((Path(tmp) / "answers.jsonl.ckpt").read_text(encoding="utf-8"))
+        assert checkpoint["watermark"] == 4
+        assert checkpoint["errors"] == 2
+
+def main():
+    tests = [
+        ("깨진 줄 + 재개", test_corrupt_lines_then_resume),
+    ]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n전체 결과: {len(tests) - failed}/{len(tests)} 통과")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
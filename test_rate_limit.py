@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+속도 제한 테스트 스크립트
+token bucket 충전/LRU 제거와 라우트별 예산(faq/llm) 선택 검증
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# 백엔드 경로 추가
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("KENOPI_WARMUP", "0")
+
+from rate_limit import RateLimiter
+
+NON_FAQ_QUERY = "우산 손잡이 색상 조합 추천해줄 수 있어?"
+
+def test_bucket_refill():
+    """버킷 소진 후 시간이 지나면 충전량만큼 다시 허용"""
+    limiter = RateLimiter({"llm": (2, 1.0)})  # 2회, 초당 1개 충전
+    assert limiter.acquire("ip:a", "llm", now=0.0).allowed
+    assert limiter.acquire("ip:a", "llm", now=0.0).allowed
+    denied = limiter.acquire("ip:a", "llm", now=0.0)
+    assert not denied.allowed
+    assert denied.retry_after == 1
+    assert denied.headers()["Retry-After"] == "1"
+
+    refilled = limiter.acquire("ip:a", "llm", now=1.0)
+    assert refilled.allowed
+    assert refilled.remaining == 0
+
+    # 오래 쉬어도 버킷 크기 이상으로는 쌓이지 않음
+    assert limiter.acquire("ip:a", "llm", now=100.0).remaining == 1
+
+def test_bucket_eviction():
+    """키 수가 max_keys를 넘으면 가장 오래 안 쓴 버킷부터 제거 (다시 오면 가득 찬 버킷)"""
+    limiter = RateLimiter({"faq": (1, 0.001)}, max_keys=2)
+    assert limiter.acquire("ip:a", "faq", now=0.0).allowed
+    assert limiter.acquire("ip:b", "faq", now=0.0).allowed
+    assert not limiter.acquire("ip:a", "faq", now=0.0).allowed  # a가 최근 사용으로 이동
+    assert limiter.acquire("ip:c", "faq", now=0.0).allowed      # b 제거
+
+    stats = limiter.stats()
+    assert stats["buckets"] == 2
+    assert stats["evicted"] == 1
+    assert not limiter.acquire("ip:a", "faq", now=0.0).allowed  # a는 남아 있음
+    assert limiter.acquire("ip:b", "faq", now=0.0).allowed      # b는 새 버킷
+
+def test_disabled_limiter():
+    """비활성화 시 판정 없음"""
+    limiter = RateLimiter({"faq": (1, 1.0)}, enabled=False)
+    assert limiter.acquire("ip:a", "faq") is None
+
+def test_budget_per_pipeline():
+    """규칙 기반 파이프라인은 항상 faq, 고급 파이프라인은 FAQ 정확 매칭이 아니면 llm"""
+    from kenopi_chatbot import get_faq_list, request_budget
+
+    previous = os.environ.get("OPENAI_API_KEY")
+    os.environ["OPENAI_API_KEY"] = "test-key"
+    try:
+        history = [{"role": "user", "content": NON_FAQ_QUERY}]
+        assert request_budget(history, "rule") == "faq"
+        assert request_budget([{"role": "user", "content": "네"}], "rule") == "faq"
+        assert request_budget(history, "advanced") == "llm"
+
+        faq_question = get_faq_list()[0]["question"]
+        assert request_budget([{"role": "user", "content": faq_question}], "advanced") == "faq"
+        assert request_budget([], "advanced") == "faq"
+    finally:
+        if previous is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+        else:
+            os.environ["OPENAI_API_KEY"] = previous
+
+def test_chat_route_uses_faq_budget():
+    """/kenopi/chat은 LLM을 호출하지 않으므로 llm 예산(10회)을 넘겨도 429가 나지 않음"""
+    from fastapi.testclient import TestClient
+    import main
+    from rate_limit import rate_limiter
+
+    previous = os.environ.get("OPENAI_API_KEY")
+    os.environ["OPENAI_API_KEY"] = "test-key"
+    saved_enabled = rate_limiter.enabled
+    rate_limiter.enabled = True
+    try:
+        client = TestClient(main.app)
+        headers = {"X-Forwarded-For": "203.0.113.7"}
+        body = {"messages": [{"role": "user", "content": NON_FAQ_QUERY}]}
+        llm_limit = rate_limiter.budgets["llm"][0]
+        for _ in range(llm_limit + 1):
+            response = client.post("/kenopi/chat", json=body, headers=headers)
+            assert response.status_code == 200
+            assert 'comment="faq"' in response.headers["RateLimit-Policy"]
+    finally:
+        rate_limiter.enabled = saved_enabled
+        if previous is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+        else:
+            os.environ["OPENAI_API_KEY"] = previous
+
+def test_batch_charges_llm_budget_per_conversation():
+    """/kenopi/chat/batch는 고유 대화 수만큼 llm 예산을 처리 시작 전에 차감"""
+    from fastapi.testclient import TestClient
+    import main
+    from rate_limit import RateLimiter
+    import routers.kenopi as kenopi_router
+
+    saved = kenopi_router.rate_limiter
+    kenopi_router.rate_limiter = RateLimiter({"faq": (60, 1.0), "llm": (3, 0.001)})
+    try:
+        client = TestClient(main.app)
+        too_many = {"items": [{"messages": [{"role": "user", "content": f"질문 {i}"}]} for i in range(4)]}
+        response = client.post("/kenopi/chat/batch", json=too_many)
+        assert response.status_code == 429
+        assert "최대 3개" in response.json()["detail"]
+
+        # 같은 대화는 한 번만 차감
+        duplicated = {"items": [{"messages": [{"role": "user", "content": "안녕하세요"}]}] * 5}
+        response = client.post("/kenopi/chat/batch", json=duplicated)
+        assert response.status_code == 200
+        assert response.headers["RateLimit-Remaining"] == "2"
+
+        pair = {"items": [{"messages": [{"role": "user", "content": q}]} for q in ("감사합니다", "안녕")]}
+        assert client.post("/kenopi/chat/batch", json=pair).status_code == 200
+        response = client.post("/kenopi/chat/batch", json=duplicated)
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+    finally:
+        kenopi_router.rate_limiter = saved
+
+def test_demo_route_is_rate_limited():
+    """/kenopi/thinking/demo도 고급 파이프라인 예산 적용"""
+    from fastapi.testclient import TestClient
+    import main
+    from rate_limit import RateLimiter
+    import routers.kenopi as kenopi_router
+
+    saved = kenopi_router.rate_limiter
+    kenopi_router.rate_limiter = RateLimiter({"faq": (1, 0.001), "llm": (1, 0.001)})
+    try:
+        client = TestClient(main.app)
+        body = {"messages": [{"role": "user", "content": "안녕하세요"}]}
+        assert client.post("/kenopi/thinking/demo", json=body).status_code == 200
+        assert client.post("/kenopi/thinking/demo", json=body).status_code == 429
+    finally:
+        kenopi_router.rate_limiter = saved
+
+def main():
+    tests = [
+        ("버킷 충전", test_bucket_refill),
+        ("버킷 제거", test_bucket_eviction),
+        ("비활성화", test_disabled_limiter),
+        ("파이프라인별 예산", test_budget_per_pipeline),
+        ("/kenopi/chat 예산", test_chat_route_uses_faq_budget),
+        ("/kenopi/chat/batch 예산", test_batch_charges_llm_budget_per_conversation),
+        ("/kenopi/thinking/demo 예산", test_demo_route_is_rate_limited),
+    ]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n전체 결과: {len(tests) - failed}/{len(tests)} 통과")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
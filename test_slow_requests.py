@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+느린 요청 기록 테스트 스크립트
+힙이 가득 찬 상태에서 window가 지난 항목이 새 느린 요청을 막지 않는지 검증
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 백엔드 경로 추가
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+from slow_requests import SlowRequestLog
+
+class FakeTrace:
+    """SlowRequestLog가 읽는 RequestTrace 속성만 가진 가짜 추적"""
+
+    def __init__(self, duration: float, started_at: float):
+        self.duration = duration
+        self.started_at = started_at
+        self.endpoint = "chat"
+        self.mode = "rule"
+        self.outcome = "ok"
+        self.fallback_reason = None
+        self.attributes = {}
+        self.stages = []
+
+    def stage_totals(self):
+        return {}
+
+def test_keeps_slowest():
+    """가득 찬 뒤에는 가장 빠른 항목보다 느린 요청만 교체"""
+    log = SlowRequestLog(capacity=2, window_seconds=60)
+    now = time.time()
+    for duration in (1.0, 3.0, 0.5, 2.0):
+        log.offer(FakeTrace(duration, now))
+    assert [entry["duration_ms"] for entry in log.snapshot()] == [3000.0, 2000.0]
+
+def test_expired_outliers_do_not_block_new_requests():
+    """window가 지난 느린 항목이 힙을 채우고 있어도 새 요청을 기록"""
+    log = SlowRequestLog(capacity=2, window_seconds=1)
+    old = time.time() - 5
+    log.offer(FakeTrace(10.0, old))
+    log.offer(FakeTrace(9.0, old))
+
+    now = time.time()
+    for _ in range(50):
+        log.offer(FakeTrace(1.0, now))
+
+    entries = log.snapshot()
+    assert len(entries) == 2
+    assert all(entry["duration_ms"] == 1000.0 for entry in entries)
+
+def main():
+    tests = [
+        ("가장 느린 요청 유지", test_keeps_slowest),
+        ("만료 항목 교체", test_expired_outliers_do_not_block_new_requests),
+    ]
+    failed = 0
+    for name, func in tests:
+        try:
+            func()
+            print(f"✅ {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {name}: {e!r}")
+    print(f"\n전체 결과: {len(tests) - failed}/{len(tests)} 통과")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()